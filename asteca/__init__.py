@@ -7,9 +7,20 @@ from .cluster import Cluster as cluster
 from .isochrones import Isochrones as isochrones
 from .likelihood import Likelihood as likelihood
 from .membership import Membership as membership
+from .sampler import Sampler as sampler
+from .scheduler import Scheduler as scheduler
 from .synthetic import Synthetic as synthetic
 
-__all__ = ["cluster", "membership", "isochrones", "synthetic", "likelihood", "plot"]
+__all__ = [
+    "cluster",
+    "membership",
+    "isochrones",
+    "synthetic",
+    "likelihood",
+    "sampler",
+    "scheduler",
+    "plot",
+]
 
 
 def extract_version() -> str:
@@ -1,6 +1,7 @@
 import numpy as np
 
 from .modules import isochrones_priv
+from .modules import shared_priv as shpriv
 
 
 class Isochrones:
@@ -65,6 +66,21 @@ class Isochrones:
         by the user if the isochrone service changes its format and the `isochrones`
         class fails to load the files, defaults to ``None``
     :type column_names: dict | None
+    :param cache_dir: Path to a folder used to cache the processed isochrones. The
+        first time a set of files is loaded the processed data is stored in this
+        folder, and later instances load it from there (memory mapped) instead of
+        parsing the files again. The cache is invalidated if any file is modified
+        or if any argument used to process the files changes. If ``None`` no cache
+        is used, defaults to ``None``
+    :type cache_dir: str | None
+    :param n_jobs: Number of processes used to parse the isochrone files. Values
+        larger than ``1`` parse the files concurrently, which speeds up loading
+        folders that contain many files, defaults to ``1``
+    :type n_jobs: int
+    :param dtype: Floating point precision of the stored isochrones, one of
+        ``float64, float32``. The ``float32`` precision halves the memory used by the
+        isochrones, defaults to ``float64``
+    :type dtype: str
     :param verbose: Verbose level. A value of ``0`` hides all output, defaults to ``1``
     :type verbose: int
 
@@ -86,6 +102,9 @@ class Isochrones:
         N_interp: int = 2500,
         parsec_rm_stage_9: bool = True,
         column_names: dict | None = None,
+        cache_dir: str | None = None,
+        n_jobs: int = 1,
+        dtype: str = "float64",
         verbose: int = 1,
     ) -> None:
         self.model = model
@@ -100,6 +119,9 @@ class Isochrones:
         self.column_names = column_names
         self.N_interp = N_interp
         self.parsec_rm_stage_9 = parsec_rm_stage_9
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs
+        self.dtype = dtype
         self.verbose = verbose
 
         # Check that the number of colors match
@@ -120,6 +142,16 @@ class Isochrones:
                 f"Model '{self.model}' not recognized. Should be one of {models}"
             )
 
+        # Check precision
+        dtypes = ("float64", "float32")
+        if self.dtype not in dtypes:
+            raise ValueError(
+                f"dtype '{self.dtype}' not recognized. Should be one of {dtypes}"
+            )
+
+        # Path to the arrays shared with other processes, see `share()`
+        self._shared = None
+
         self._vp("\nInstantiating isochrones...")
         # Load isochrone files
         self.theor_tracks, self.color_filters, self.met_age_dict, N_isoch_files = (
@@ -132,9 +164,21 @@ class Isochrones:
                 self.column_names,
                 self.N_interp,
                 self.parsec_rm_stage_9,
+                self.cache_dir,
+                self.n_jobs,
             )
         )
 
+        if self.dtype != "float64":
+            self.theor_tracks = self.theor_tracks.astype(self.dtype)
+            self.color_filters = [
+                [
+                    {k: np.asarray(v, dtype=self.dtype) for k, v in age_dict.items()}
+                    for age_dict in met_lst
+                ]
+                for met_lst in self.color_filters
+            ]
+
         # Convert z to FeH if requested
         met_n = "z  "
         if self.z_to_FeH is not None:
@@ -153,6 +197,8 @@ class Isochrones:
         self._vp(f"N_met          : {N_met}", 1)
         self._vp(f"N_age          : {N_age}", 1)
         self._vp(f"N_isoch        : {N_isoch}", 1)
+        if self.dtype != "float64":
+            self._vp(f"dtype          : {self.dtype}", 1)
         self._vp(f"{met_n} range      : [{self.zmin}, {self.zmax}]", 1)
         self._vp(f"loga range     : [{self.amin}, {self.amax}]", 1)
         self._vp(f"Magnitude      : {self.magnitude}", 1)
@@ -166,6 +212,58 @@ class Isochrones:
         if self.verbose > level:
             print(mssg)
 
+    def share(self, directory: str | None = None) -> None:
+        """Move the isochrones to memory mapped files that are shared with other
+        processes.
+
+        The arrays of isochrones are stored as ``.npy`` files in a temporary folder
+        and replaced by read-only memory mapped views of these files. When this
+        object is passed to other processes (e.g.: by ``multiprocessing``) the
+        arrays are not copied, and the processes load the same files instead.
+        Hence, the memory used does not grow with the number of processes. The
+        temporary folder is removed when this object is garbage collected.
+
+        :param directory: Folder where the temporary folder is created. A folder in
+            a RAM based file system (e.g.: ``/dev/shm`` in Linux) avoids writing the
+            arrays to disk. If ``None`` the default temporary folder of the system
+            is used, defaults to ``None``
+        :type directory: str | None
+        """
+        if self._shared is not None:
+            return
+        filters, filters_arr = isochrones_priv.filters_array(self.color_filters)
+        arrays, path = shpriv.share_arrays(
+            self,
+            {"theor_tracks": self.theor_tracks, "color_filters": filters_arr},
+            directory,
+        )
+        self._shared = {"path": path, "filters": filters}
+        self._attach_shared(arrays)
+
+    def _attach_shared(self, arrays: dict) -> None:
+        """Replace the large arrays by the shared ones"""
+        self.theor_tracks = arrays["theor_tracks"]
+        self.color_filters = isochrones_priv.filters_dicts(
+            self._shared["filters"], arrays["color_filters"]
+        )
+
+    def __getstate__(self) -> dict:
+        """The shared arrays are not pickled, see :py:meth:`share`"""
+        state = self.__dict__.copy()
+        if self._shared is not None:
+            state["theor_tracks"], state["color_filters"] = None, None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Load the shared arrays, see :py:meth:`share`"""
+        self.__dict__.update(state)
+        if self._shared is not None:
+            self._attach_shared(
+                shpriv.attach_arrays(
+                    self._shared["path"], ["theor_tracks", "color_filters"]
+                )
+            )
+
     def _func_z_to_FeH(self, z_to_FeH):
         """Convert z to FeH"""
         feh = np.log10(self.met_age_dict["met"] / z_to_FeH)
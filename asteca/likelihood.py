@@ -1,7 +1,11 @@
+import time
+
 import numpy as np
+import pandas as pd
 
 from .cluster import Cluster
 from .modules import likelihood_priv as lpriv
+from .modules import profile_priv as pfpriv
 
 
 class Likelihood:
@@ -28,16 +32,28 @@ class Likelihood:
         ``knuth, blocks, scott, freedman`` methods.  The method ``fixed``
         uses (15, 10) bins in magnitude and color(s) respectively. Defaults to ``knuth``
     :type bin_method: str
+    :param sparse_hess: If ``True`` the synthetic stars are binned only into the
+        cells of the Hess diagram where stars were observed, through a table that
+        maps each cell to its position in the array of occupied cells. This avoids
+        generating the full Hess diagram for each synthetic cluster, which saves
+        memory and time for large grids (e.g.: two colors with many bins). The
+        likelihood values are not affected, defaults to ``False``
+    :type sparse_hess: bool
 
     :raises ValueError: If any of the attributes is not recognized as a valid option
     """
 
     def __init__(
-        self, my_cluster: Cluster, lkl_name: str = "plr", bin_method: str = "knuth"
+        self,
+        my_cluster: Cluster,
+        lkl_name: str = "plr",
+        bin_method: str = "knuth",
+        sparse_hess: bool = False,
     ) -> None:
         self.my_cluster = my_cluster
         self.lkl_name = lkl_name
         self.bin_method = bin_method
+        self.sparse_hess = sparse_hess
 
         likelihoods = ("plr", "bins_distance", "chisq")
         if self.lkl_name not in likelihoods:
@@ -57,8 +73,21 @@ class Likelihood:
             bin_method, my_cluster.mag_v, my_cluster.colors_v
         )
 
+        # Map of Hess diagram cells to the cells where stars were observed
+        self.cell_slot = None
+        if self.sparse_hess:
+            self.cell_slot = lpriv.cell_slots(self.cl_z_idx)
+
+        # Per-stage profiling, disabled by default, see `profile_report()`
+        self.profile = False
+        self.profile_reset()
+
         self.max_lkl = 1
         if self.lkl_name == "plr":
+            # Table of log-gamma values for the integer counts in the Hess diagram.
+            # It covers cells holding up to twice the number of observed stars
+            self._lgamma_tbl = lpriv.loggamma_table(2 * int(self.cl_histo_f_z.sum()))
+
             # Evaluate cluster against itself to obtain the maximum likelihood.
             # Since the initial max_lkl=1, subtracting 1 inverts it back to the
             # original likelihood value
@@ -68,6 +97,38 @@ class Likelihood:
 
         print("\nLikelihood object generated")
 
+    def profile_reset(self) -> None:
+        """Reset the profiling statistics, see :py:meth:`profile_report`."""
+        self._profile_stats = pfpriv.new_stats()
+
+    def profile_report(self, as_dataframe: bool = False) -> dict | pd.DataFrame:
+        """Report the time spent in each stage of the likelihood evaluation.
+
+        Profiling is disabled by default, set the ``profile`` attribute to ``True``
+        to enable it (e.g.: ``likelihood.profile = True``). While enabled, the
+        number of calls and the time spent in each stage are accumulated by the
+        :py:meth:`get`, :py:meth:`get_hess` and :py:meth:`get_batch` methods. For
+        the ``plr`` and ``chisq`` likelihoods the stages are the binning of the
+        synthetic cluster (``synth_hess``) and the evaluation of the likelihood on
+        the binned cluster (``lkl``); for ``bins_distance`` there is a single stage
+        (``bins_distance``). The ``N_empty`` counter holds the number of empty
+        synthetic clusters that were assigned a small likelihood value.
+
+        Only the calls made in this process are recorded, not those made in worker
+        processes (``n_jobs > 1``). When disabled the overhead is negligible. The
+        statistics are emptied with the :py:meth:`profile_reset` method.
+
+        :param as_dataframe: If ``True`` return the stages as a ``pd.DataFrame``,
+            defaults to ``False``
+        :type as_dataframe: bool
+
+        :return: Dictionary with the stages and counters, or ``pd.DataFrame`` with
+            the stages and the counters in its ``attrs["counters"]`` dictionary. See
+            :py:meth:`Synthetic.profile_report() <asteca.synthetic.Synthetic.profile_report>`
+        :rtype: dict | pd.DataFrame
+        """
+        return pfpriv.report(self._profile_stats, as_dataframe)
+
     def get(self, synth_clust: np.ndarray) -> float:
         """Evaluate the selected likelihood function.
 
@@ -82,6 +143,9 @@ class Likelihood:
         :return: Likelihood value
         :rtype: float
         """
+        if self.profile and self.lkl_name != "bins_distance":
+            return self._get_profiled(synth_clust)
+
         if self.lkl_name == "plr":
             return lpriv.tremmel(
                 self.ranges,
@@ -90,18 +154,155 @@ class Likelihood:
                 self.cl_histo_f_z,
                 self.max_lkl,
                 synth_clust,
+                self._lgamma_tbl,
+                self.cell_slot,
             )
         # if self.lkl_name == "visual":
         #     return lpriv.visual(self, synth_clust)
         # if self.lkl_name == "mean_dist":
         #     return lpriv.mean_dist(self, synth_clust)
         elif self.lkl_name == "bins_distance":
-            return lpriv.bins_distance(
+            if self.profile:
+                t0 = time.perf_counter()
+            lkl = lpriv.bins_distance(
                 self.my_cluster.mag_v, self.my_cluster.colors_v, synth_clust
             )
+            if self.profile:
+                pfpriv.lap(self._profile_stats, "bins_distance", t0)
+            return lkl
         elif self.lkl_name == "chisq":
             return lpriv.chi_square(
-                self.ranges, self.Nbins, self.cl_z_idx, self.cl_histo_f_z, synth_clust
+                self.ranges,
+                self.Nbins,
+                self.cl_z_idx,
+                self.cl_histo_f_z,
+                synth_clust,
+                self.cell_slot,
             )
         else:
             raise ValueError(f"Likelihood '{self.lkl_name}' not recognized")
+
+    def _get_profiled(self, synth_clust: np.ndarray) -> float:
+        """Same as :py:meth:`get` for the ``plr`` and ``chisq`` likelihoods, with the
+        binning and the likelihood stages profiled separately"""
+        if self.lkl_name not in ("plr", "chisq"):
+            raise ValueError(f"Likelihood '{self.lkl_name}' not recognized")
+
+        if not synth_clust.any():
+            pfpriv.count(self._profile_stats, "N_empty")
+            return -1.0e09
+
+        t0 = time.perf_counter()
+        if self.cell_slot is None:
+            syn_histo_f_z = lpriv.synth_hess(self.ranges, self.Nbins, synth_clust)[
+                self.cl_z_idx
+            ]
+        else:
+            syn_histo_f_z = lpriv.synth_hess_sparse(
+                self.ranges,
+                self.Nbins,
+                self.cell_slot,
+                self.cl_histo_f_z.size,
+                synth_clust,
+            )
+        pfpriv.lap(self._profile_stats, "synth_hess", t0)
+
+        return self.get_hess(syn_histo_f_z)
+
+    def get_hess(self, syn_histo_f_z: np.ndarray) -> float:
+        """Evaluate the selected likelihood function on a synthetic cluster that was
+        already binned into the observed Hess diagram, generated by the
+        :py:meth:`Synthetic.generate_hess() <asteca.synthetic.Synthetic.generate_hess>`
+        method.
+
+        :param syn_histo_f_z: Counts of synthetic stars in the bins of the observed
+            Hess diagram that contain stars
+        :type syn_histo_f_z: np.ndarray
+
+        :raise ValueError: If the likelihood function does not use a binned Hess
+            diagram
+
+        :return: Likelihood value
+        :rtype: float
+        """
+        if self.profile:
+            t0 = time.perf_counter()
+        if self.lkl_name == "plr":
+            lkl = lpriv.tremmel_hess(
+                self.cl_histo_f_z, self.max_lkl, syn_histo_f_z, self._lgamma_tbl
+            )
+        elif self.lkl_name == "chisq":
+            lkl = lpriv.chi_square_hess(self.cl_histo_f_z, syn_histo_f_z)
+        else:
+            raise ValueError(
+                f"Likelihood '{self.lkl_name}' does not use a binned Hess diagram"
+            )
+        if self.profile:
+            pfpriv.lap(self._profile_stats, "lkl", t0)
+
+        return lkl
+
+    def get_batch(self, synth_clusts: list[np.ndarray]) -> np.ndarray:
+        """Evaluate the selected likelihood function on several synthetic clusters.
+
+        For the ``plr`` and ``chisq`` likelihoods all the synthetic clusters are
+        binned together and the likelihoods are evaluated at once. Each returned
+        value is equal to the one returned by :py:meth:`get` for the same synthetic
+        cluster. Meant to be used with the list of synthetic clusters
+        returned by the
+        :py:meth:`Synthetic.generate_batch() <asteca.synthetic.Synthetic.generate_batch>`
+        method.
+
+        :param synth_clusts: List of synthetic clusters, each with the same format
+            as the array passed to :py:meth:`get`
+        :type synth_clusts: list[np.ndarray]
+
+        :raise ValueError: If the likelihood function is not recognized
+
+        :return: Array of likelihood values
+        :rtype: np.ndarray
+        """
+        if self.lkl_name not in ("plr", "chisq"):
+            return np.array([self.get(_) for _ in synth_clusts])
+
+        # Empty synthetic clusters are assigned a small likelihood value. Checking
+        # the first star before the full array avoids scanning non-empty clusters
+        lkls = np.full(len(synth_clusts), -1.0e09)
+        idx = [
+            i
+            for i, _ in enumerate(synth_clusts)
+            if _.size > 0 and (_[:, 0].any() or _.any())
+        ]
+        if self.profile:
+            pfpriv.count(self._profile_stats, "N_empty", len(synth_clusts) - len(idx))
+        if not idx:
+            return lkls
+
+        if self.profile:
+            t0 = time.perf_counter()
+        synth_clusts = [synth_clusts[i] for i in idx]
+        if self.cell_slot is None:
+            syn_histo_f_z = lpriv.synth_hess_batch(
+                self.ranges, self.Nbins, synth_clusts
+            )[:, self.cl_z_idx]
+        else:
+            syn_histo_f_z = lpriv.synth_hess_batch(
+                self.ranges,
+                self.Nbins,
+                synth_clusts,
+                self.cell_slot,
+                self.cl_histo_f_z.size,
+            )
+        if self.profile:
+            t0 = pfpriv.lap(self._profile_stats, "synth_hess", t0, len(idx))
+
+        if self.lkl_name == "plr":
+            lkls[idx] = lpriv.tremmel_batch(
+                self.cl_histo_f_z, self.max_lkl, syn_histo_f_z, self._lgamma_tbl
+            )
+        else:
+            lkls[idx] = lpriv.chi_square_batch(self.cl_histo_f_z, syn_histo_f_z)
+        if self.profile:
+            pfpriv.lap(self._profile_stats, "lkl", t0, len(idx))
+
+        return lkls
@@ -0,0 +1,759 @@
+import contextlib
+import copy
+import json
+import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.spatial import KDTree
+
+# Synthetic and Likelihood objects used by the worker processes, see `init_worker()`
+_synthcl = None
+_likelihood = None
+
+
+def fit_bounds(
+    fix_params: dict, met_age_dict: dict, bounds: dict[str, tuple[float, float]]
+) -> tuple[list[str], np.ndarray]:
+    """Names and ranges of the fitted parameters, those not in ``fix_params``.
+
+    :param fix_params: Dictionary of fixed parameters.
+    :type fix_params: dict
+    :param met_age_dict: Dictionary of metallicity and age values.
+    :type met_age_dict: dict
+    :param bounds: Dictionary with the ``(min, max)`` range of the fitted
+        parameters. The metallicity and age ranges default to the grid's ranges.
+    :type bounds: dict[str, tuple[float, float]]
+
+    :raises ValueError:
+        -If a parameter in ``bounds`` is not a fitted parameter
+        -If the range of a fitted parameter is missing or not valid
+
+    :return: Names of the fitted parameters (in the order used by
+        ``properModel()``) and array of ranges, one row per parameter.
+    :rtype: tuple[list[str], np.ndarray]
+    """
+    fit_names = [
+        k
+        for k in ["met", "loga", "alpha", "beta", "Av", "DR", "Rv", "dm"]
+        if k not in fix_params
+    ]
+    for k in bounds:
+        if k not in fit_names:
+            raise ValueError(
+                f"Parameter '{k}' in 'bounds' is not a fitted parameter. "
+                + f"Should be one of {fit_names}"
+            )
+
+    bounds_arr = []
+    for k in fit_names:
+        if k in ("met", "loga"):
+            pmin, pmax = min(met_age_dict[k]), max(met_age_dict[k])
+            bmin, bmax = bounds.get(k, (pmin, pmax))
+            if bmin < pmin or bmax > pmax:
+                raise ValueError(f"Parameter '{k}' out of range: [{pmin} - {pmax}]")
+        else:
+            if k not in bounds:
+                raise ValueError(
+                    f"Parameter '{k}' is not fixed, its range must be given "
+                    + "in 'bounds'"
+                )
+            bmin, bmax = bounds[k]
+        if not bmin < bmax:
+            raise ValueError(
+                f"Range for parameter '{k}' is not valid: ({bmin}, {bmax})"
+            )
+        bounds_arr.append((bmin, bmax))
+
+    return fit_names, np.array(bounds_arr, dtype=float)
+
+
+def n_walkers(N_walkers: int | None, N_params: int) -> int:
+    """Check the number of walkers of the ensemble sampler.
+
+    :param N_walkers: Number of walkers. If ``None``, four times the number of
+        parameters is used.
+    :type N_walkers: int | None
+    :param N_params: Number of fitted parameters.
+    :type N_params: int
+
+    :raises ValueError: If the number of walkers is not valid
+
+    :return: Number of walkers.
+    :rtype: int
+    """
+    if N_walkers is None:
+        N_walkers = 4 * N_params
+    if N_walkers % 2 != 0 or N_walkers < 2 * N_params:
+        raise ValueError(
+            f"N_walkers={N_walkers} is not valid. Should be an even number "
+            + f"of at least {2 * N_params}"
+        )
+    return N_walkers
+
+
+def walkers_ball(
+    center: np.ndarray, bounds_arr: np.ndarray, N_walkers: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Initial positions of the walkers, in a small ball around ``center``.
+
+    :param center: Central model.
+    :type center: np.ndarray
+    :param bounds_arr: Ranges of the fitted parameters, one row per parameter.
+    :type bounds_arr: np.ndarray
+    :param N_walkers: Number of walkers.
+    :type N_walkers: int
+    :param rng: Random number generator.
+    :type rng: np.random.Generator
+
+    :return: Positions of the walkers, shape ``(N_walkers, N_params)``.
+    :rtype: np.ndarray
+    """
+    p0 = center + 1e-3 * np.ptp(bounds_arr, 1) * rng.normal(
+        size=(N_walkers, len(center))
+    )
+    return np.clip(p0, bounds_arr[:, 0], bounds_arr[:, 1])
+
+
+def grid_nodes(
+    met_age_dict: dict, fix_params: dict, fit_names: list[str], bounds_arr: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Metallicity and age values of the grid nodes within the ranges of the fitted
+    parameters. Fixed parameters contribute their single fixed value. If a range
+    contains no grid nodes, its limits are used instead.
+
+    :param met_age_dict: Dictionary of metallicity and age values.
+    :type met_age_dict: dict
+    :param fix_params: Dictionary of fixed parameters.
+    :type fix_params: dict
+    :param fit_names: Names of the fitted parameters.
+    :type fit_names: list[str]
+    :param bounds_arr: Ranges of the fitted parameters, one row per parameter.
+    :type bounds_arr: np.ndarray
+
+    :return: Metallicity and age values.
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+    vals = []
+    for k in ("met", "loga"):
+        if k in fix_params:
+            vals.append(np.array([fix_params[k]], dtype=float))
+            continue
+        pmin, pmax = bounds_arr[fit_names.index(k)]
+        par = np.asarray(met_age_dict[k], dtype=float)
+        par = par[(par >= pmin) & (par <= pmax)]
+        vals.append(par if len(par) > 0 else np.array([pmin, pmax]))
+    return vals[0], vals[1]
+
+
+def node_models(
+    nodes: np.ndarray, fit_names: list[str], cont: np.ndarray
+) -> np.ndarray:
+    """Combine each (metallicity, age) node with each set of values of the
+    continuous parameters (all the fitted parameters except ``met`` and ``loga``).
+
+    :param nodes: Array of (metallicity, age) values, one row per node.
+    :type nodes: np.ndarray
+    :param fit_names: Names of the fitted parameters.
+    :type fit_names: list[str]
+    :param cont: Values of the continuous parameters, one row per set of values.
+    :type cont: np.ndarray
+
+    :return: Array of models, one row per model. The models of each node are
+        contiguous.
+    :rtype: np.ndarray
+    """
+    models = np.empty((len(nodes), len(cont), len(fit_names)))
+    j = 0
+    for i, k in enumerate(fit_names):
+        if k in ("met", "loga"):
+            models[:, :, i] = nodes[:, ("met", "loga").index(k), None]
+        else:
+            models[:, :, i] = cont[None, :, j]
+            j += 1
+    return models.reshape(-1, len(fit_names))
+
+
+def refine_nodes(
+    met_vals: np.ndarray, loga_vals: np.ndarray, i: int, j: int
+) -> np.ndarray:
+    """Points halfway between the grid node ``(i, j)`` and its neighbouring nodes,
+    including the diagonals.
+
+    :param met_vals: Metallicity values of the grid.
+    :type met_vals: np.ndarray
+    :param loga_vals: Age values of the grid.
+    :type loga_vals: np.ndarray
+    :param i: Index of the node's metallicity.
+    :type i: int
+    :param j: Index of the node's age.
+    :type j: int
+
+    :return: Array of (metallicity, age) values, one row per point.
+    :rtype: np.ndarray
+    """
+    fine = []
+    for par, k in ((met_vals, i), (loga_vals, j)):
+        vals = [par[k]]
+        if k > 0:
+            vals.append(0.5 * (par[k - 1] + par[k]))
+        if k < len(par) - 1:
+            vals.append(0.5 * (par[k] + par[k + 1]))
+        fine.append(vals)
+    points = np.array([(m, a) for m in fine[0] for a in fine[1]])
+    # Remove the node itself
+    return points[1:]
+
+
+def init_worker(synthcl, likelihood) -> None:
+    """Store the :py:class:`Synthetic <asteca.synthetic.Synthetic>` and
+    :py:class:`Likelihood <asteca.likelihood.Likelihood>` objects used by a worker
+    process.
+
+    :param synthcl: Calibrated synthetic clusters object.
+    :type synthcl: Synthetic
+    :param likelihood: Likelihood object.
+    :type likelihood: Likelihood
+    """
+    global _synthcl, _likelihood
+    _synthcl, _likelihood = synthcl, likelihood
+
+
+def batch_worker(fit_names: list[str], models: np.ndarray) -> np.ndarray:
+    """Evaluate a batch of models in a worker process, see :py:func:`lkl_batch`.
+
+    :param fit_names: Names of the fitted parameters.
+    :type fit_names: list[str]
+    :param models: Array of models, one row per model.
+    :type models: np.ndarray
+
+    :return: Likelihood values.
+    :rtype: np.ndarray
+    """
+    return lkl_batch(_synthcl, _likelihood, fit_names, models)
+
+
+def cluster_worker(
+    calib: dict,
+    likelihood,
+    bounds: dict | None,
+    fit_kwargs: dict,
+    seed: np.random.SeedSequence,
+) -> dict:
+    """Fit a cluster in a worker process, see :py:func:`fit_cluster`.
+
+    :param calib: Calibration data of the cluster.
+    :type calib: dict
+    :param likelihood: Likelihood object of the cluster.
+    :type likelihood: Likelihood
+    :param bounds: Ranges of the fitted parameters.
+    :type bounds: dict | None
+    :param fit_kwargs: Arguments passed to ``Synthetic.fit()``.
+    :type fit_kwargs: dict
+    :param seed: Seed for the random generator used by the fit.
+    :type seed: np.random.SeedSequence
+
+    :return: Result of the fit.
+    :rtype: dict
+    """
+    return fit_cluster(_synthcl, calib, likelihood, bounds, fit_kwargs, seed)
+
+
+def fit_cluster(
+    synthcl,
+    calib: dict,
+    likelihood,
+    bounds: dict | None,
+    fit_kwargs: dict,
+    seed: np.random.SeedSequence,
+) -> dict:
+    """Fit a cluster with a :py:class:`Synthetic <asteca.synthetic.Synthetic>`
+    object shared by many clusters.
+
+    The fit is performed by a shallow copy of ``synthcl`` calibrated with ``calib``:
+    the isochrones, the sampled IMF and the random values are shared with
+    ``synthcl``, which is left untouched.
+
+    :param synthcl: Synthetic clusters object.
+    :type synthcl: Synthetic
+    :param calib: Calibration data of the cluster.
+    :type calib: dict
+    :param likelihood: Likelihood object of the cluster.
+    :type likelihood: Likelihood
+    :param bounds: Ranges of the fitted parameters.
+    :type bounds: dict | None
+    :param fit_kwargs: Arguments passed to ``Synthetic.fit()``.
+    :type fit_kwargs: dict
+    :param seed: Seed for the random generator used by the fit.
+    :type seed: np.random.SeedSequence
+
+    :return: Result of the fit.
+    :rtype: dict
+    """
+    synthcl = copy.copy(synthcl)
+    synthcl.set_calibration(calib)
+    synthcl.rng = np.random.default_rng(seed)
+    synthcl.verbose = 0
+    return synthcl.fit(likelihood, bounds, n_jobs=1, **fit_kwargs)
+
+
+def lkl_batch(
+    synthcl, likelihood, fit_names: list[str], models: np.ndarray
+) -> np.ndarray:
+    """Generate the synthetic clusters for a batch of models and evaluate their
+    likelihoods. The likelihoods work as distances (the optimal value is ``0``), so
+    empty synthetic clusters are assigned an infinite distance.
+
+    :param synthcl: Calibrated synthetic clusters object.
+    :type synthcl: Synthetic
+    :param likelihood: Likelihood object.
+    :type likelihood: Likelihood
+    :param fit_names: Names of the fitted parameters.
+    :type fit_names: list[str]
+    :param models: Array of models, one row per model.
+    :type models: np.ndarray
+
+    :return: Likelihood values.
+    :rtype: np.ndarray
+    """
+    fit_params = {k: models[:, i] for i, k in enumerate(fit_names)}
+    synth_clusts = synthcl.generate_batch(fit_params)
+    lkls = likelihood.get_batch(synth_clusts)
+    lkls[np.array([not _.any() for _ in synth_clusts], dtype=bool)] = np.inf
+    return lkls
+
+
+def lkl_pool(
+    executor: ProcessPoolExecutor | None,
+    n_jobs: int,
+    synthcl,
+    likelihood,
+    fit_names: list[str],
+    models: np.ndarray,
+) -> np.ndarray:
+    """Evaluate a batch of models, split in ``n_jobs`` chunks that are processed
+    by the ``executor``'s worker processes. If ``executor`` is ``None`` all the
+    models are evaluated in this process.
+
+    :param executor: Pool of processes initialized with :py:func:`init_worker`, or
+        ``None``.
+    :type executor: ProcessPoolExecutor | None
+    :param n_jobs: Number of processes in the pool.
+    :type n_jobs: int
+    :param synthcl: Calibrated synthetic clusters object.
+    :type synthcl: Synthetic
+    :param likelihood: Likelihood object.
+    :type likelihood: Likelihood
+    :param fit_names: Names of the fitted parameters.
+    :type fit_names: list[str]
+    :param models: Array of models, one row per model.
+    :type models: np.ndarray
+
+    :return: Likelihood values.
+    :rtype: np.ndarray
+    """
+    if executor is None or len(models) < 2:
+        return lkl_batch(synthcl, likelihood, fit_names, models)
+
+    chunks = np.array_split(models, min(n_jobs, len(models)))
+    return np.concatenate(
+        list(executor.map(batch_worker, [fit_names] * len(chunks), chunks))
+    )
+
+
+@contextlib.contextmanager
+def lkl_evaluator(
+    synthcl,
+    likelihood,
+    fit_names: list[str],
+    n_jobs: int = 1,
+    N_chunk: int | None = None,
+) -> Iterator[Callable[[np.ndarray], np.ndarray]]:
+    """Context manager that yields a function to evaluate batches of models, see
+    :py:func:`lkl_pool`.
+
+    If ``n_jobs > 1`` a pool of processes is started, and shut down on exit. Each
+    worker receives a copy of the ``synthcl`` and ``likelihood`` objects once.
+
+    :param synthcl: Calibrated synthetic clusters object.
+    :type synthcl: Synthetic
+    :param likelihood: Likelihood object.
+    :type likelihood: Likelihood
+    :param fit_names: Names of the fitted parameters.
+    :type fit_names: list[str]
+    :param n_jobs: Number of processes used to evaluate the models, defaults to 1
+    :type n_jobs: int
+    :param N_chunk: If given, the models are evaluated in chunks of this size to
+        bound the number of synthetic clusters held in memory, defaults to None
+    :type N_chunk: int | None
+
+    :return: Function that takes an array of models (one row per model) and
+        returns their likelihood values.
+    :rtype: Iterator[Callable[[np.ndarray], np.ndarray]]
+    """
+    executor = None
+    if n_jobs > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=init_worker,
+            initargs=(synthcl, likelihood),
+        )
+
+    def lkl_f(models: np.ndarray) -> np.ndarray:
+        if N_chunk is None or len(models) <= N_chunk:
+            return lkl_pool(executor, n_jobs, synthcl, likelihood, fit_names, models)
+        return np.concatenate(
+            [
+                lkl_pool(
+                    executor,
+                    n_jobs,
+                    synthcl,
+                    likelihood,
+                    fit_names,
+                    models[i : i + N_chunk],
+                )
+                for i in range(0, len(models), N_chunk)
+            ]
+        )
+
+    try:
+        yield lkl_f
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def log_prob(lkls: np.ndarray, lkl_name: str, max_lkl: float) -> np.ndarray:
+    """Convert likelihood values (which work as distances) into log-probabilities,
+    assuming uniform priors.
+
+    For the ``plr`` likelihood this recovers the Tremmel log-likelihood (up to a
+    constant), for ``chisq`` the usual ``-chi^2/2`` is used, and for any other
+    likelihood the negative distance.
+
+    :param lkls: Likelihood values.
+    :type lkls: np.ndarray
+    :param lkl_name: Name of the likelihood.
+    :type lkl_name: str
+    :param max_lkl: Maximum likelihood value of the ``plr`` likelihood.
+    :type max_lkl: float
+
+    :return: Log-probabilities.
+    :rtype: np.ndarray
+    """
+    if lkl_name == "plr":
+        return -max_lkl * lkls
+    if lkl_name == "chisq":
+        return -0.5 * lkls
+    return -lkls
+
+
+def log_prob_models(
+    models: np.ndarray, bounds_arr: np.ndarray, lkl_f, lkl_name: str, max_lkl: float
+) -> np.ndarray:
+    """Log-probabilities of a batch of models, see :py:func:`log_prob`. Models
+    outside of the ranges are assigned ``-inf`` without being evaluated.
+
+    :param models: Array of models, one row per model.
+    :type models: np.ndarray
+    :param bounds_arr: Ranges of the fitted parameters, one row per parameter.
+    :type bounds_arr: np.ndarray
+    :param lkl_f: Function that returns the likelihood values of a batch of models.
+    :type lkl_f: Callable
+    :param lkl_name: Name of the likelihood.
+    :type lkl_name: str
+    :param max_lkl: Maximum likelihood value of the ``plr`` likelihood.
+    :type max_lkl: float
+
+    :return: Log-probabilities.
+    :rtype: np.ndarray
+    """
+    lp = np.full(len(models), -np.inf)
+    msk = np.all((models >= bounds_arr[:, 0]) & (models <= bounds_arr[:, 1]), 1)
+    if msk.any():
+        lp[msk] = log_prob(lkl_f(models[msk]), lkl_name, max_lkl)
+    return lp
+
+
+def surrogate(X: np.ndarray, y: np.ndarray, bounds_arr: np.ndarray) -> dict:
+    """Surrogate of the likelihood trained on a set of evaluated models, used by
+    :py:func:`surrogate_predict`. The coordinates are normalized to the ranges of
+    the parameters.
+
+    :param X: Evaluated models, one row per model.
+    :type X: np.ndarray
+    :param y: Likelihood values of the evaluated models (finite).
+    :type y: np.ndarray
+    :param bounds_arr: Ranges of the fitted parameters, one row per parameter.
+    :type bounds_arr: np.ndarray
+
+    :return: Dictionary with the tree of normalized evaluated models and their
+        likelihoods.
+    :rtype: dict
+    """
+    lo, scale = bounds_arr[:, 0], np.ptp(bounds_arr, 1)
+    return {"tree": KDTree((X - lo) / scale), "y": y, "lo": lo, "scale": scale}
+
+
+def surrogate_predict(
+    sur: dict, models: np.ndarray, k: int = 8
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Local k-NN regressor of the likelihood, with Gaussian (RBF) weights.
+
+    Each model is predicted by the weighted mean of the likelihoods of its ``k``
+    nearest evaluated models, with a bandwidth equal to the distance to the
+    farthest of them. The weighted standard deviation of the neighbours estimates
+    the uncertainty of the prediction.
+
+    :param sur: Surrogate generated by :py:func:`surrogate`.
+    :type sur: dict
+    :param models: Models to predict, one row per model.
+    :type models: np.ndarray
+    :param k: Number of neighbours, defaults to ``8``
+    :type k: int
+
+    :return: Predicted likelihoods, their uncertainties, and the (normalized)
+        distance to the closest evaluated model.
+    :rtype: tuple[np.ndarray, np.ndarray, np.ndarray]
+    """
+    k = min(k, len(sur["y"]))
+    dist, idx = sur["tree"].query((models - sur["lo"]) / sur["scale"], k=k)
+    dist, idx = dist.reshape(len(models), k), idx.reshape(len(models), k)
+
+    h = np.maximum(dist[:, -1:], 1e-12)
+    w = np.exp(-((dist / h) ** 2))
+    w /= w.sum(1, keepdims=True)
+    y_nn = sur["y"][idx]
+    mean = (w * y_nn).sum(1)
+    std = np.sqrt((w * (y_nn - mean[:, None]) ** 2).sum(1))
+
+    return mean, std, dist[:, 0]
+
+
+def archive_data(archive: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Evaluated models stored in the ``archive``, and their likelihoods. Infinite
+    likelihoods (empty synthetic clusters) are replaced by the largest finite
+    value, so that they can be used by :py:func:`surrogate`.
+
+    :param archive: Dictionary with the lists of evaluated models (``X``) and their
+        likelihoods (``y``).
+    :type archive: dict
+
+    :return: Evaluated models and their likelihoods.
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+    X, y = np.concatenate(archive["X"]), np.concatenate(archive["y"])
+    finite = np.isfinite(y)
+    y = np.where(finite, y, y[finite].max() if finite.any() else 1.0)
+    return X, y
+
+
+def prescreen(
+    lkl_f,
+    archive: dict,
+    models: np.ndarray,
+    bounds_arr: np.ndarray,
+    frac: float = 0.2,
+    d_max: float = 0.05,
+) -> np.ndarray:
+    """Evaluate a batch of models, using a surrogate of the likelihood (see
+    :py:func:`surrogate_predict`) to skip most of the forward model evaluations.
+
+    Only the fraction ``frac`` of models with the best optimistic prediction
+    (predicted value minus its uncertainty), and the models that are farther than
+    ``d_max`` from any evaluated model, are evaluated with ``lkl_f`` and added to
+    the ``archive``. The rest are assigned a pessimistic prediction (predicted
+    value plus its uncertainty). All the models are evaluated while the archive
+    holds fewer models than twice the batch.
+
+    :param lkl_f: Function that returns the likelihood values of a batch of models.
+    :type lkl_f: Callable
+    :param archive: Dictionary with the lists of evaluated models (``X``) and their
+        likelihoods (``y``), updated in place.
+    :type archive: dict
+    :param models: Models to evaluate, one row per model.
+    :type models: np.ndarray
+    :param bounds_arr: Ranges of the fitted parameters, one row per parameter.
+    :type bounds_arr: np.ndarray
+    :param frac: Fraction of models always evaluated, defaults to ``0.2``
+    :type frac: float
+    :param d_max: Normalized distance beyond which the surrogate is not trusted,
+        defaults to ``0.05``
+    :type d_max: float
+
+    :return: Likelihood values.
+    :rtype: np.ndarray
+    """
+    if sum(len(_) for _ in archive["y"]) < 2 * len(models):
+        lkls = lkl_f(models)
+        archive["X"].append(models)
+        archive["y"].append(lkls)
+        return lkls
+
+    mean, std, d_nn = surrogate_predict(
+        surrogate(*archive_data(archive), bounds_arr), models
+    )
+
+    true_msk = d_nn > d_max
+    true_msk[np.argsort(mean - std)[: max(1, int(np.ceil(frac * len(models))))]] = True
+
+    lkls = mean + std
+    lkls[true_msk] = lkl_f(models[true_msk])
+    archive["X"].append(models[true_msk])
+    archive["y"].append(lkls[true_msk])
+
+    return lkls
+
+
+def stretch_step(
+    log_prob_f,
+    pos: np.ndarray,
+    lp: np.ndarray,
+    rng: np.random.Generator,
+    a: float = 2.0,
+    log_prob_sur=None,
+) -> int:
+    """Move all the walkers of the ensemble one step with the stretch move of
+    Goodman & Weare (2010).
+
+    The walkers are split in two halves, and all the walkers in a half are moved
+    at once using the positions of the other half, so that ``log_prob_f`` is called
+    with a whole half of the ensemble at a time. The ``pos`` and ``lp`` arrays are
+    updated in place.
+
+    If ``log_prob_sur`` is given, the moves follow the delayed acceptance scheme of
+    Christen & Fox (2005): proposals are first screened with the cheap surrogate
+    log-probability and ``log_prob_f`` is only called for those that pass. The
+    second stage corrects for the surrogate, so the stationary distribution is
+    not changed.
+
+    :param log_prob_f: Function that receives an array of models (one per row) and
+        returns their log-probabilities.
+    :type log_prob_f: Callable
+    :param pos: Positions of the walkers, shape ``(N_walkers, N_dim)``.
+    :type pos: np.ndarray
+    :param lp: Log-probabilities of the walkers.
+    :type lp: np.ndarray
+    :param rng: Random number generator.
+    :type rng: np.random.Generator
+    :param a: Scale parameter of the stretch move, defaults to ``2``
+    :type a: float
+    :param log_prob_sur: Function with the same signature as ``log_prob_f`` that
+        returns surrogate log-probabilities, defaults to ``None``
+    :type log_prob_sur: Callable | None
+
+    :return: Number of accepted moves.
+    :rtype: int
+    """
+    N_walkers, N_dim = pos.shape
+    halves = (np.arange(0, N_walkers // 2), np.arange(N_walkers // 2, N_walkers))
+    N_accept = 0
+    for i in (0, 1):
+        S, C = halves[i], halves[1 - i]
+        # Stretch factors, sampled from g(z) ~ 1/sqrt(z) in [1/a, a]
+        z = ((a - 1.0) * rng.random(len(S)) + 1.0) ** 2 / a
+        partners = pos[rng.choice(C, len(S))]
+        proposal = partners + z[:, None] * (pos[S] - partners)
+        if log_prob_sur is None:
+            lp_new = log_prob_f(proposal)
+            with np.errstate(invalid="ignore"):
+                log_accept = (N_dim - 1) * np.log(z) + lp_new - lp[S]
+            accept = np.log(rng.random(len(S))) < log_accept
+        else:
+            # First stage with the surrogate, second stage with the true model
+            sur_diff = log_prob_sur(proposal) - log_prob_sur(pos[S])
+            log_u1, log_u2 = np.log(rng.random((2, len(S))))
+            with np.errstate(invalid="ignore"):
+                accept = log_u1 < (N_dim - 1) * np.log(z) + sur_diff
+            lp_new = np.full(len(S), -np.inf)
+            if accept.any():
+                lp_new[accept] = log_prob_f(proposal[accept])
+                with np.errstate(invalid="ignore"):
+                    accept &= log_u2 < lp_new - lp[S] - sur_diff
+        pos[S[accept]] = proposal[accept]
+        lp[S[accept]] = lp_new[accept]
+        N_accept += int(accept.sum())
+    return N_accept
+
+
+def stretch_sampler(
+    log_prob_f,
+    p0: np.ndarray,
+    N_steps: int,
+    rng: np.random.Generator,
+    a: float = 2.0,
+    log_prob_sur=None,
+) -> tuple[np.ndarray, np.ndarray, float]:
+    """Affine invariant ensemble sampler, see :py:func:`stretch_step`.
+
+    :param log_prob_f: Function that receives an array of models (one per row) and
+        returns their log-probabilities.
+    :type log_prob_f: Callable
+    :param p0: Initial positions of the walkers, shape ``(N_walkers, N_dim)``.
+    :type p0: np.ndarray
+    :param N_steps: Number of steps.
+    :type N_steps: int
+    :param rng: Random number generator.
+    :type rng: np.random.Generator
+    :param a: Scale parameter of the stretch move, defaults to ``2``
+    :type a: float
+    :param log_prob_sur: Surrogate log-probability function, see
+        :py:func:`stretch_step`, defaults to ``None``
+    :type log_prob_sur: Callable | None
+
+    :return: Chain of positions with shape ``(N_steps, N_walkers, N_dim)``, their
+        log-probabilities with shape ``(N_steps, N_walkers)``, and the fraction of
+        accepted moves.
+    :rtype: tuple[np.ndarray, np.ndarray, float]
+    """
+    N_walkers, N_dim = p0.shape
+    pos = p0.copy()
+    lp = log_prob_f(pos)
+
+    chain = np.empty((N_steps, N_walkers, N_dim))
+    lp_chain = np.empty((N_steps, N_walkers))
+    N_accept = 0
+    for step in range(N_steps):
+        N_accept += stretch_step(log_prob_f, pos, lp, rng, a, log_prob_sur)
+        chain[step] = pos
+        lp_chain[step] = lp
+
+    return chain, lp_chain, N_accept / (N_steps * N_walkers)
+
+
+def save_checkpoint(path: str, rng: np.random.Generator, **arrays) -> None:
+    """Store the state of a sampler in a ``.npz`` file.
+
+    The file is first written to a temporary file and then renamed, so that an
+    interrupted write never leaves a corrupted checkpoint.
+
+    :param path: Path to the checkpoint file.
+    :type path: str
+    :param rng: Random number generator, its state is stored.
+    :type rng: np.random.Generator
+    :param arrays: Arrays to store.
+    :type arrays: np.ndarray
+    """
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path, rng_state=np.array(json.dumps(rng.bit_generator.state)), **arrays
+    )
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str, rng: np.random.Generator) -> dict:
+    """Load the state of a sampler stored by :py:func:`save_checkpoint`.
+
+    :param path: Path to the checkpoint file.
+    :type path: str
+    :param rng: Random number generator, its state is restored.
+    :type rng: np.random.Generator
+
+    :return: Dictionary with the stored arrays.
+    :rtype: dict
+    """
+    with np.load(path) as data:
+        arrays = {k: data[k] for k in data.files if k != "rng_state"}
+        rng.bit_generator.state = json.loads(str(data["rng_state"]))
+    return arrays
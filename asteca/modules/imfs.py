@@ -1,12 +1,14 @@
 import numpy as np
-from scipy.interpolate import make_interp_spline, BSpline
+from scipy.special import erf, erfinv
 
 
-def invTrnsfSmpl(
-    IMF_name: str, m_low: float = 0.08, m_high: float = 100
-) -> BSpline:
+def invTrnsfSmpl(IMF_name: str, m_low: float = 0.08, m_high: float = 100) -> dict:
     """IMF inverse transform sampling.
 
+    The IMFs are split into segments where they are either a power law or (for
+    ``chabrier_2014``) a log-normal. Both have closed-form integrals and inverses,
+    so the CDF of the IMF is inverted exactly (see :py:func:`inv_cdf`).
+
     :param IMF_name: Name of the IMF to use.
     :type IMF_name: str
     :param m_low: Lower mass limit, defaults to 0.08
@@ -14,47 +16,185 @@ def invTrnsfSmpl(
     :param m_high: Higher mass limit, defaults to 100
     :type m_high: float
 
-    :return: Interpolated function of the inverse cumulative distribution function.
-    :rtype: BSpline
+    :return: Dictionary with the segments of the IMF (``segments``), the cumulative
+        (not normalized) number of stars at the edges of the segments (``N_edges``),
+        and the mean mass of the IMF (``mean_mass``).
+    :rtype: dict
     """
+    segments = imf_segments(IMF_name, m_low, m_high)
+
+    N_segs = [segment_number(seg, seg[2]) for seg in segments]
+    N_edges = np.cumsum([0.0] + N_segs)
+    mean_mass = sum(segment_mass(seg) for seg in segments) / N_edges[-1]
+
+    return {"segments": segments, "N_edges": N_edges, "mean_mass": mean_mass}
+
+
+def imf_segments(IMF_name: str, m_low: float, m_high: float) -> list[tuple]:
+    """Split the IMF into segments with closed-form integrals, following the
+    definitions in :py:func:`get_imf`.
 
-    # The lower mass region needs to be sampled more accurately
-    mass_values = list(np.linspace(m_low, 0.5, 100))
-    mass_values += list(np.linspace(0.501, 2, 75))
-    mass_values += list(np.linspace(2.01, 10, 50))
-    mass_values += list(np.linspace(10.01, m_high, 25))
-    mass_values = np.array(mass_values)
-
-    # DEPRECATED 12/01/25
-    #
-    # IMF_old = get_imf(IMF_name, m_low)
-    # CDF_samples, m_old, area_CDF = [], m_low, 0.0
-    # for m in mass_values[1:]:
-    #     # Approximate integral with rectangular area, and add to previous total area
-    #     IMF_new = get_imf(IMF_name, m)
-    #     area_CDF += 0.5 * (IMF_new + IMF_old) * (m - m_old)
-    #     CDF_samples.append(area_CDF)
-    #     IMF_old, m_old = IMF_new, m
-    # CDF_samples = np.array(CDF_samples) / max(CDF_samples)
-
-    # Approximate integral with rectangular area, and add to previous total area
-    # This is the length of the base of the rectangle
-    length = mass_values[1:] - mass_values[:-1]
-    # This is the average height of the rectangle
-    imf_val = get_imf(IMF_name, mass_values)
-    height = 0.5 * (imf_val[1:] + imf_val[:-1])
-    # Rectangle area
-    r_area = length * height
-    # Cumulative sum
-    CDF_samples = np.cumsum(r_area)
-    # Normalize
-    CDF_samples = CDF_samples / max(CDF_samples)
-
-    # k=1 is important otherwise the interpolator can become unstable for values
-    # close to 1 and return huge masses and even negative ones
-    inv_cdf = make_interp_spline(CDF_samples, mass_values[1:], k=1)
-
-    return inv_cdf
+    Each segment is a tuple ``(kind, m_a, m_b, pars)``, defined in the mass range
+    ``[m_a, m_b]``. For ``kind="power"`` the IMF is ``k * m**a``, with
+    ``pars=(k, a)``. For ``kind="lognormal"`` the IMF is
+    ``k / m * exp(-(log10(m) - y_c)**2 / (2 * sigma**2))``, with
+    ``pars=(k, y_c, sigma)``.
+
+    :param IMF_name: Name of the IMF to use.
+    :type IMF_name: str
+    :param m_low: Lower mass limit
+    :type m_low: float
+    :param m_high: Higher mass limit
+    :type m_high: float
+
+    :raises ValueError: If the IMF is not implemented.
+
+    :return: List of segments.
+    :rtype: list[tuple]
+    """
+    if IMF_name == "salpeter_1955":
+        pieces = [("power", 0.0, np.inf, (1.0, -2.35))]
+
+    elif IMF_name == "kroupa_2001":
+        alpha = [-0.3, -1.3, -2.3]
+        m0, m1, m2 = [0.01, 0.08, 0.5]
+        factor = [
+            (1.0 / m1) ** alpha[0],
+            (1.0 / m1) ** alpha[1],
+            ((m2 / m1) ** alpha[1]) * ((1.0 / m2) ** alpha[2]),
+        ]
+        pieces = [
+            ("power", m0, m1, (factor[0], alpha[0])),
+            ("power", m1, m2, (factor[1], alpha[1])),
+            ("power", m2, np.inf, (factor[2], alpha[2])),
+        ]
+
+    elif IMF_name == "chabrier_2014":
+        nc, mc = 11, 0.18
+        m0 = nc * mc
+        Ah, x = 0.649, 1.35
+        Al = Ah * nc ** (x / 2)
+        sigma_2 = np.log10(nc) / (x * np.log(10))
+        # Transformation from dN/log(m) --> dN/dm, see get_imf()
+        c = 0.434294
+        pieces = [
+            ("lognormal", 0.0, m0, (c * Al * m0 ** (-x), np.log10(mc), sigma_2**0.5)),
+            ("power", m0, np.inf, (c * Ah, -x - 1)),
+        ]
+
+    else:
+        raise ValueError(f"IMF {IMF_name} not implemented.")
+
+    # Restrict the segments to the [m_low, m_high] range
+    segments = []
+    for kind, m_a, m_b, pars in pieces:
+        m_a, m_b = max(m_a, m_low), min(m_b, m_high)
+        if m_a < m_b:
+            segments.append((kind, m_a, m_b, pars))
+
+    return segments
+
+
+def segment_number(segment: tuple, m: np.ndarray | float) -> np.ndarray | float:
+    """Number of stars (not normalized) in a segment of the IMF, between its lower
+    mass limit and ``m``.
+
+    :param segment: Segment of the IMF, see :py:func:`imf_segments`
+    :type segment: tuple
+    :param m: Masses within the segment
+    :type m: np.ndarray | float
+
+    :return: Number of stars.
+    :rtype: np.ndarray | float
+    """
+    kind, m_a, _, pars = segment
+    if kind == "power":
+        k, a = pars
+        return k / (a + 1) * (m ** (a + 1) - m_a ** (a + 1))
+
+    k, y_c, sigma = pars
+    # Integral in y=log10(m), where dm/m = ln(10) * dy
+    norm = k * np.log(10) * sigma * np.sqrt(np.pi / 2)
+    return norm * (
+        erf((np.log10(m) - y_c) / (sigma * np.sqrt(2)))
+        - erf((np.log10(m_a) - y_c) / (sigma * np.sqrt(2)))
+    )
+
+
+def segment_mass(segment: tuple) -> float:
+    """Total mass (not normalized) in a segment of the IMF.
+
+    :param segment: Segment of the IMF, see :py:func:`imf_segments`
+    :type segment: tuple
+
+    :return: Total mass.
+    :rtype: float
+    """
+    kind, m_a, m_b, pars = segment
+    if kind == "power":
+        k, a = pars
+        return k / (a + 2) * (m_b ** (a + 2) - m_a ** (a + 2))
+
+    k, y_c, sigma = pars
+    # Integral in y=log10(m) of 10**y times the Gaussian, obtained completing the
+    # square in the exponent
+    ln10 = np.log(10)
+    y_shift = y_c + sigma**2 * ln10
+    norm = k * ln10 * sigma * np.sqrt(np.pi / 2) * np.exp(ln10 * (y_c + y_shift) / 2)
+    return norm * (
+        erf((np.log10(m_b) - y_shift) / (sigma * np.sqrt(2)))
+        - erf((np.log10(m_a) - y_shift) / (sigma * np.sqrt(2)))
+    )
+
+
+def segment_inverse(segment: tuple, N: np.ndarray) -> np.ndarray:
+    """Inverse of :py:func:`segment_number`: masses for which the number of stars
+    in the segment equals ``N``.
+
+    :param segment: Segment of the IMF, see :py:func:`imf_segments`
+    :type segment: tuple
+    :param N: Number of stars, within the range of the segment
+    :type N: np.ndarray
+
+    :return: Masses.
+    :rtype: np.ndarray
+    """
+    kind, m_a, _, pars = segment
+    if kind == "power":
+        k, a = pars
+        return (m_a ** (a + 1) + (a + 1) * N / k) ** (1 / (a + 1))
+
+    k, y_c, sigma = pars
+    norm = k * np.log(10) * sigma * np.sqrt(np.pi / 2)
+    z_a = erf((np.log10(m_a) - y_c) / (sigma * np.sqrt(2)))
+    z = erfinv(np.clip(z_a + N / norm, -1.0, 1.0))
+    return 10 ** (y_c + sigma * np.sqrt(2) * z)
+
+
+def inv_cdf(imf_data: dict, u: np.ndarray) -> np.ndarray:
+    """Inverse of the cumulative distribution function of the IMF.
+
+    :param imf_data: IMF data generated by :py:func:`invTrnsfSmpl`
+    :type imf_data: dict
+    :param u: Values in the ``[0, 1)`` range
+    :type u: np.ndarray
+
+    :return: Masses.
+    :rtype: np.ndarray
+    """
+    N_edges = imf_data["N_edges"]
+    N = u * N_edges[-1]
+    # Segment that contains each value
+    seg_idx = np.searchsorted(N_edges, N, side="right") - 1
+    seg_idx = np.clip(seg_idx, 0, len(imf_data["segments"]) - 1)
+
+    masses = np.empty_like(N)
+    for i, segment in enumerate(imf_data["segments"]):
+        msk = seg_idx == i
+        masses[msk] = segment_inverse(segment, N[msk] - N_edges[i])
+    # Avoid rounding errors at the edges of the segments
+    segments = imf_data["segments"]
+    return np.clip(masses, segments[0][1], segments[-1][2])
 
 
 def get_imf(IMF_name: str, m_star_array: np.ndarray) -> np.ndarray:
@@ -138,37 +278,36 @@ def get_imf(IMF_name: str, m_star_array: np.ndarray) -> np.ndarray:
 def sampleInv(
     rng: np.random.Generator,
     Max_mass: float,
-    inv_cdf: BSpline,
-    N_chunk: int,
+    imf_data: dict,
 ) -> np.ndarray:
     """Sample the inverse CDF up to `Max_mass`
 
+    The number of stars required is predicted from the mean mass of the IMF, so
+    that (almost always) all the masses are sampled at once.
+
     :param rng: Random number generator.
     :type rng: np.random.Generator
     :param Max_mass: Maximum mass to sample.
     :type Max_mass: float
-    :param inv_cdf: Interpolated function of the inverse cumulative distribution function.
-    :type inv_cdf: BSpline
-    :param N_chunk: Integer that controls the while loop that samples masses in chunks
-    :type N_chunk: int
+    :param imf_data: IMF data generated by :py:func:`invTrnsfSmpl`
+    :type imf_data: dict
 
     :return: Array of sampled masses.
     :rtype: np.ndarray
     """
+    # Predicted number of stars plus a margin that covers the random fluctuations
+    # of the total mass
+    N_stars = int(1.1 * Max_mass / imf_data["mean_mass"]) + 100
+
+    mass_samples = inv_cdf(imf_data, rng.uniform(0.0, 1.0, N_stars))
+    Mass_tot = np.cumsum(mass_samples)
+    # Rarely, the total mass is not reached
+    while Mass_tot[-1] < Max_mass:
+        masses = inv_cdf(imf_data, rng.uniform(0.0, 1.0, N_stars // 10))
+        mass_samples = np.concatenate([mass_samples, masses])
+        Mass_tot = np.cumsum(mass_samples)
+
+    # Keep the stars up to the one that reaches the total mass
+    N_stars = np.searchsorted(Mass_tot, Max_mass) + 1
 
-    # DEPRECATED 13/01/25
-    # def sampled_inv_cdf(N):
-    #     # The internal seed can not be 'self.seed' because otherwise all the
-    #     # floats returned are equal
-    #     # mr = np.random.default_rng(ijkseed).uniform(0.0, 1.0, N)
-    #     return inv_cdf(mr)
-
-    # TODO: make this faster?
-    k, Mass_tot, mass_samples = 0, 0, []
-    while Mass_tot < Max_mass:
-        masses = list(inv_cdf(rng.uniform(0.0, 1.0, N_chunk)))
-        mass_samples += masses
-        Mass_tot += sum(masses)
-        k += 1
-
-    return np.array(mass_samples)
+    return mass_samples[:N_stars]
@@ -1,4 +1,9 @@
+import hashlib
+import json
 import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
@@ -53,9 +58,14 @@ def load(
     column_names: dict | None,
     N_interp: int,
     parsec_rm_stage_9: bool,
+    cache_dir: str | None = None,
+    n_jobs: int = 1,
 ) -> tuple[np.ndarray, list, dict, int]:
     """Load the theoretical isochrones and return processed data.
 
+    If ``cache_dir`` is given, the processed data is stored in a binary cache the
+    first time the files are read, and loaded from it afterwards.
+
     :param model: The model must be one of the supported isochrone services.
     :type model: str
     :param isochs_path: Path to the isochrone files.
@@ -75,6 +85,10 @@ def load(
     :param parsec_rm_stage_9: Flag to indicate whether to remove post-AGB stage for
         PARSEC models, defaults to True
     :type parsec_rm_stage_9: bool
+    :param cache_dir: Path to the folder where the cache is stored, defaults to None
+    :type cache_dir: str | None
+    :param n_jobs: Number of processes used to read the files, defaults to 1
+    :type n_jobs: int
 
     :raises ValueError: If there is a shape mismatch in the loaded isochrones
 
@@ -88,6 +102,22 @@ def load(
 
     f_paths = extract_paths(isochs_path)
 
+    cache_path = None
+    if cache_dir is not None:
+        key = cache_key(
+            model,
+            f_paths,
+            magnitude,
+            color,
+            color2,
+            column_names,
+            N_interp,
+            parsec_rm_stage_9,
+        )
+        cache_path = os.path.join(cache_dir, key)
+        if os.path.isdir(cache_path):
+            return cache_load(cache_path)
+
     # isochrones.shape = (N_photsyst, N_z, N_a, N_interp, N_cols)
     # met_age_arr.shape = (N_photsyst, N_z*N_a, 2)
     met_age_vals, isoch_dataframes = read(
@@ -97,6 +127,7 @@ def load(
         met_col,
         age_col,
         cols_keep,
+        n_jobs,
     )
 
     isochrones = interp_df(N_interp, met_age_vals, isoch_dataframes)
@@ -123,9 +154,177 @@ def load(
         magnitude, color, color2, mass_col, isochrones
     )
 
+    if cache_path is not None:
+        cache_save(cache_path, theor_tracks, color_filters, met_age_dict, len(f_paths))
+
     return theor_tracks, color_filters, met_age_dict, len(f_paths)
 
 
+def cache_key(
+    model: str,
+    f_paths: list,
+    magnitude: str,
+    color: tuple,
+    color2: tuple | None,
+    column_names: dict | None,
+    N_interp: int,
+    parsec_rm_stage_9: bool,
+) -> str:
+    """Generate the key that identifies a cache of processed isochrones.
+
+    The key changes if any of the files is modified, or if any of the arguments
+    used to process the files changes.
+
+    :param model: Isochrone model name.
+    :type model: str
+    :param f_paths: List of isochrone file paths.
+    :type f_paths: list
+    :param magnitude: Magnitude filter to load.
+    :type magnitude: str
+    :param color: Tuple with the two filters to generate the first color.
+    :type color: tuple
+    :param color2: Tuple with the two filters to generate the second color.
+    :type color2: tuple | None
+    :param column_names: Dictionary with the column names for the isochrones.
+    :type column_names: dict | None
+    :param N_interp: Number of points to interpolate.
+    :type N_interp: int
+    :param parsec_rm_stage_9: Remove post-AGB stage for PARSEC models.
+    :type parsec_rm_stage_9: bool
+
+    :return: Hexadecimal hash
+    :rtype: str
+    """
+    files = []
+    for file_path in sorted(f_paths):
+        f_stat = os.stat(file_path)
+        files.append([os.path.abspath(file_path), f_stat.st_mtime_ns, f_stat.st_size])
+
+    key_data = {
+        "model": model,
+        "files": files,
+        "magnitude": magnitude,
+        "color": color,
+        "color2": color2,
+        "column_names": column_names,
+        "N_interp": N_interp,
+        "parsec_rm_stage_9": parsec_rm_stage_9,
+    }
+    key_str = json.dumps(key_data, sort_keys=True)
+
+    return hashlib.sha1(key_str.encode()).hexdigest()
+
+
+def cache_save(
+    cache_path: str,
+    theor_tracks: np.ndarray,
+    color_filters: list,
+    met_age_dict: dict,
+    N_files: int,
+) -> None:
+    """Store the processed isochrones in the ``cache_path`` folder as ``.npy`` files.
+
+    The files are written to a temporary folder first, which is then renamed. This
+    way several processes can write the same cache without leaving partial files.
+
+    :param cache_path: Path to the cache folder.
+    :type cache_path: str
+    :param theor_tracks: Array of isochrones.
+    :type theor_tracks: np.ndarray
+    :param color_filters: Individual filters for each color defined.
+    :type color_filters: list
+    :param met_age_dict: Dictionary with metallicities and ages.
+    :type met_age_dict: dict
+    :param N_files: Number of files read.
+    :type N_files: int
+    """
+    filters, filters_arr = filters_array(color_filters)
+
+    parent_dir = os.path.dirname(os.path.abspath(cache_path))
+    os.makedirs(parent_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent_dir)
+    np.save(os.path.join(tmp_path, "theor_tracks.npy"), theor_tracks)
+    np.save(os.path.join(tmp_path, "color_filters.npy"), filters_arr)
+    np.save(os.path.join(tmp_path, "met.npy"), met_age_dict["met"])
+    np.save(os.path.join(tmp_path, "loga.npy"), met_age_dict["loga"])
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({"filters": filters, "N_files": N_files}, f)
+
+    try:
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        # The cache was already stored by another process
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def cache_load(cache_path: str) -> tuple[np.ndarray, list, dict, int]:
+    """Load the processed isochrones stored in the ``cache_path`` folder.
+
+    The large arrays are memory mapped (read-only), so only the parts that are
+    actually used are read from disk.
+
+    :param cache_path: Path to the cache folder.
+    :type cache_path: str
+
+    :return: Array of isochrones, individual filters for each color defined,
+        dictionary with metallicities and ages, and number of files read.
+    :rtype: tuple[np.ndarray, list, dict, int]
+    """
+    with open(os.path.join(cache_path, "meta.json")) as f:
+        meta = json.load(f)
+    theor_tracks = np.load(os.path.join(cache_path, "theor_tracks.npy"), mmap_mode="r")
+    filters_arr = np.load(os.path.join(cache_path, "color_filters.npy"), mmap_mode="r")
+    met_age_dict = {
+        "met": np.load(os.path.join(cache_path, "met.npy")),
+        "loga": np.load(os.path.join(cache_path, "loga.npy")),
+    }
+
+    color_filters = filters_dicts(meta["filters"], filters_arr)
+
+    return theor_tracks, color_filters, met_age_dict, meta["N_files"]
+
+
+def filters_array(color_filters: list) -> tuple[list, np.ndarray]:
+    """Convert the individual filters for each color into a single array.
+
+    :param color_filters: Individual filters for each color defined.
+    :type color_filters: list
+
+    :return: Names of the filters, and array of filters with shape
+        ``(N_met, N_age, N_filters, N_interp)``.
+    :rtype: tuple[list, np.ndarray]
+    """
+    filters = list(color_filters[0][0].keys())
+    filters_arr = np.array(
+        [
+            [[np.asarray(age_dict[f]) for f in filters] for age_dict in met_lst]
+            for met_lst in color_filters
+        ]
+    )
+    return filters, filters_arr
+
+
+def filters_dicts(filters: list, filters_arr: np.ndarray) -> list:
+    """Convert the array generated by :py:func:`filters_array` back into the
+    individual filters for each color. The arrays are views of ``filters_arr``.
+
+    :param filters: Names of the filters.
+    :type filters: list
+    :param filters_arr: Array of filters.
+    :type filters_arr: np.ndarray
+
+    :return: Individual filters for each color defined.
+    :rtype: list
+    """
+    color_filters = []
+    for met_arr in filters_arr:
+        met_lst = []
+        for age_arr in met_arr:
+            met_lst.append(dict(zip(filters, age_arr)))
+        color_filters.append(met_lst)
+    return color_filters
+
+
 def get_columns(
     column_names: dict | None,
     model: str,
@@ -211,10 +410,15 @@ def read(
     met_col: str,
     age_col: str,
     cols_keep: list,
+    n_jobs: int = 1,
 ) -> tuple[list[str], list[pd.DataFrame]]:
     """Read isochrone files and store them as pandas DataFrame along with its associated
     metallicity and age values.
 
+    If ``n_jobs > 1`` the files are parsed concurrently by a pool of processes. The
+    results are merged in the same order of ``f_paths``, so the output is identical
+    to the one obtained parsing the files one after another.
+
     :param model: Isochrone model name.
     :type model: str
     :param parsec_rm_stage_9: Remove post-AGB stage for PARSEC models.
@@ -227,69 +431,128 @@ def read(
     :type age_col: str
     :param cols_keep: List of columns to keep.
     :type cols_keep: list
+    :param n_jobs: Number of processes used to read the files, defaults to 1
+    :type n_jobs: int
 
     :return: First list contains the met and age values (as strings), second list
      contains the associated isochrones as pandas DataFrames
     :rtype: tuple[list[str], list[pd.DataFrame]]
     """
+    N_files = len(f_paths)
+    args = (
+        [model] * N_files,
+        [parsec_rm_stage_9] * N_files,
+        f_paths,
+        [met_col] * N_files,
+        [age_col] * N_files,
+        [cols_keep] * N_files,
+    )
+    if n_jobs > 1 and N_files > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, N_files)) as executor:
+            files_data = list(executor.map(read_file, *args))
+    else:
+        files_data = list(map(read_file, *args))
 
     met_age_vals, isoch_dataframes = [], []
-    for file_path in f_paths:
-        # Extract columns names and full header
-        col_names, full_header = get_header(model, file_path)
-
-        # Columns to keep for this photometric system
-        cols_keep_ps = list(set(col_names) & set(cols_keep))
-
-        # Load file
-        df_file_path = pd.read_csv(
-            file_path,
-            comment=phot_systs_data[model]["comment_char"],
-            header=None,
-            names=col_names,
-            sep=phot_systs_data[model]["sep_cols"],
-        )
+    for file_met_age, file_dfs in files_data:
+        met_age_vals += file_met_age
+        isoch_dataframes += file_dfs
 
-        if model == "PARSEC":
-            # Group by metallicity
-            df_blocks = df_file_path.groupby(met_col, sort=False)
-            # Process metallicity blocks
-            for _, met_df in df_blocks:
-                # Group by age
-                age_blocks = met_df.groupby(age_col, sort=False)
-                for _, df in age_blocks:
-                    # Remove post-AGB stage
-                    if parsec_rm_stage_9 is True:
-                        phot_systs_data[model]["parsec_stage_9_col"]
-                        msk = (
-                            df[phot_systs_data[model]["parsec_stage_9_col"]]
-                            != phot_systs_data[model]["parsec_stage_9_id"]
-                        )
-                        df = df[msk]
-                    # Extract met, age values (use first element, all are equal in
-                    # column)
-                    met = str(np.array(df[met_col])[0])
-                    age = str(np.array(df[age_col])[0])
-                    # Store data
-                    met_age_vals.append([met, age])
-                    isoch_dataframes.append(df[cols_keep_ps].astype(float))
-
-        elif model == "MIST":
-            met = get_MIST_z_val(met_col, full_header)
+    return met_age_vals, isoch_dataframes
+
+
+def read_file(
+    model: str,
+    parsec_rm_stage_9: bool,
+    file_path: str,
+    met_col: str,
+    age_col: str,
+    cols_keep: list,
+) -> tuple[list[str], list[pd.DataFrame]]:
+    """Read a single isochrone file.
+
+    :param model: Isochrone model name.
+    :type model: str
+    :param parsec_rm_stage_9: Remove post-AGB stage for PARSEC models.
+    :type parsec_rm_stage_9: bool
+    :param file_path: Isochrone file path.
+    :type file_path: str
+    :param met_col: Metallicity column name.
+    :type met_col: str
+    :param age_col: Age column name.
+    :type age_col: str
+    :param cols_keep: List of columns to keep.
+    :type cols_keep: list
+
+    :return: First list contains the met and age values (as strings), second list
+     contains the associated isochrones as pandas DataFrames
+    :rtype: tuple[list[str], list[pd.DataFrame]]
+    """
+    met_age_vals, isoch_dataframes = [], []
+
+    # Extract columns names and full header
+    col_names, full_header = get_header(model, file_path)
+
+    # Columns to keep for this photometric system
+    cols_keep_ps = list(set(col_names) & set(cols_keep))
+
+    # Only parse the columns that are used. Isochrone files contain dozens of
+    # filters that are never used, reading them wastes both time and memory
+    cols_read = set(cols_keep_ps) | {met_col, age_col}
+    if model == "PARSEC" and parsec_rm_stage_9 is True:
+        cols_read.add(phot_systs_data[model]["parsec_stage_9_col"])
+    usecols = [_ for _ in col_names if _ in cols_read]
+
+    # Load file
+    df_file_path = pd.read_csv(
+        file_path,
+        comment=phot_systs_data[model]["comment_char"],
+        header=None,
+        names=col_names,
+        usecols=usecols,
+        sep=phot_systs_data[model]["sep_cols"],
+    )
+
+    if model == "PARSEC":
+        # Group by metallicity
+        df_blocks = df_file_path.groupby(met_col, sort=False)
+        # Process metallicity blocks
+        for _, met_df in df_blocks:
             # Group by age
-            df_blocks = df_file_path.groupby(age_col, sort=False)
-            # Process age blocks
-            for _, df in df_blocks:
-                age = str(df[age_col].values[0])
+            age_blocks = met_df.groupby(age_col, sort=False)
+            for _, df in age_blocks:
+                # Remove post-AGB stage
+                if parsec_rm_stage_9 is True:
+                    phot_systs_data[model]["parsec_stage_9_col"]
+                    msk = (
+                        df[phot_systs_data[model]["parsec_stage_9_col"]]
+                        != phot_systs_data[model]["parsec_stage_9_id"]
+                    )
+                    df = df[msk]
+                # Extract met, age values (use first element, all are equal in
+                # column)
+                met = str(np.array(df[met_col])[0])
+                age = str(np.array(df[age_col])[0])
                 # Store data
                 met_age_vals.append([met, age])
                 isoch_dataframes.append(df[cols_keep_ps].astype(float))
 
-        elif model == "BASTI":
-            met, age = get_BASTI_z_a_val(full_header, met_col, age_col)
+    elif model == "MIST":
+        met = get_MIST_z_val(met_col, full_header)
+        # Group by age
+        df_blocks = df_file_path.groupby(age_col, sort=False)
+        # Process age blocks
+        for _, df in df_blocks:
+            age = str(df[age_col].values[0])
             # Store data
             met_age_vals.append([met, age])
-            isoch_dataframes.append(df_file_path[cols_keep_ps].astype(float))
+            isoch_dataframes.append(df[cols_keep_ps].astype(float))
+
+    elif model == "BASTI":
+        met, age = get_BASTI_z_a_val(full_header, met_col, age_col)
+        # Store data
+        met_age_vals.append([met, age])
+        isoch_dataframes.append(df_file_path[cols_keep_ps].astype(float))
 
     return met_age_vals, isoch_dataframes
 
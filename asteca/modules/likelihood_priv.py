@@ -104,6 +104,306 @@ def bin_edges_f(
     return ranges, Nbins
 
 
+def loggamma_table(N_max: int) -> np.ndarray:
+    """Table of ``loggamma(k + 0.5)`` values for the integer counts ``k=0..N_max``.
+
+    :param N_max: Largest count stored in the table.
+    :type N_max: int
+
+    :return: Table of log-gamma values, indexed by count.
+    :rtype: np.ndarray
+    """
+    return loggamma(np.arange(N_max + 1) + 0.5)
+
+
+def loggamma_half(counts: np.ndarray, lgamma_tbl: np.ndarray | None) -> np.ndarray:
+    """Evaluate ``loggamma(counts + 0.5)`` for an array of integer counts.
+
+    The values are read from the ``lgamma_tbl`` table generated by
+    :py:func:`loggamma_table`. Counts larger than those stored in the table (or all
+    of them if no table is given) are evaluated with ``scipy.special.loggamma``.
+
+    :param counts: Array of integer counts, of either ``int`` or ``float`` type.
+    :type counts: np.ndarray
+    :param lgamma_tbl: Table of log-gamma values, or ``None``.
+    :type lgamma_tbl: np.ndarray | None
+
+    :return: Log-gamma values.
+    :rtype: np.ndarray
+    """
+    if lgamma_tbl is None:
+        return loggamma(counts + 0.5)
+
+    idx = counts.astype(int, copy=False)
+    msk = idx >= lgamma_tbl.size
+    if not msk.any():
+        return lgamma_tbl[idx]
+
+    lgamma = np.empty(idx.shape)
+    lgamma[~msk] = lgamma_tbl[idx[~msk]]
+    lgamma[msk] = loggamma(counts[msk] + 0.5)
+    return lgamma
+
+
+def bin_idx(rng: list, Nbin: int, vals: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Bin index of each value along one dimension of the Hess diagram.
+
+    The binning is identical to the one applied by ``fast_histogram.histogram2d``:
+    values outside of the ``[min, max)`` range (or ``nan``) are masked out, and
+    values that are rounded up to the last edge are assigned to the last bin.
+
+    :param rng: Range (min, max) of this dimension.
+    :type rng: list
+    :param Nbin: Number of bins of this dimension.
+    :type Nbin: int
+    :param vals: Array of values to bin.
+    :type vals: np.ndarray
+
+    :return: Bin indexes, and mask of values within the range.
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+    with np.errstate(invalid="ignore"):
+        msk = (vals >= rng[0]) & (vals < rng[1])
+    idx = ((vals[msk] - rng[0]) * (Nbin / (rng[1] - rng[0]))).astype(int)
+    np.minimum(idx, Nbin - 1, out=idx)
+    return idx, msk
+
+
+def synth_hess(ranges: list, Nbins: list, synth_clust: np.ndarray) -> np.ndarray:
+    """Flattened Hess diagram(s) of a synthetic cluster.
+
+    Equivalent to generating a ``histogram2d`` for each color and concatenating the
+    flattened arrays, but the stars are binned directly into a single array of counts
+    with the same layout as the one generated by :py:func:`lkl_data`.
+
+    :param ranges: Per-dimension ranges.
+    :type ranges: list
+    :param Nbins: Per-dimension total number of bins
+    :type Nbins: list
+    :param synth_clust: Synthetic cluster data.
+    :type synth_clust: np.ndarray
+
+    :return: Flattened Hess diagram(s) with the counts of synthetic stars.
+    :rtype: np.ndarray
+    """
+    mag, colors = synth_clust[0], synth_clust[1:]
+    mag_idx, mag_msk = bin_idx(ranges[0], Nbins[0], mag)
+
+    N_cells = [Nbins[0] * Nbins[i + 1] for i in range(len(colors))]
+    syn_histo_f = np.empty(sum(N_cells), dtype=int)
+    j0 = 0
+    for i, col in enumerate(colors):
+        col_idx, col_msk = bin_idx(ranges[i + 1], Nbins[i + 1], col[mag_msk])
+        cell_idx = mag_idx[col_msk] * Nbins[i + 1] + col_idx
+        syn_histo_f[j0 : j0 + N_cells[i]] = np.bincount(cell_idx, minlength=N_cells[i])
+        j0 += N_cells[i]
+
+    return syn_histo_f
+
+
+def cell_slots(cl_z_idx: np.ndarray) -> np.ndarray:
+    """Table that maps each cell of the flattened Hess diagram(s) to its position
+    (slot) in the array of bins where stars were observed.
+
+    Cells with no observed stars are all mapped to the same extra slot, equal to
+    the number of occupied cells.
+
+    :param cl_z_idx: Index of bins where the number of stars is not 0
+    :type cl_z_idx: np.ndarray
+
+    :return: Slot of each cell.
+    :rtype: np.ndarray
+    """
+    N_slots = np.count_nonzero(cl_z_idx)
+    cell_slot = np.full(cl_z_idx.size, N_slots, dtype=np.intp)
+    cell_slot[cl_z_idx] = np.arange(N_slots)
+    return cell_slot
+
+
+def synth_hess_sparse(
+    ranges: list,
+    Nbins: list,
+    cell_slot: np.ndarray,
+    N_slots: int,
+    synth_clust: np.ndarray,
+) -> np.ndarray:
+    """Counts of synthetic stars in the bins where stars were observed.
+
+    Equivalent to ``synth_hess(ranges, Nbins, synth_clust)[cl_z_idx]``, but the
+    stars are mapped through the ``cell_slot`` table directly into the occupied
+    bins, so the full Hess diagram(s) is never generated. Stars that fall in bins
+    with no observed stars are all counted in a single extra slot, which is
+    discarded.
+
+    :param ranges: Per-dimension ranges.
+    :type ranges: list
+    :param Nbins: Per-dimension total number of bins
+    :type Nbins: list
+    :param cell_slot: Slot of each cell, generated by :py:func:`cell_slots`
+    :type cell_slot: np.ndarray
+    :param N_slots: Number of bins where stars were observed
+    :type N_slots: int
+    :param synth_clust: Synthetic cluster data.
+    :type synth_clust: np.ndarray
+
+    :return: Counts of synthetic stars in the bins where stars were observed.
+    :rtype: np.ndarray
+    """
+    mag, colors = synth_clust[0], synth_clust[1:]
+    mag_idx, mag_msk = bin_idx(ranges[0], Nbins[0], mag)
+
+    slots = []
+    j0 = 0
+    for i, col in enumerate(colors):
+        col_idx, col_msk = bin_idx(ranges[i + 1], Nbins[i + 1], col[mag_msk])
+        slots.append(cell_slot[j0 + mag_idx[col_msk] * Nbins[i + 1] + col_idx])
+        j0 += Nbins[0] * Nbins[i + 1]
+
+    return np.bincount(np.concatenate(slots), minlength=N_slots + 1)[:N_slots]
+
+
+def synth_hess_batch(
+    ranges: list,
+    Nbins: list,
+    synth_clusts: list,
+    cell_slot: np.ndarray | None = None,
+    N_slots: int = 0,
+    N_chunk: int = 20000,
+) -> np.ndarray:
+    """Flattened Hess diagram(s) of several synthetic clusters.
+
+    The clusters are binned in chunks of consecutive clusters. Within a chunk the
+    cell index of each star is offset by the index of its cluster times the number
+    of cells, so that a single ``np.bincount`` generates all the histograms. Each
+    row of the returned array is equal to the array returned by
+    :py:func:`synth_hess` for that cluster.
+
+    :param ranges: Per-dimension ranges.
+    :type ranges: list
+    :param Nbins: Per-dimension total number of bins
+    :type Nbins: list
+    :param synth_clusts: List of (non empty) synthetic clusters.
+    :type synth_clusts: list
+    :param cell_slot: Slot of each cell, generated by :py:func:`cell_slots`. If
+        given, only the counts in the bins where stars were observed are returned
+        (as done by :py:func:`synth_hess_sparse`), defaults to ``None``
+    :type cell_slot: np.ndarray | None
+    :param N_slots: Number of bins where stars were observed, only used if
+        ``cell_slot`` is given, defaults to ``0``
+    :type N_slots: int
+    :param N_chunk: Approximate number of stars binned in each pass. Keeping the
+        chunks small enough to fit in the CPU cache is faster than binning all the
+        clusters at once, defaults to ``20000``
+    :type N_chunk: int
+
+    :return: Flattened Hess diagram(s) with the counts of synthetic stars, one row
+        per synthetic cluster.
+    :rtype: np.ndarray
+    """
+    N_cells = [Nbins[0] * Nbins[i + 1] for i in range(len(Nbins) - 1)]
+    if cell_slot is None:
+        syn_histo_f = np.empty((len(synth_clusts), sum(N_cells)), dtype=int)
+    else:
+        syn_histo_f = np.empty((len(synth_clusts), N_slots), dtype=int)
+
+    N_stars = np.cumsum([_.shape[1] for _ in synth_clusts])
+    i0 = 0
+    while i0 < len(synth_clusts):
+        # Index of the last cluster in this chunk
+        N_prev = N_stars[i0 - 1] if i0 > 0 else 0
+        i1 = max(i0 + 1, int(np.searchsorted(N_stars, N_prev + N_chunk, "right")))
+        chunk = synth_clusts[i0:i1]
+        N_models = len(chunk)
+
+        all_stars = np.concatenate(chunk, axis=1)
+        model_idx = np.repeat(np.arange(N_models), [_.shape[1] for _ in chunk])
+
+        mag, colors = all_stars[0], all_stars[1:]
+        mag_idx, mag_msk = bin_idx(ranges[0], Nbins[0], mag)
+        model_idx = model_idx[mag_msk]
+
+        if cell_slot is not None:
+            # Stars in bins with no observed stars go to the extra slot N_slots
+            slots = []
+            j0 = 0
+            for i, col in enumerate(colors):
+                col_idx, col_msk = bin_idx(ranges[i + 1], Nbins[i + 1], col[mag_msk])
+                slot_idx = cell_slot[j0 + mag_idx[col_msk] * Nbins[i + 1] + col_idx]
+                slots.append(slot_idx + model_idx[col_msk] * (N_slots + 1))
+                j0 += N_cells[i]
+            syn_histo_f[i0:i1] = np.bincount(
+                np.concatenate(slots), minlength=N_models * (N_slots + 1)
+            ).reshape(N_models, N_slots + 1)[:, :N_slots]
+            i0 = i1
+            continue
+
+        j0 = 0
+        for i, col in enumerate(colors):
+            col_idx, col_msk = bin_idx(ranges[i + 1], Nbins[i + 1], col[mag_msk])
+            cell_idx = mag_idx[col_msk] * Nbins[i + 1] + col_idx
+            cell_idx += model_idx[col_msk] * N_cells[i]
+            syn_histo_f[i0:i1, j0 : j0 + N_cells[i]] = np.bincount(
+                cell_idx, minlength=N_models * N_cells[i]
+            ).reshape(N_models, N_cells[i])
+            j0 += N_cells[i]
+
+        i0 = i1
+
+    return syn_histo_f
+
+
+def tremmel_batch(
+    cl_histo_f_z: np.ndarray,
+    max_lkl: float,
+    syn_histo_f_z: np.ndarray,
+    lgamma_tbl: np.ndarray | None = None,
+) -> np.ndarray:
+    """Poisson likelihood ratio evaluated on several binned synthetic clusters at
+    once. See :py:func:`tremmel`.
+
+    :param cl_histo_f_z: Flattened observed Hess diagram with the empty bins removed
+    :type cl_histo_f_z: np.ndarray
+    :param max_lkl: Maximum likelihood value, used for normalization
+    :type max_lkl: float
+    :param syn_histo_f_z: Flattened synthetic Hess diagrams with the bins where no
+        stars were observed removed, one row per synthetic cluster
+    :type syn_histo_f_z: np.ndarray
+    :param lgamma_tbl: Table of ``loggamma(k + 0.5)`` values generated by
+        :py:func:`loggamma_table`, defaults to ``None``
+    :type lgamma_tbl: np.ndarray | None
+
+    :return: Log likelihood values.
+    :rtype: np.ndarray
+    """
+    # Row-contiguous counts so that each row is summed in the same order as the
+    # 1D array in tremmel_hess()
+    syn_histo_f_z = np.ascontiguousarray(syn_histo_f_z)
+    SumLogGamma = np.sum(
+        loggamma_half(cl_histo_f_z + syn_histo_f_z, lgamma_tbl)
+        - loggamma_half(syn_histo_f_z, lgamma_tbl),
+        axis=1,
+    )
+    tremmel_lkl = SumLogGamma - 0.693 * syn_histo_f_z.sum(axis=1)
+
+    return 1 - tremmel_lkl / max_lkl
+
+
+def chi_square_batch(cl_histo_f_z: np.ndarray, syn_histo_f_z: np.ndarray) -> np.ndarray:
+    """Chi-square values evaluated on several binned synthetic clusters at once.
+    See :py:func:`chi_square`.
+
+    :param cl_histo_f_z: Flattened observed Hess diagram with the empty bins removed
+    :type cl_histo_f_z: np.ndarray
+    :param syn_histo_f_z: Flattened synthetic Hess diagrams with the bins where no
+        stars were observed removed, one row per synthetic cluster
+    :type syn_histo_f_z: np.ndarray
+
+    :return: Chi-square values.
+    :rtype: np.ndarray
+    """
+    return ((cl_histo_f_z - syn_histo_f_z) ** 2).sum(axis=1)
+
+
 def tremmel(
     ranges: list,
     Nbins: list,
@@ -111,6 +411,8 @@ def tremmel(
     cl_histo_f_z: np.ndarray,
     max_lkl: float,
     synth_clust: np.ndarray,
+    lgamma_tbl: np.ndarray | None = None,
+    cell_slot: np.ndarray | None = None,
 ) -> float:
     r"""Poisson likelihood ratio as defined in Tremmel et al (2013), Eq 10 with
     v_{i,j}=1. This returns the log likelihood.
@@ -159,6 +461,13 @@ def tremmel(
     :type max_lkl: float
     :param synth_clust: Synthetic cluster data.
     :type synth_clust: np.ndarray
+    :param lgamma_tbl: Table of ``loggamma(k + 0.5)`` values generated by
+        :py:func:`loggamma_table`, defaults to ``None``
+    :type lgamma_tbl: np.ndarray | None
+    :param cell_slot: Slot of each cell, generated by :py:func:`cell_slots`. If
+        given, the synthetic stars are binned only into the bins where stars were
+        observed (see :py:func:`synth_hess_sparse`), defaults to ``None``
+    :type cell_slot: np.ndarray | None
 
     :return: Log likelihood value.
     :rtype: float
@@ -167,32 +476,48 @@ def tremmel(
     if not synth_clust.any():
         return -1.0e09
 
-    # Obtain histogram for the synthetic cluster.
-    mag, colors = synth_clust[0], synth_clust[1:]
-    syn_histo_f = []
-    for i, col in enumerate(colors):
-        # hess_diag = np.histogram2d(
-        #     mag, col, bins=[
-        #         self.bin_edges[0]] + [self.bin_edges[i + 1]])[0]
-        hess_diag = histogram2d(
-            mag,
-            col,
-            range=[
-                [ranges[0][0], ranges[0][1]],
-                [ranges[i + 1][0], ranges[i + 1][1]],
-            ],
-            bins=[Nbins[0], Nbins[i + 1]],
+    # Obtain histogram for the synthetic cluster, and remove all bins where
+    # n_i = 0 (no observed stars).
+    if cell_slot is None:
+        syn_histo_f_z = synth_hess(ranges, Nbins, synth_clust)[cl_z_idx]
+    else:
+        syn_histo_f_z = synth_hess_sparse(
+            ranges, Nbins, cell_slot, cl_histo_f_z.size, synth_clust
         )
 
-        # Flatten array
-        syn_histo_f += list(hess_diag.ravel())
-    syn_histo_f = np.array(syn_histo_f)
+    return tremmel_hess(cl_histo_f_z, max_lkl, syn_histo_f_z, lgamma_tbl)
+
+
+def tremmel_hess(
+    cl_histo_f_z: np.ndarray,
+    max_lkl: float,
+    syn_histo_f_z: np.ndarray,
+    lgamma_tbl: np.ndarray | None = None,
+) -> float:
+    """Poisson likelihood ratio evaluated on an already binned synthetic cluster.
+    See :py:func:`tremmel`.
 
-    # Remove all bins where n_i = 0 (no observed stars).
-    syn_histo_f_z = syn_histo_f[cl_z_idx]
+    :param cl_histo_f_z: Flattened observed Hess diagram with the empty bins removed
+    :type cl_histo_f_z: np.ndarray
+    :param max_lkl: Maximum likelihood value, used for normalization
+    :type max_lkl: float
+    :param syn_histo_f_z: Flattened synthetic Hess diagram with the bins where no
+        stars were observed removed
+    :type syn_histo_f_z: np.ndarray
+    :param lgamma_tbl: Table of ``loggamma(k + 0.5)`` values generated by
+        :py:func:`loggamma_table`, defaults to ``None``
+    :type lgamma_tbl: np.ndarray | None
+
+    :return: Log likelihood value.
+    :rtype: float
+    """
+    # If synthetic cluster is empty, assign a small likelihood value.
+    if syn_histo_f_z.size == 0:
+        return -1.0e09
 
     SumLogGamma = np.sum(
-        loggamma(cl_histo_f_z + syn_histo_f_z + 0.5) - loggamma(syn_histo_f_z + 0.5)
+        loggamma_half(cl_histo_f_z + syn_histo_f_z, lgamma_tbl)
+        - loggamma_half(syn_histo_f_z, lgamma_tbl)
     )
 
     # M = syn_histo_f_z.sum()
@@ -394,6 +719,7 @@ def chi_square(
     cl_z_idx: np.ndarray,
     cl_histo_f_z: np.ndarray,
     synth_clust: np.ndarray,
+    cell_slot: np.ndarray | None = None,
 ) -> float:
     """Calculate the chi-square value.
 
@@ -410,6 +736,10 @@ def chi_square(
     :type cl_histo_f_z: np.ndarray
     :param synth_clust: Synthetic cluster data.
     :type synth_clust: np.ndarray
+    :param cell_slot: Slot of each cell, generated by :py:func:`cell_slots`. If
+        given, the synthetic stars are binned only into the bins where stars were
+        observed (see :py:func:`synth_hess_sparse`), defaults to ``None``
+    :type cell_slot: np.ndarray | None
 
     :return: Chi-square value.
     :rtype: float
@@ -418,25 +748,34 @@ def chi_square(
     if not synth_clust.any():
         return -1.0e09
 
-    # Obtain histogram for the synthetic cluster.
-    mag, colors = synth_clust[0], synth_clust[1:]
-    syn_histo_f = []
-    for i, col in enumerate(colors):
-        hess_diag = histogram2d(
-            mag,
-            col,
-            range=[
-                [ranges[0][0], ranges[0][1]],
-                [ranges[i + 1][0], ranges[i + 1][1]],
-            ],
-            bins=[Nbins[0], Nbins[i + 1]],
+    # Obtain histogram for the synthetic cluster, and remove all bins where
+    # n_i = 0 (no observed stars).
+    if cell_slot is None:
+        syn_histo_f_z = synth_hess(ranges, Nbins, synth_clust)[cl_z_idx]
+    else:
+        syn_histo_f_z = synth_hess_sparse(
+            ranges, Nbins, cell_slot, cl_histo_f_z.size, synth_clust
         )
-        # Flatten array
-        syn_histo_f += list(hess_diag.ravel())
-    syn_histo_f = np.array(syn_histo_f)
 
-    # Remove all bins where n_i = 0 (no observed stars).
-    syn_histo_f_z = syn_histo_f[cl_z_idx]
+    return chi_square_hess(cl_histo_f_z, syn_histo_f_z)
+
+
+def chi_square_hess(cl_histo_f_z: np.ndarray, syn_histo_f_z: np.ndarray) -> float:
+    """Chi-square value evaluated on an already binned synthetic cluster.
+    See :py:func:`chi_square`.
+
+    :param cl_histo_f_z: Flattened observed Hess diagram with the empty bins removed
+    :type cl_histo_f_z: np.ndarray
+    :param syn_histo_f_z: Flattened synthetic Hess diagram with the bins where no
+        stars were observed removed
+    :type syn_histo_f_z: np.ndarray
+
+    :return: Chi-square value.
+    :rtype: float
+    """
+    # If synthetic cluster is empty, assign a small likelihood value.
+    if syn_histo_f_z.size == 0:
+        return -1.0e09
 
     chisq = ((cl_histo_f_z - syn_histo_f_z) ** 2).sum()
     return chisq
@@ -35,6 +35,63 @@ def ranModels(
     return ran_models
 
 
+# Synthetic object used by the worker processes, see `init_worker()`
+_synthcl = None
+
+
+def init_worker(synthcl) -> None:
+    """Store the :py:class:`Synthetic <asteca.synthetic.Synthetic>` object used by
+    a worker process.
+
+    :param synthcl: Calibrated synthetic clusters object.
+    :type synthcl: Synthetic
+    """
+    global _synthcl
+    _synthcl = synthcl
+
+
+def model_worker(
+    smodel: dict, obs_phot: np.ndarray
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """Generate the synthetic cluster for a sampled model in a worker process and
+    find the closest synthetic stars to the observed stars.
+
+    :param smodel: Sampled model.
+    :type smodel: dict
+    :param obs_phot: Observed photometry.
+    :type obs_phot: np.ndarray
+
+    :return: Synthetic cluster and indexes of the closest synthetic stars, or
+        ``None`` if the synthetic cluster is empty.
+    :rtype: tuple[np.ndarray, np.ndarray] | None
+    """
+    return process_model(_synthcl, smodel, obs_phot)
+
+
+def process_model(
+    synthcl, smodel: dict, obs_phot: np.ndarray
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """Generate the synthetic cluster for a sampled model and find the closest
+    synthetic stars to the observed stars.
+
+    :param synthcl: Calibrated synthetic clusters object.
+    :type synthcl: Synthetic
+    :param smodel: Sampled model.
+    :type smodel: dict
+    :param obs_phot: Observed photometry.
+    :type obs_phot: np.ndarray
+
+    :return: Synthetic cluster and indexes of the closest synthetic stars, or
+        ``None`` if the synthetic cluster is empty.
+    :rtype: tuple[np.ndarray, np.ndarray] | None
+    """
+    isoch = synthcl.generate(smodel, full_arr_flag=True)
+    if not isoch.any():
+        return None
+    idxs = get_close_idxs(synthcl.m_ini_idx, obs_phot, isoch)
+    return isoch, idxs
+
+
 def get_close_idxs(
     m_ini_idx: int, obs_phot: np.ndarray, isoch: np.ndarray
 ) -> np.ndarray:
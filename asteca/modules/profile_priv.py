@@ -0,0 +1,81 @@
+import time
+
+import pandas as pd
+
+
+def new_stats() -> dict:
+    """Empty profiling statistics.
+
+    :return: Dictionary with the number of calls and the accumulated time of each
+        stage (``stages``), and the accumulated counters (``counters``).
+    :rtype: dict
+    """
+    return {"stages": {}, "counters": {}}
+
+
+def lap(stats: dict, stage: str, t0: float, N: int = 1) -> float:
+    """Add the time elapsed since ``t0`` to a stage.
+
+    :param stats: Profiling statistics.
+    :type stats: dict
+    :param stage: Name of the stage.
+    :type stage: str
+    :param t0: Start time of the stage, given by ``time.perf_counter()``.
+    :type t0: float
+    :param N: Number of calls (models) processed by the stage, defaults to ``1``
+    :type N: int
+
+    :return: Current time, used as the start time of the next stage.
+    :rtype: float
+    """
+    t1 = time.perf_counter()
+    calls_time = stats["stages"].setdefault(stage, [0, 0.0])
+    calls_time[0] += N
+    calls_time[1] += t1 - t0
+    return t1
+
+
+def count(stats: dict, name: str, N: int = 1) -> None:
+    """Increase a counter.
+
+    :param stats: Profiling statistics.
+    :type stats: dict
+    :param name: Name of the counter.
+    :type name: str
+    :param N: Increment, defaults to ``1``
+    :type N: int
+    """
+    stats["counters"][name] = stats["counters"].get(name, 0) + N
+
+
+def report(stats: dict, as_dataframe: bool = False) -> dict | pd.DataFrame:
+    """Summary of the profiling statistics.
+
+    :param stats: Profiling statistics.
+    :type stats: dict
+    :param as_dataframe: If ``True`` return the stages as a ``pd.DataFrame``,
+        defaults to ``False``
+    :type as_dataframe: bool
+
+    :return: Dictionary with the number of calls (``calls``), total time in seconds
+        (``time``) and fraction of the total time (``fraction``) of each stage
+        (``stages``), and the counters (``counters``). Or a ``pd.DataFrame`` with one
+        row per stage and the same columns, plus the mean time per call
+        (``time_per_call``); the counters are stored in its ``attrs["counters"]``
+        dictionary.
+    :rtype: dict | pd.DataFrame
+    """
+    t_total = sum(t for _, t in stats["stages"].values())
+    stages = {
+        k: {"calls": N, "time": t, "fraction": t / t_total if t_total > 0 else 0.0}
+        for k, (N, t) in stats["stages"].items()
+    }
+    if not as_dataframe:
+        return {"stages": stages, "counters": dict(stats["counters"])}
+
+    df = pd.DataFrame.from_dict(
+        stages, orient="index", columns=["calls", "time", "fraction"]
+    )
+    df.insert(2, "time_per_call", df["time"] / df["calls"])
+    df.attrs["counters"] = dict(stats["counters"])
+    return df
@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+
+def share_arrays(
+    owner, arrays: dict[str, np.ndarray], directory: str | None = None
+) -> tuple[dict[str, np.ndarray], str]:
+    """Store arrays as ``.npy`` files in a new temporary folder, and load them back
+    memory mapped (read-only).
+
+    All the processes that load these files map the same pages of memory, so the
+    arrays are not duplicated no matter how many processes use them. The folder is
+    removed when ``owner`` is garbage collected.
+
+    :param owner: Object that holds the arrays.
+    :type owner: object
+    :param arrays: Dictionary of arrays to store.
+    :type arrays: dict[str, np.ndarray]
+    :param directory: Folder where the temporary folder is created. If ``None`` the
+        default temporary folder is used, defaults to ``None``
+    :type directory: str | None
+
+    :return: Dictionary of memory mapped arrays, and path to the folder.
+    :rtype: tuple[dict[str, np.ndarray], str]
+    """
+    path = tempfile.mkdtemp(prefix="asteca_", dir=directory)
+    save_arrays(path, arrays)
+    weakref.finalize(owner, remove_shared, path, os.getpid())
+
+    return attach_arrays(path, list(arrays)), path
+
+
+def save_arrays(path: str, arrays: dict[str, np.ndarray]) -> None:
+    """Store arrays as ``.npy`` files in the ``path`` folder.
+
+    :param path: Path to the folder.
+    :type path: str
+    :param arrays: Dictionary of arrays to store.
+    :type arrays: dict[str, np.ndarray]
+    """
+    for name, arr in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), arr)
+
+
+def replaceable(path: str) -> bool:
+    """Check if ``path`` can be replaced by a new folder of stored arrays: it does
+    not exist, it is an empty folder, or it only holds a ``meta.json`` file and
+    ``.npy`` files (i.e. arrays stored along with their metadata).
+
+    :param path: Path to the folder.
+    :type path: str
+
+    :return: ``True`` if the folder can be replaced.
+    :rtype: bool
+    """
+    if not os.path.exists(path):
+        return True
+    if not os.path.isdir(path):
+        return False
+    files = os.listdir(path)
+    if not files:
+        return True
+    return "meta.json" in files and all(
+        (_ == "meta.json" or _.endswith(".npy"))
+        and os.path.isfile(os.path.join(path, _))
+        for _ in files
+    )
+
+
+def attach_arrays(path: str, names: list[str]) -> dict[str, np.ndarray]:
+    """Load the arrays stored by :py:func:`share_arrays`, memory mapped (read-only).
+
+    :param path: Path to the folder with the arrays.
+    :type path: str
+    :param names: Names of the arrays.
+    :type names: list[str]
+
+    :return: Dictionary of memory mapped arrays.
+    :rtype: dict[str, np.ndarray]
+    """
+    return {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in names
+    }
+
+
+def remove_shared(path: str, pid: int) -> None:
+    """Remove the folder with the arrays stored by :py:func:`share_arrays`.
+
+    :param path: Path to the folder with the arrays.
+    :type path: str
+    :param pid: Id of the process that stored the arrays.
+    :type pid: int
+    """
+    # Forked processes inherit the finalizer, only the process that stored the
+    # arrays removes them
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def pack_nested(
+    nested: list[list[np.ndarray]],
+) -> tuple[np.ndarray, list[list[int]], np.ndarray]:
+    """Concatenate the 1D arrays in a nested list. Arrays that appear more than once
+    in the list (the same object) are stored once.
+
+    :param nested: Nested list of arrays.
+    :type nested: list[list[np.ndarray]]
+
+    :return: Concatenated arrays, position of each array of the nested list in the
+        concatenated arrays, and edges of the concatenated arrays.
+    :rtype: tuple[np.ndarray, list[list[int]], np.ndarray]
+    """
+    unique, positions = {}, []
+    for row in nested:
+        positions.append(
+            [unique.setdefault(id(arr), (len(unique), arr))[0] for arr in row]
+        )
+    arrays = [arr for _, arr in unique.values()]
+    edges = np.cumsum([0] + [len(arr) for arr in arrays])
+
+    return np.concatenate(arrays), positions, edges
+
+
+def unpack_nested(
+    flat: np.ndarray, positions: list[list[int]], edges: np.ndarray
+) -> list[list[np.ndarray]]:
+    """Rebuild the nested list of arrays packed by :py:func:`pack_nested`. The arrays
+    are views of ``flat``.
+
+    :param flat: Concatenated arrays.
+    :type flat: np.ndarray
+    :param positions: Position of each array of the nested list.
+    :type positions: list[list[int]]
+    :param edges: Edges of the concatenated arrays.
+    :type edges: np.ndarray
+
+    :return: Nested list of arrays.
+    :rtype: list[list[np.ndarray]]
+    """
+    views = [flat[edges[i] : edges[i + 1]] for i in range(len(edges) - 1)]
+    return [[views[k] for k in row] for row in positions]
@@ -5,10 +5,20 @@ from .imfs import invTrnsfSmpl, sampleInv
 
 
 def sample_imf(
-    rng: np.random.Generator, IMF_name: str, max_mass: float, Nmets: int, Nages: int
+    rng: np.random.Generator,
+    IMF_name: str,
+    max_mass: float,
+    Nmets: int,
+    Nages: int,
+    N_pools: int | None = None,
+    dtype: str = "float64",
 ) -> tuple[list, list]:
     """Returns arrays of sampled stars for the selected IMF.
 
+    If ``N_pools`` is ``None`` the IMF is sampled once for each (met, age) grid
+    node. Otherwise only ``N_pools`` samples are drawn, and each node is assigned
+    one of them (as a reference, not a copy) in round-robin order.
+
     :param rng: Random number generator.
     :type rng: np.random.Generator
     :param IMF_name: Name of the IMF to be used.
@@ -19,24 +29,36 @@ def sample_imf(
     :type Nmets: int
     :param Nages: Number of age values.
     :type Nages: int
+    :param N_pools: Number of IMF samples shared by the grid nodes, defaults to None
+    :type N_pools: int | None
+    :param dtype: Floating point precision of the sampled masses, defaults to
+        ``float64``
+    :type dtype: str
 
     :returns: A tuple containing two lists. The first list contains the sampled masses,
      and the second list contains the ordered sampled masses.
     :rtype: tuple[list, list]
     """
-    inv_cdf = invTrnsfSmpl(IMF_name)
+    imf_data = invTrnsfSmpl(IMF_name)
+
+    N_nodes = Nmets * Nages
+    if N_pools is None:
+        N_pools = N_nodes
+    N_pools = min(N_pools, N_nodes)
 
-    # Sample in chunks until the maximum defined mass is reached. A simple
-    # analysis points to this being the optimal N_chunk
-    N_chunk = max(100, int(max_mass / 40))
+    pools, pools_ord = [], []
+    for _ in range(N_pools):
+        sampled_IMF = sampleInv(rng, max_mass, imf_data).astype(dtype, copy=False)
+        pools.append(sampled_IMF)
+        pools_ord.append(np.sort(sampled_IMF))
 
     st_dist_mass, st_dist_mass_ordered = [], []
     for i in range(Nmets):
         met_lst, met_lst_ord = [], []
         for j in range(Nages):
-            sampled_IMF = sampleInv(rng, max_mass, inv_cdf, N_chunk)
-            met_lst.append(sampled_IMF)
-            met_lst_ord.append(np.sort(sampled_IMF))
+            k = (i * Nages + j) % N_pools
+            met_lst.append(pools[k])
+            met_lst_ord.append(pools_ord[k])
         st_dist_mass.append(met_lst)
         st_dist_mass_ordered.append(met_lst_ord)
 
@@ -140,35 +162,51 @@ def add_binarity(
     Nz, Na, Nd, Ni = theor_tracks.shape
     theor_tracks = np.concatenate((theor_tracks, np.zeros([Nz, Na, Nd, Ni])), axis=2)
 
-    # For each metallicity defined.
-    for mx, met in enumerate(theor_tracks):
-        # For each age defined.
-        for ax, isoch in enumerate(met):
-            # Extract initial masses for this isochrone.
-            mass_ini = isoch[m_ini_idx]
-
-            # Mass-ratio distribution
-            mass_ratios = qDistribution(mass_ini, gamma, rng)
-            # Secondary masses
-            m2 = mass_ratios * mass_ini
-
-            # Calculate unresolved binary magnitude
-            mag = isoch[mag_idx]
-            mag_m2 = np.interp(m2, mass_ini, mag)
-            theor_tracks[mx][ax][m_ini_idx + 1] = mag_combine(mag, mag_m2)
-
-            # Calculate unresolved color for each color defined.
-            for ic, color in enumerate(all_colors):
-                mc1 = color_filters[mx][ax][color[0]]
-                mc2 = color_filters[mx][ax][color[1]]
-                f_m1 = np.interp(m2, mass_ini, mc1)
-                f1 = mag_combine(mc1, f_m1)
-                f_m2 = np.interp(m2, mass_ini, mc2)
-                f2 = mag_combine(mc2, f_m2)
-                theor_tracks[mx][ax][m_ini_idx + 1 + 1 + ic] = f1 - f2
-
-            # Secondary masses
-            theor_tracks[mx][ax][-1] = m2
+    # All the (z, a) isochrones are processed at once. The random values are drawn
+    # in the same order as if the isochrones were processed one after another,
+    # following the metallicity and age order.
+
+    # Initial masses for all the isochrones, shape: (Nz, Na, Ni)
+    mass_ini = theor_tracks[:, :, m_ini_idx]
+
+    # Mass-ratio distribution
+    mass_ratios = qDistribution(mass_ini, gamma, rng)
+    # Secondary masses
+    m2 = mass_ratios * mass_ini
+
+    # Magnitude and individual filters for each color, shape: (Nz, Na, Ni)
+    mags = {"mag": theor_tracks[:, :, mag_idx]}
+    for col in all_colors:
+        for filt in col:
+            mags[filt] = np.array(
+                [
+                    [np.asarray(age_dict[filt]) for age_dict in met]
+                    for met in color_filters
+                ]
+            )
+
+    # Interpolate the magnitudes for the secondary masses. This is the only step
+    # that requires a loop over the isochrones: 'np.interp' is faster than any
+    # vectorized bin search over the whole grid, and it is exact
+    mags_m2 = {k: np.empty(m2.shape) for k in mags}
+    for mx in range(Nz):
+        for ax in range(Na):
+            for k, mag in mags.items():
+                mags_m2[k][mx, ax] = np.interp(
+                    m2[mx, ax], mass_ini[mx, ax], mag[mx, ax]
+                )
+
+    # Calculate unresolved binary magnitude
+    theor_tracks[:, :, m_ini_idx + 1] = mag_combine(mags["mag"], mags_m2["mag"])
+
+    # Calculate unresolved color for each color defined.
+    for ic, color in enumerate(all_colors):
+        f1 = mag_combine(mags[color[0]], mags_m2[color[0]])
+        f2 = mag_combine(mags[color[1]], mags_m2[color[1]])
+        theor_tracks[:, :, m_ini_idx + 1 + 1 + ic] = f1 - f2
+
+    # Secondary masses
+    theor_tracks[:, :, -1] = m2
 
     return theor_tracks
 
@@ -320,11 +358,40 @@ def randVals(
     return rand_floats
 
 
+def workspace(theor_tracks: np.ndarray, N_obs_stars: int) -> dict:
+    """Generate the buffers used to process synthetic clusters without allocating
+    new large arrays.
+
+    :param theor_tracks: Array of theoretical isochrones.
+    :type theor_tracks: np.ndarray
+    :param N_obs_stars: Number of observed stars.
+    :type N_obs_stars: int
+
+    :returns: Dictionary of buffers.
+    :rtype: dict
+    """
+    Nd, Ni = theor_tracks.shape[-2:]
+    ws = {
+        # Used by `zaWAverage()`
+        "isoch": np.empty((Nd, Ni), dtype=theor_tracks.dtype),
+        "isoch_tmp": np.empty((Nd, Ni), dtype=theor_tracks.dtype),
+        # Used by `interp_mass_idx()`
+        "mass": (
+            np.empty(Nd * N_obs_stars, dtype=theor_tracks.dtype),
+            np.empty(Nd * N_obs_stars, dtype=theor_tracks.dtype),
+        ),
+    }
+    return ws
+
+
 def qDistribution(
     M1: np.ndarray, gamma: float | str, rng: np.random.Generator
 ) -> np.ndarray:
     """Distribution of q=m2/m1 for binary systems
 
+    If ``M1`` has more than one dimension, the random values are drawn as if this
+    function was called for each row (last axis) of the array, one after another.
+
     :param M1: Array of primary masses.
     :type M1: np.ndarray
     :param gamma: Mass-ratio distribution. Can either be a float value (in which case
@@ -348,7 +415,7 @@ def qDistribution(
         # Use 'gamma + 1' in the power-law distribution because in D&K this
         # distribution is defined as f(q)~q^gamma, while numpy's distribution is
         # defined as a*x^(a-1).
-        mass_ratios = rng.power(gamma + 1, N)
+        mass_ratios = rng.power(gamma + 1, N).reshape(M1.shape)
 
     except ValueError:
         if gamma == "D&K":
@@ -359,18 +426,33 @@ def qDistribution(
             msk5, gamma5 = (M1 > 6.5) & (M1 <= 16), 0.0  # <- Not sure. Use uniform
             msk6, gamma6 = M1 > 16, 0.0  # <- Not sure. Use uniform
 
-            mass_ratios = np.zeros(N)
-            for msk, gammaX in (
-                (msk1, gamma1),
-                (msk2, gamma2),
-                (msk3, gamma3),
-                (msk4, gamma4),
-                (msk5, gamma5),
-                (msk6, gamma6),
+            # Group of each mass. Masses outside of all the groups (NaNs) are
+            # assigned the last group and get a zero mass ratio
+            groups = np.full(M1.shape, 6)
+            gammas = []
+            for k, (msk, gammaX) in enumerate(
+                (
+                    (msk1, gamma1),
+                    (msk2, gamma2),
+                    (msk3, gamma3),
+                    (msk4, gamma4),
+                    (msk5, gamma5),
+                    (msk6, gamma6),
+                )
             ):
-                # q = np.random.power(gammaX + 1, msk.sum())
-                q = rng.power(gammaX + 1, msk.sum())
-                mass_ratios[msk] = q
+                groups[msk] = k
+                gammas.append(gammaX + 1)
+
+            # The values are drawn for each row, and for each group within a row.
+            # A stable sort of the (row, group) labels gives that order
+            groups = groups.ravel()
+            rows = np.arange(N) // M1.shape[-1]
+            order = np.argsort(rows * 7 + groups, kind="stable")
+            order = order[groups[order] < 6]
+
+            mass_ratios = np.zeros(N)
+            mass_ratios[order] = rng.power(np.array(gammas)[groups[order]])
+            mass_ratios = mass_ratios.reshape(M1.shape)
         else:
 
             def fQ(xk: np.ndarray, pk: np.ndarray):
@@ -486,7 +568,7 @@ def qDistribution(
             mass_ratios = fq.ppf(
                 # np.random.uniform(0.0, 1.0, N)
                 rng.uniform(0.0, 1.0, N)
-            )
+            ).reshape(M1.shape)
 
     return mass_ratios
 
@@ -510,6 +592,28 @@ def mag_combine(m1: np.ndarray, m2: np.ndarray) -> np.ndarray:
     return mbin
 
 
+def model_key(fix_params: dict, fit_params: dict, tol: float) -> tuple:
+    """Key that identifies a model, made of the values of all the fundamental
+    parameters (fixed and fitted) rounded to multiples of ``tol``.
+
+    :param fix_params: Dictionary of fixed parameters.
+    :type fix_params: dict
+    :param fit_params: Dictionary of fitted parameters.
+    :type fit_params: dict
+    :param tol: Tolerance used to round the parameter values.
+    :type tol: float
+
+    :returns: Tuple with the rounded values.
+    :rtype: tuple
+    """
+    # Same priority for the fixed parameters as in `properModel()`
+    model_comb = fit_params | fix_params
+    return tuple(
+        round(float(model_comb[k]) / tol)
+        for k in ["met", "loga", "alpha", "beta", "Av", "DR", "Rv", "dm"]
+    )
+
+
 def properModel(
     met_age_dict: dict, fix_params: dict, fit_params: dict
 ) -> tuple[float, float, float, float, float, float, float, float, int, int, int, int]:
@@ -557,6 +661,64 @@ def properModel(
     return *model_full, ml, mh, al, ah
 
 
+def properModel_batch(
+    met_age_dict: dict, fix_params: dict, fit_params: dict[str, np.ndarray]
+) -> tuple[np.ndarray, ...]:
+    """Same as :py:func:`properModel` but for a batch of models, where each value
+    in ``fit_params`` is an array with one element per model.
+
+    :param met_age_dict: Dictionary of metallicity and age values.
+    :type met_age_dict: dict
+    :param fix_params: Dictionary of fixed parameters.
+    :type fix_params: dict
+    :param fit_params: Dictionary of fitted parameters, one array per parameter.
+    :type fit_params: dict[str, np.ndarray]
+
+    :returns: A tuple containing one array per fundamental parameter, and the arrays
+     of indexes of the (z, a) values in the grid that define the boxes that enclose
+     the proper (z, a) values.
+    :rtype: tuple[np.ndarray, ...]
+    """
+    N_models = len(next(iter(fit_params.values())))
+    model_comb = fit_params | fix_params
+    model_full = np.array(
+        [
+            np.broadcast_to(model_comb[k], N_models)
+            for k in ["met", "loga", "alpha", "beta", "Av", "DR", "Rv", "dm"]
+        ],
+        dtype=float,
+    )
+
+    idxs = []
+    for i, par in enumerate((met_age_dict["met"], met_age_dict["loga"])):
+        if len(par) == 1:
+            p_l = p_h = np.zeros(N_models, dtype=int)
+        else:
+            p_h = np.minimum(len(par) - 1, np.searchsorted(par, model_full[i]))
+            p_l = p_h - 1
+        idxs += [p_l, p_h]
+    ml, mh, al, ah = idxs
+
+    return *model_full, ml, mh, al, ah
+
+
+def copy_isoch(isoch: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """Return a copy of the isochrone, stored in ``out`` if given.
+
+    :param isoch: Isochrone array.
+    :type isoch: np.ndarray
+    :param out: Array where the copy is stored, defaults to None
+    :type out: np.ndarray | None
+
+    :returns: Copy of the isochrone.
+    :rtype: np.ndarray
+    """
+    if out is None:
+        return np.array(isoch)
+    out[:] = isoch
+    return out
+
+
 def zaWAverage(
     theor_tracks: np.ndarray,
     met_age_dict: dict,
@@ -567,6 +729,8 @@ def zaWAverage(
     mh: int,
     al: int,
     ah: int,
+    out: np.ndarray | None = None,
+    tmp: np.ndarray | None = None,
 ) -> np.ndarray:
     """Generate a new "weighted" isochrone from the four closest points in the
     (z, a) grid.
@@ -604,6 +768,13 @@ def zaWAverage(
     :type al: int
     :param ah: Index of the higher age.
     :type ah: int
+    :param out: Array where the isochrone is stored, with the shape of a single
+        isochrone in ``theor_tracks``. If ``None`` a new array is returned, defaults
+        to None
+    :type out: np.ndarray | None
+    :param tmp: Array with the same shape as ``out`` used to store intermediate
+        values, required if ``out`` is given, defaults to None
+    :type tmp: np.ndarray | None
 
     :returns: Weighted isochrone.
     :rtype: np.ndarray
@@ -611,8 +782,8 @@ def zaWAverage(
 
     # If (z, a) are both fixed, just return the single processed isochrone
     if ml == al == mh == ah == 0:
-        # The np.array() is important to avoid overwriting 'theor_tracks'
-        return np.array(theor_tracks[ml][al])
+        # The copy is important to avoid overwriting 'theor_tracks'
+        return copy_isoch(theor_tracks[ml][al], out)
 
     # The four points in the (z, age) grid that define the box that contains
     # the model value (z_model, a_model)
@@ -621,13 +792,11 @@ def zaWAverage(
     pts = np.array([(z1, a1), (z1, a2), (z2, a1), (z2, a2)])
 
     # Order: (z1, a1), (z1, a2), (z2, a1), (z2, a2)
-    isochs = np.array(
-        [
-            theor_tracks[ml][al],
-            theor_tracks[ml][ah],
-            theor_tracks[mh][al],
-            theor_tracks[mh][ah],
-        ]
+    isochs = (
+        theor_tracks[ml][al],
+        theor_tracks[ml][ah],
+        theor_tracks[mh][al],
+        theor_tracks[mh][ah],
     )
 
     # Distances between the (z, a) points in the 'model', and the four
@@ -641,7 +810,7 @@ def zaWAverage(
     # then just return that isochrone.
     try:
         idx = np.where(dist == 0.0)[0][0]
-        return isochs[idx]
+        return copy_isoch(isochs[idx], out)
     except IndexError:
         pass
 
@@ -649,13 +818,20 @@ def zaWAverage(
     # points. This way is faster than using 'np.average()'.
     # Inverse of the distance.
     inv_d = 1.0 / dist
-    weights = inv_d / sum(inv_d)
-    isochrone = (
-        isochs[0] * weights[0]
-        + isochs[1] * weights[1]
-        + isochs[2] * weights[2]
-        + isochs[3] * weights[3]
-    )
+    # Weights in the precision of the isochrones, to avoid upcasting them
+    weights = (inv_d / sum(inv_d)).astype(isochs[0].dtype, copy=False)
+    if out is None:
+        isochrone = (
+            isochs[0] * weights[0]
+            + isochs[1] * weights[1]
+            + isochs[2] * weights[2]
+            + isochs[3] * weights[3]
+        )
+    else:
+        # Same operations as above, in the same order, without new arrays
+        isochrone = np.multiply(isochs[0], weights[0], out=out)
+        for k in range(1, 4):
+            isochrone += np.multiply(isochs[k], weights[k], out=tmp)
 
     # DO NOT average the masses or their distribution will be lost. We use the
     # values of the closest isochrone.
@@ -712,25 +888,112 @@ def zaWAverage(
     return isochrone
 
 
-def move_isochrone(isochrone: np.ndarray, m_ini_idx: int, dm: float) -> np.ndarray:
+def zaWAverage_batch(
+    theor_tracks: np.ndarray,
+    met_age_dict: dict,
+    m_ini_idx: int,
+    z_model: np.ndarray,
+    a_model: np.ndarray,
+    ml: np.ndarray,
+    mh: np.ndarray,
+    al: np.ndarray,
+    ah: np.ndarray,
+) -> np.ndarray:
+    """Same as :py:func:`zaWAverage` but for a batch of models. The four isochrones
+    that enclose each model are gathered and averaged for all the models at once.
+
+    :param theor_tracks: Array of theoretical isochrones.
+    :type theor_tracks: np.ndarray
+    :param met_age_dict: Dictionary of metallicity and age values.
+    :type met_age_dict: dict
+    :param m_ini_idx: Index of the initial mass.
+    :type m_ini_idx: int
+    :param z_model: Array of metallicity values.
+    :type z_model: np.ndarray
+    :param a_model: Array of age values.
+    :type a_model: np.ndarray
+    :param ml: Array of indexes of the lower metallicities.
+    :type ml: np.ndarray
+    :param mh: Array of indexes of the higher metallicities.
+    :type mh: np.ndarray
+    :param al: Array of indexes of the lower ages.
+    :type al: np.ndarray
+    :param ah: Array of indexes of the higher ages.
+    :type ah: np.ndarray
+
+    :returns: Array of weighted isochrones with shape (N_models, Nd, Ni).
+    :rtype: np.ndarray
+    """
+    # Order: (z1, a1), (z1, a2), (z2, a1), (z2, a2)
+    m_idx = np.array([ml, ml, mh, mh]).T
+    a_idx = np.array([al, ah, al, ah]).T
+    # Fancy indexing returns a copy, 'theor_tracks' is never modified
+    isochs = theor_tracks[m_idx, a_idx]
+
+    pts = np.array([met_age_dict["met"][m_idx], met_age_dict["loga"][a_idx]]).transpose(
+        1, 2, 0
+    )
+    a_min_b = np.array([z_model, a_model]).T[:, None, :] - pts
+    # Don't take the square root, it's not necessary
+    dist = np.einsum("kij,kij->ki", a_min_b, a_min_b)
+    idx = np.argmin(dist, 1)
+    rows = np.arange(len(idx))
+
+    # Models with a 0. distance in (z, a) to the closest isochrone (or with both (z, a)
+    # fixed) use that isochrone. Hide 'divide by zero' warnings for these models.
+    exact_msk = dist[rows, idx] == 0.0
+    exact_msk[(ml == 0) & (mh == 0) & (al == 0) & (ah == 0)] = True
+
+    # Weighted average by the (inverse) distance to the four (z, a) grid points
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_d = 1.0 / dist
+        weights = (
+            inv_d / (inv_d[:, 0] + inv_d[:, 1] + inv_d[:, 2] + inv_d[:, 3])[:, None]
+        ).astype(isochs.dtype, copy=False)
+        isochrone = (
+            isochs[:, 0] * weights[:, 0, None, None]
+            + isochs[:, 1] * weights[:, 1, None, None]
+            + isochs[:, 2] * weights[:, 2, None, None]
+            + isochs[:, 3] * weights[:, 3, None, None]
+        )
+
+    # DO NOT average the masses or their distribution will be lost. We use the
+    # values of the closest isochrone.
+    closest = isochs[rows, idx]
+    isochrone[:, m_ini_idx] = closest[:, m_ini_idx]
+    # Now for the secondary masses
+    isochrone[:, -1] = closest[:, -1]
+
+    # Full copy of the closest isochrone for the exact (z, a) models
+    isochrone[exact_msk] = closest[exact_msk]
+
+    return isochrone
+
+
+def move_isochrone(
+    isochrone: np.ndarray, m_ini_idx: int, dm: float | np.ndarray
+) -> np.ndarray:
     """Receives an isochrone of a given age and metallicity and modifies
     its magnitude values according to a given distance modulus.
 
+    The isochrone can also be a stack of isochrones with shape (N, Nd, Ni), in
+    which case ``dm`` must be an array of shape (N, 1).
+
     :param isochrone: Isochrone array.
     :type isochrone: np.ndarray
     :param m_ini_idx: Index of the initial mass.
     :type m_ini_idx: int
     :param dm: Distance modulus.
-    :type dm: float
+    :type dm: float | np.ndarray
 
     :returns: Modified isochrone array.
     :rtype: np.ndarray
     """
     # Move magnitude
-    isochrone[0] += dm
+    isochrone[..., 0, :] += dm
     # Move binary magnitude if it exists
-    if isochrone.shape[0] > m_ini_idx + 1:
-        isochrone[m_ini_idx + 1] += dm
+    if isochrone.shape[-2] > m_ini_idx + 1:
+        isochrone[..., m_ini_idx + 1, :] += dm
 
     return isochrone
 
@@ -743,9 +1006,9 @@ def extinction(
     DR_distribution: str,
     m_ini_idx: int,
     binar_flag: bool,
-    Av: float,
-    dr: float,
-    Rv: float,
+    Av: float | np.ndarray,
+    dr: float | np.ndarray,
+    Rv: float | np.ndarray,
     isochrone: np.ndarray,
 ) -> np.ndarray:
     """Modifies magnitude and color(s) according to given values for the
@@ -780,6 +1043,9 @@ def extinction(
     (m1 - m2)_obs = (m1 - m2)_int + E(m1 - m2)
     (m1 - m2)_obs = (m1 - m2)_int + (a12 + b12/Rv) * R_V * E(B-V)
 
+    The isochrone can also be a stack of isochrones with shape (N, Nd, Ni), in
+    which case ``Av, dr, Rv`` must be arrays of shape (N, 1).
+
     :param ext_law: Extinction law to be used.
     :type ext_law: str
     :param ext_coefs: List of extinction coefficients.
@@ -795,11 +1061,11 @@ def extinction(
     :param binar_flag: Flag to indicate if binarity is being used.
     :type binar_flag: bool
     :param Av: Total absorption.
-    :type Av: float
+    :type Av: float | np.ndarray
     :param dr: Differential reddening.
-    :type dr: float
+    :type dr: float | np.ndarray
     :param Rv: Total-to-selective extinction ratio.
-    :type Rv: float
+    :type Rv: float | np.ndarray
     :param isochrone: Isochrone array.
     :type isochrone: np.ndarray
 
@@ -810,7 +1076,7 @@ def extinction(
     """
 
     Av_dr = Av
-    if dr > 0.0:
+    if np.any(dr > 0.0):
         Ns = isochrone.shape[-1]
 
         dr_arr = 0
@@ -825,8 +1091,8 @@ def extinction(
         # Without this, all stars are affected by the DR.
         # dr_arr[rand_unif[:Ns] > DR_percentage] = 0.0
 
-        # Clip at 0
-        Av_dr = np.clip(Av + dr_arr, a_min=0, a_max=np.inf)
+        # Clip at 0. Isochrones in a stack with no DR keep their 'Av' value
+        Av_dr = np.where(dr > 0.0, np.clip(Av + dr_arr, a_min=0, a_max=np.inf), Av)
 
     if ext_law == "CCMO":
         # Magnitude
@@ -838,19 +1104,19 @@ def extinction(
     elif ext_law == "GAIADR3":
         # If this model is used the first color is always expected to be BP-RP
         # BP_RP = isochrone[1]
-        ec_mag, ec_col1 = dustapprox(isochrone[1], Av_dr)
+        ec_mag, ec_col1 = dustapprox(isochrone[..., 1, :], Av_dr)
     else:
         raise ValueError(f"Unknown extinction law: {ext_law}")
 
     Ax = ec_mag * Av_dr
-    isochrone[0] += Ax
+    isochrone[..., 0, :] += Ax
     Ex1 = ec_col1 * Av_dr
-    isochrone[1] += Ex1
+    isochrone[..., 1, :] += Ex1
 
     # Move binary data.
     if binar_flag:
-        isochrone[m_ini_idx + 1] += Ax  # Magnitude
-        isochrone[m_ini_idx + 2] += Ex1  # First color
+        isochrone[..., m_ini_idx + 1, :] += Ax  # Magnitude
+        isochrone[..., m_ini_idx + 2, :] += Ex1  # First color
 
     # Second color
     if len(ext_coefs) > 2:
@@ -858,10 +1124,10 @@ def extinction(
             ext_coefs[2][1][0] + ext_coefs[2][1][1] / Rv
         )
         Ex2 = ec_col2 * Av_dr
-        isochrone[2] += Ex2
+        isochrone[..., 2, :] += Ex2
         # Move color with binary data.
         if binar_flag:
-            isochrone[m_ini_idx + 3] += Ex2
+            isochrone[..., m_ini_idx + 3, :] += Ex2
 
     return isochrone
 
@@ -970,7 +1236,11 @@ def cut_max_mag(isoch_moved: np.ndarray, max_mag_syn: float) -> np.ndarray:
 
 
 def mass_interp(
-    isoch_cut: np.ndarray, m_ini_idx: int, st_dist_mass: np.ndarray, N_obs_stars: int
+    isoch_cut: np.ndarray,
+    m_ini_idx: int,
+    st_dist_mass: np.ndarray,
+    N_obs_stars: int,
+    buffers: tuple[np.ndarray, np.ndarray] | None = None,
 ) -> np.ndarray:
     """For each mass in the sampled IMF mass distribution, interpolate its value
     (and those of all the sub-arrays in 'isoch_cut') into the isochrone.
@@ -986,6 +1256,8 @@ def mass_interp(
     :type st_dist_mass: np.ndarray
     :param N_obs_stars: Number of observed stars.
     :type N_obs_stars: int
+    :param buffers: Buffers passed to :py:func:`interp_mass_idx`, defaults to None
+    :type buffers: tuple[np.ndarray, np.ndarray] | None
 
     :returns: Interpolated isochrone array.
     :rtype: np.ndarray
@@ -1026,13 +1298,16 @@ def mass_interp(
     #     isoch_mass[i] = np.interp(mass_dist, mass_ini, arr)
 
     # Interpolate the sampled stars (masses) into the isochrone
-    isoch_mass = interp_mass_isoch(isoch_cut, mass_ini, mass_dist)
+    isoch_mass = interp_mass_isoch(isoch_cut, mass_ini, mass_dist, buffers)
 
     return isoch_mass
 
 
 def interp_mass_isoch(
-    isoch_cut: np.ndarray, mass_ini: np.ndarray, mass_dist: np.ndarray
+    isoch_cut: np.ndarray,
+    mass_ini: np.ndarray,
+    mass_dist: np.ndarray,
+    buffers: tuple[np.ndarray, np.ndarray] | None = None,
 ) -> np.ndarray:
     """Find where in the original data, the values to interpolate would be inserted.
 
@@ -1045,29 +1320,222 @@ def interp_mass_isoch(
     :type mass_ini: np.ndarray
     :param mass_dist: Array of sampled masses.
     :type mass_dist: np.ndarray
+    :param buffers: Buffers passed to :py:func:`interp_mass_idx`, defaults to None
+    :type buffers: tuple[np.ndarray, np.ndarray] | None
 
     :returns: Interpolated isochrone array.
     :rtype: np.ndarray
     """
     # Note: If x_new[n] == x[m], then m is returned by searchsorted.
     x_new_indices = np.searchsorted(mass_ini, mass_dist)
+    lo = x_new_indices - 1
 
+    return interp_mass_idx(isoch_cut, mass_ini, mass_dist, lo, x_new_indices, buffers)
+
+
+def interp_mass_idx(
+    isoch: np.ndarray,
+    mass_ini: np.ndarray,
+    mass_dist: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    buffers: tuple[np.ndarray, np.ndarray] | None = None,
+) -> np.ndarray:
+    """Linear interpolation of the sampled masses into the isochrone, given the
+    indexes of the isochrone points that bracket each mass.
+
+    If ``buffers`` are given, the large intermediate arrays are stored in them and
+    the returned array is a view of the first buffer. The operations are the same,
+    so the results are identical.
+
+    :param isoch: Isochrone array.
+    :type isoch: np.ndarray
+    :param mass_ini: Array of initial masses.
+    :type mass_ini: np.ndarray
+    :param mass_dist: Array of sampled masses.
+    :type mass_dist: np.ndarray
+    :param lo: Indexes of the isochrone points below each sampled mass.
+    :type lo: np.ndarray
+    :param hi: Indexes of the isochrone points above each sampled mass.
+    :type hi: np.ndarray
+    :param buffers: Two flat arrays with at least ``isoch.shape[0] * len(mass_dist)``
+        elements each, defaults to None
+    :type buffers: tuple[np.ndarray, np.ndarray] | None
+
+    :returns: Interpolated isochrone array.
+    :rtype: np.ndarray
+    """
     # Calculate the slope of regions that each x_new value falls in.
-    lo = x_new_indices - 1
     x_lo = mass_ini[lo]
-    x_hi = mass_ini[x_new_indices]
-    y_lo = isoch_cut[:, lo]
-    y_hi = isoch_cut[:, x_new_indices]
-    slope = (y_hi - y_lo) / (x_hi - x_lo)
-    #
-    x_diff = mass_dist - x_lo
-    y_diff = slope * x_diff
-    # Calculate the actual value for each entry in x_new.
-    isoch_mass = y_diff + y_lo
+    x_hi = mass_ini[hi]
+
+    if buffers is None:
+        y_lo = isoch[:, lo]
+        y_hi = isoch[:, hi]
+        slope = (y_hi - y_lo) / (x_hi - x_lo)
+        #
+        x_diff = mass_dist - x_lo
+        y_diff = slope * x_diff
+        # Calculate the actual value for each entry in x_new.
+        isoch_mass = y_diff + y_lo
+        return isoch_mass
+
+    shape = (isoch.shape[0], len(mass_dist))
+    N = shape[0] * shape[1]
+    y_lo = buffers[0][:N].reshape(shape)
+    y_hi = buffers[1][:N].reshape(shape)
+    # 'wrap' handles negative indexes as the fancy indexing above does
+    np.take(isoch, lo, axis=1, out=y_lo, mode="wrap")
+    np.take(isoch, hi, axis=1, out=y_hi, mode="wrap")
+    slope = np.subtract(y_hi, y_lo, out=y_hi)
+    slope /= x_hi - x_lo
+    y_diff = np.multiply(slope, mass_dist - x_lo, out=y_hi)
+    isoch_mass = np.add(y_diff, y_lo, out=y_lo)
 
     return isoch_mass
 
 
+def closest_node(
+    met_age_dict: dict,
+    z_model: float,
+    a_model: float,
+    ml: int,
+    mh: int,
+    al: int,
+    ah: int,
+) -> tuple[int, int]:
+    """Indexes of the (z, a) grid node closest to the model. This is the node
+    whose masses are used by :py:func:`zaWAverage`.
+
+    :param met_age_dict: Dictionary of metallicity and age values.
+    :type met_age_dict: dict
+    :param z_model: Metallicity value.
+    :type z_model: float
+    :param a_model: Age value.
+    :type a_model: float
+    :param ml: Index of the lower metallicity.
+    :type ml: int
+    :param mh: Index of the higher metallicity.
+    :type mh: int
+    :param al: Index of the lower age.
+    :type al: int
+    :param ah: Index of the higher age.
+    :type ah: int
+
+    :returns: Metallicity and age indexes of the closest node.
+    :rtype: tuple[int, int]
+    """
+    z1, z2 = met_age_dict["met"][ml], met_age_dict["met"][mh]
+    a1, a2 = met_age_dict["loga"][al], met_age_dict["loga"][ah]
+    pts = np.array([(z1, a1), (z1, a2), (z2, a1), (z2, a2)])
+    a_min_b = np.array([(z_model, a_model)]) - pts
+    dist = np.einsum("ij,ij->i", a_min_b, a_min_b)
+    idx = np.argmin(dist)
+
+    return (ml, ml, mh, mh)[idx], (al, ah, al, ah)[idx]
+
+
+def mass_stencil(mass_ini: np.ndarray, st_dist_mass: np.ndarray) -> np.ndarray | None:
+    """Position of each sampled mass in the (full, not cut) isochrone's masses.
+
+    Both arrays are fixed for a given grid node, so these positions can be
+    computed once and reused by :py:func:`mass_interp_stencil` for any magnitude
+    cut applied to the isochrone.
+
+    :param mass_ini: Array of initial masses of the isochrone.
+    :type mass_ini: np.ndarray
+    :param st_dist_mass: Array of sampled masses.
+    :type st_dist_mass: np.ndarray
+
+    :returns: ``np.searchsorted`` indexes of the sampled masses, or ``None`` if the
+        isochrone's masses are not sorted (the stencil can not be used in that case)
+    :rtype: np.ndarray | None
+    """
+    if not np.all(mass_ini[1:] >= mass_ini[:-1]):
+        return None
+    return np.searchsorted(mass_ini, st_dist_mass).astype(np.int32)
+
+
+def mass_interp_stencil(
+    isoch_moved: np.ndarray,
+    max_mag_syn: float,
+    m_ini_idx: int,
+    st_dist_mass: np.ndarray,
+    stencil: np.ndarray,
+    N_obs_stars: int,
+    buffers: tuple[np.ndarray, np.ndarray] | None = None,
+) -> np.ndarray:
+    """Equivalent to applying :py:func:`cut_max_mag` followed by
+    :py:func:`mass_interp`, using the positions of the sampled masses precomputed
+    by :py:func:`mass_stencil`.
+
+    The isochrone's masses are sorted, so the stars that survive the magnitude cut
+    cover the mass range given by the first and last surviving stars. The sampled
+    masses are scanned in chunks until ``N_obs_stars`` masses within that range are
+    found, and their positions in the cut isochrone are obtained from the number of
+    surviving stars below their precomputed positions. The results are identical to
+    those of the functions mentioned above.
+
+    :param isoch_moved: Isochrone array (not cut).
+    :type isoch_moved: np.ndarray
+    :param max_mag_syn: Maximum magnitude value.
+    :type max_mag_syn: float
+    :param m_ini_idx: Index of the initial mass.
+    :type m_ini_idx: int
+    :param st_dist_mass: Array of sampled masses.
+    :type st_dist_mass: np.ndarray
+    :param stencil: Positions of the sampled masses in the isochrone's masses.
+    :type stencil: np.ndarray
+    :param N_obs_stars: Number of observed stars.
+    :type N_obs_stars: int
+    :param buffers: Buffers passed to :py:func:`interp_mass_idx`, defaults to None
+    :type buffers: tuple[np.ndarray, np.ndarray] | None
+
+    :returns: Interpolated isochrone array.
+    :rtype: np.ndarray
+    """
+    # Discard stars in isochrone beyond max_mag_syn limit.
+    msk = isoch_moved[0] < max_mag_syn
+    cut_idx = np.flatnonzero(msk)
+    if cut_idx.size == 0:
+        return np.array([])
+    # Indexes and values of the minimum and maximum masses in the cut isochrone
+    i_min, i_max = cut_idx[0], cut_idx[-1]
+    mass_min = isoch_moved[m_ini_idx][i_min]
+
+    # Select the first 'N_obs_stars' sampled masses within the mass range. A mass
+    # is >= than the minimum if its index is larger or if both values are equal,
+    # and it is <= than the maximum if its index is not larger
+    N_chunk = max(1000, 2 * N_obs_stars)
+    st_idx, N_found = [], 0
+    for i0 in range(0, len(stencil), N_chunk):
+        j_chunk = stencil[i0 : i0 + N_chunk]
+        msk_m = ((j_chunk > i_min) | (st_dist_mass[i0 : i0 + N_chunk] == mass_min)) & (
+            j_chunk <= i_max
+        )
+        idx = np.flatnonzero(msk_m) + i0
+        st_idx.append(idx)
+        N_found += idx.size
+        if N_found >= N_obs_stars:
+            break
+    st_idx = np.concatenate(st_idx)[:N_obs_stars]
+    mass_dist = st_dist_mass[st_idx]
+    if not mass_dist.any():
+        return np.array([])
+
+    # Number of stars in the cut isochrone below each full isochrone index. This
+    # gives the 'np.searchsorted()' indexes of the masses in the cut isochrone
+    N_below = np.concatenate(([0], np.cumsum(msk)))
+    x_new_indices = N_below[stencil[st_idx]]
+    # Indexes in the full isochrone
+    lo = cut_idx[x_new_indices - 1]
+    hi = cut_idx[x_new_indices]
+
+    return interp_mass_idx(
+        isoch_moved, isoch_moved[m_ini_idx], mass_dist, lo, hi, buffers
+    )
+
+
 def binarity(
     alpha: float,
     beta: float,
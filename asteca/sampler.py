@@ -0,0 +1,241 @@
+import os
+
+import numpy as np
+
+from .likelihood import Likelihood
+from .modules import fit_priv as fpriv
+from .synthetic import Synthetic
+
+
+class Sampler:
+    """Define a :py:class:`Sampler` object.
+
+    Affine invariant ensemble sampler (stretch move of
+    `Goodman & Weare 2010 <https://ui.adsabs.harvard.edu/abs/2010CAMCS...5...65G>`__)
+    for the fundamental parameters that were not fixed when the
+    :py:class:`Synthetic <asteca.synthetic.Synthetic>` object was calibrated.
+
+    The walkers are split in two halves and all the walkers in a half are moved at
+    once: their synthetic clusters are generated and evaluated in a single batch
+    (:py:meth:`Synthetic.generate_batch() <asteca.synthetic.Synthetic.generate_batch>`
+    and :py:meth:`Likelihood.get_batch() <asteca.likelihood.Likelihood.get_batch>`
+    methods), optionally split among several processes. The likelihood values
+    (which work as distances) are converted to log-probabilities assuming uniform
+    priors within the ``bounds``.
+
+    :param synthcl: Calibrated :py:class:`Synthetic <asteca.synthetic.Synthetic>`
+        object
+    :type synthcl: Synthetic
+    :param likelihood: :py:class:`Likelihood <asteca.likelihood.Likelihood>` object
+        generated with the same observed cluster used to calibrate ``synthcl``
+    :type likelihood: Likelihood
+    :param bounds: Dictionary with the ``(min, max)`` range for each sampled
+        parameter. The ranges for the metallicity and age default to the ranges
+        of the loaded isochrones, and must be contained within them. All the
+        other sampled parameters require a range, defaults to ``None``
+    :type bounds: dict[str, tuple[float, float]] | None
+    :param N_walkers: Number of walkers. If ``None``, four times the number of
+        sampled parameters is used, defaults to ``None``
+    :type N_walkers: int | None
+    :param a: Scale parameter of the stretch move, defaults to ``2``
+    :type a: float
+    :param checkpoint: Path to a ``.npz`` file where the state of the sampler is
+        stored every ``checkpoint_every`` steps. If the file exists when the object
+        is instantiated, the stored chain is loaded and :py:meth:`run` resumes from
+        it. If ``None`` no checkpoints are stored, defaults to ``None``
+    :type checkpoint: str | None
+    :param checkpoint_every: Number of steps between checkpoints, defaults to ``50``
+    :type checkpoint_every: int
+    :param n_jobs: Number of processes used to evaluate the walkers, defaults to
+        ``1``
+    :type n_jobs: int
+    :param seed: Random seed. If ``None`` a random integer will be generated and
+        used, defaults to ``None``
+    :type seed: int | None
+    :param verbose: Verbose level. A value of ``0`` hides all output, defaults to ``1``
+    :type verbose: int
+
+    :raises ValueError: If any of the attributes is not valid, or if the checkpoint
+        file was generated with a different set of parameters, ranges, or walkers
+    """
+
+    def __init__(
+        self,
+        synthcl: Synthetic,
+        likelihood: Likelihood,
+        bounds: dict[str, tuple[float, float]] | None = None,
+        N_walkers: int | None = None,
+        a: float = 2.0,
+        checkpoint: str | None = None,
+        checkpoint_every: int = 50,
+        n_jobs: int = 1,
+        seed: int | None = None,
+        verbose: int = 1,
+    ) -> None:
+        self.synthcl = synthcl
+        self.likelihood = likelihood
+        self.a = a
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.verbose = verbose
+
+        if self.a <= 1:
+            raise ValueError(f"a={self.a} is not valid. Should be > 1")
+        if self.checkpoint_every < 1:
+            raise ValueError(
+                f"checkpoint_every={self.checkpoint_every} is not valid. Should be >= 1"
+            )
+
+        self.fit_names, self.bounds_arr = fpriv.fit_bounds(
+            synthcl.fix_params, synthcl.met_age_dict, {} if bounds is None else bounds
+        )
+        N_params = len(self.fit_names)
+        self.N_walkers = fpriv.n_walkers(N_walkers, N_params)
+
+        self.rng = np.random.default_rng(self.seed)
+
+        # Chain of positions and log-probabilities, extended by `run()`
+        self.chain = np.empty((0, self.N_walkers, N_params))
+        self.lp_chain = np.empty((0, self.N_walkers))
+        self.N_accept = 0
+        # Current state of the walkers
+        self._pos, self._lp = None, None
+
+        self._vp("\nInstantiating sampler...")
+        if self.checkpoint is not None and os.path.isfile(self.checkpoint):
+            self._load_checkpoint()
+            self._vp(f"Checkpoint     : {self.checkpoint} ({len(self.chain)} steps)", 1)
+        self._vp(f"Sampled params : {', '.join(self.fit_names)}", 1)
+        self._vp(f"N_walkers      : {self.N_walkers}", 1)
+        self._vp(f"N_jobs         : {self.n_jobs}", 1)
+        self._vp("Sampler object generated")
+
+    def _vp(self, mssg: str, level: int = 0) -> None:
+        """Verbose print method"""
+        if self.verbose > level:
+            print(mssg)
+
+    def run(self, N_steps: int, p0: dict[str, float] | None = None) -> None:
+        """Run the sampler until the chain holds ``N_steps`` steps.
+
+        If the chain already holds some steps (because :py:meth:`run` was called
+        before or a checkpoint was loaded) the walkers continue from their last
+        positions and only the missing steps are run. Hence, calling this method
+        again with the same arguments after an interrupted run completes it.
+
+        :param N_steps: Total number of steps of the chain.
+        :type N_steps: int
+        :param p0: Model around which the walkers are started, e.g. the best fit
+            model found by the
+            :py:meth:`Synthetic.fit() <asteca.synthetic.Synthetic.fit>` method. If
+            ``None`` the walkers are started uniformly distributed within the
+            ranges. Ignored if the chain already holds steps, defaults to ``None``
+        :type p0: dict[str, float] | None
+        """
+        N_done = len(self.chain)
+        if N_steps <= N_done:
+            return
+
+        chain = np.empty((N_steps, *self.chain.shape[1:]))
+        lp_chain = np.empty((N_steps, self.N_walkers))
+        chain[:N_done], lp_chain[:N_done] = self.chain, self.lp_chain
+
+        self._vp(f"\nRunning sampler: {N_done} -> {N_steps} steps", 1)
+        with fpriv.lkl_evaluator(
+            self.synthcl, self.likelihood, self.fit_names, self.n_jobs
+        ) as lkl_f:
+
+            def log_prob_f(models: np.ndarray) -> np.ndarray:
+                return fpriv.log_prob_models(
+                    models,
+                    self.bounds_arr,
+                    lkl_f,
+                    self.likelihood.lkl_name,
+                    self.likelihood.max_lkl,
+                )
+
+            try:
+                if self._pos is None:
+                    if p0 is None:
+                        self._pos = self.rng.uniform(
+                            self.bounds_arr[:, 0],
+                            self.bounds_arr[:, 1],
+                            (self.N_walkers, len(self.fit_names)),
+                        )
+                    else:
+                        center = np.array([p0[k] for k in self.fit_names], dtype=float)
+                        self._pos = fpriv.walkers_ball(
+                            center, self.bounds_arr, self.N_walkers, self.rng
+                        )
+                    self._lp = log_prob_f(self._pos)
+
+                for step in range(N_done, N_steps):
+                    self.N_accept += fpriv.stretch_step(
+                        log_prob_f, self._pos, self._lp, self.rng, self.a
+                    )
+                    chain[step], lp_chain[step] = self._pos, self._lp
+                    N_done = step + 1
+                    if self.checkpoint is not None and (
+                        N_done % self.checkpoint_every == 0 or N_done == N_steps
+                    ):
+                        self.chain, self.lp_chain = chain[:N_done], lp_chain[:N_done]
+                        self._save_checkpoint()
+            finally:
+                # Keep the steps done so far, even if the run was interrupted
+                self.chain, self.lp_chain = chain[:N_done], lp_chain[:N_done]
+
+        self._vp(f"Acceptance     : {self.acceptance:.2f}", 1)
+
+    @property
+    def acceptance(self) -> float:
+        """Fraction of accepted moves in the chain."""
+        if len(self.chain) == 0:
+            return np.nan
+        return self.N_accept / (len(self.chain) * self.N_walkers)
+
+    def get_samples(self, N_burn: int = 0, thin: int = 1) -> dict[str, np.ndarray]:
+        """Return the samples of the chain, for each parameter.
+
+        :param N_burn: Number of initial steps discarded as burn-in, defaults to
+            ``0``
+        :type N_burn: int
+        :param thin: Keep only one of every ``thin`` steps, defaults to ``1``
+        :type thin: int
+
+        :return: Dictionary with the flattened samples of each sampled parameter
+        :rtype: dict[str, np.ndarray]
+        """
+        samples = self.chain[N_burn::thin].reshape(-1, len(self.fit_names))
+        return dict(zip(self.fit_names, samples.T))
+
+    def _save_checkpoint(self) -> None:
+        """Store the state of the sampler in the checkpoint file"""
+        fpriv.save_checkpoint(
+            self.checkpoint,
+            self.rng,
+            fit_names=np.array(self.fit_names),
+            bounds_arr=self.bounds_arr,
+            chain=self.chain,
+            lp_chain=self.lp_chain,
+            pos=self._pos,
+            lp=self._lp,
+            N_accept=np.array(self.N_accept),
+        )
+
+    def _load_checkpoint(self) -> None:
+        """Load the state of the sampler from the checkpoint file"""
+        data = fpriv.load_checkpoint(self.checkpoint, self.rng)
+        if (
+            list(data["fit_names"]) != self.fit_names
+            or not np.array_equal(data["bounds_arr"], self.bounds_arr)
+            or data["chain"].shape[1] != self.N_walkers
+        ):
+            raise ValueError(
+                f"Checkpoint file '{self.checkpoint}' was generated with a different "
+                + "set of parameters, ranges, or number of walkers"
+            )
+        self.chain, self.lp_chain = data["chain"], data["lp_chain"]
+        self._pos, self._lp = data["pos"], data["lp"]
+        self.N_accept = int(data["N_accept"])
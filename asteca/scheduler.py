@@ -0,0 +1,169 @@
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .likelihood import Likelihood
+from .modules import fit_priv as fpriv
+from .synthetic import Synthetic
+
+
+class Scheduler:
+    """Define a :py:class:`Scheduler` object.
+
+    Fit many observed clusters with a single
+    :py:class:`Synthetic <asteca.synthetic.Synthetic>` object. The isochrones, the
+    sampled IMF and the random values of ``synthcl`` are generated once and shared
+    by all the clusters: each cluster only requires its own (lightweight)
+    calibration data, see the
+    :py:meth:`Synthetic.calibration() <asteca.synthetic.Synthetic.calibration>`
+    method.
+
+    The clusters are fitted with the
+    :py:meth:`Synthetic.fit() <asteca.synthetic.Synthetic.fit>` method, one cluster
+    per process. On Linux the worker processes are forked, so that they read the
+    arrays of ``synthcl`` from the memory of the parent process instead of
+    receiving a copy of them. On other systems call the
+    :py:meth:`Synthetic.share() <asteca.synthetic.Synthetic.share>` method first,
+    so that the workers load the shared arrays instead of receiving a copy.
+
+    :param synthcl: :py:class:`Synthetic <asteca.synthetic.Synthetic>` object, it is
+        not required to be calibrated and it is not modified
+    :type synthcl: Synthetic
+    :param n_jobs: Number of processes used to fit the clusters, defaults to ``1``
+    :type n_jobs: int
+    :param seed: Random seed. If ``None`` a random integer will be generated and
+        used. The results for a given ``seed`` do not depend on ``n_jobs``,
+        defaults to ``None``
+    :type seed: int | None
+    :param verbose: Verbose level. A value of ``0`` hides all output, defaults to ``1``
+    :type verbose: int
+
+    :raises ValueError: If ``n_jobs`` is not valid
+    """
+
+    def __init__(
+        self,
+        synthcl: Synthetic,
+        n_jobs: int = 1,
+        seed: int | None = None,
+        verbose: int = 1,
+    ) -> None:
+        self.synthcl = synthcl
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.verbose = verbose
+
+        if self.n_jobs < 1:
+            raise ValueError(f"n_jobs={self.n_jobs} is not valid. Should be >= 1")
+
+        self._vp("\nInstantiating scheduler...")
+        self._vp(f"N_jobs         : {self.n_jobs}", 1)
+        self._vp(f"Random seed    : {self.seed}", 1)
+        self._vp("Scheduler object generated")
+
+    def _vp(self, mssg: str, level: int = 0) -> None:
+        """Verbose print method"""
+        if self.verbose > level:
+            print(mssg)
+
+    def run(
+        self,
+        likelihoods: list[Likelihood],
+        fix_params: dict | list[dict] | None = None,
+        bounds: dict | list[dict] | None = None,
+        fit_kwargs: dict | None = None,
+    ) -> list[dict]:
+        """Fit the clusters.
+
+        All the calibrations are obtained (and checked) before any cluster is
+        fitted.
+
+        :param likelihoods: :py:class:`Likelihood <asteca.likelihood.Likelihood>`
+            objects, one per cluster. Each one holds the
+            :py:class:`Cluster <asteca.cluster.Cluster>` object used to calibrate
+            ``synthcl`` for that cluster
+        :type likelihoods: list[Likelihood]
+        :param fix_params: Dictionary with the values for the fixed parameters, used
+            for all the clusters, or list with one dictionary per cluster. If
+            ``None`` no parameters are fixed, defaults to ``None``
+        :type fix_params: dict | list[dict] | None
+        :param bounds: Dictionary with the ranges of the fitted parameters, used for
+            all the clusters, or list with one dictionary per cluster. See
+            :py:meth:`Synthetic.fit() <asteca.synthetic.Synthetic.fit>`, defaults
+            to ``None``
+        :type bounds: dict | list[dict] | None
+        :param fit_kwargs: Additional arguments passed to
+            :py:meth:`Synthetic.fit() <asteca.synthetic.Synthetic.fit>` (except
+            ``n_jobs``), defaults to ``None``
+        :type fit_kwargs: dict | None
+
+        :raises ValueError:
+            -If the number of ``fix_params`` or ``bounds`` dictionaries does not
+            match the number of clusters
+            -If ``n_jobs`` is passed in ``fit_kwargs``
+            -If a cluster can not be calibrated, see
+            :py:meth:`Synthetic.calibrate() <asteca.synthetic.Synthetic.calibrate>`
+
+        :return: List with the results of the fits (see
+            :py:meth:`Synthetic.fit() <asteca.synthetic.Synthetic.fit>`), in the
+            same order as ``likelihoods``
+        :rtype: list[dict]
+        """
+        N_clusters = len(likelihoods)
+        if fix_params is None:
+            fix_params = {}
+        if isinstance(fix_params, dict):
+            fix_params = [fix_params] * N_clusters
+        if bounds is None or isinstance(bounds, dict):
+            bounds = [bounds] * N_clusters
+        for name, vals in (("fix_params", fix_params), ("bounds", bounds)):
+            if len(vals) != N_clusters:
+                raise ValueError(
+                    f"The number of '{name}' dictionaries ({len(vals)}) does not "
+                    + f"match the number of clusters ({N_clusters})"
+                )
+        fit_kwargs = {} if fit_kwargs is None else fit_kwargs
+        if "n_jobs" in fit_kwargs:
+            raise ValueError(
+                "'n_jobs' can not be passed in 'fit_kwargs', each cluster is fitted "
+                + "by a single process"
+            )
+
+        calibs = [
+            self.synthcl.calibration(lkl.my_cluster, fix)
+            for lkl, fix in zip(likelihoods, fix_params)
+        ]
+        # Independent random streams, one per cluster
+        seeds = np.random.SeedSequence(self.seed).spawn(N_clusters)
+        args = (calibs, likelihoods, bounds, [fit_kwargs] * N_clusters, seeds)
+
+        self._vp(f"\nFitting {N_clusters} clusters...", 1)
+        if self.n_jobs > 1:
+            # Forked workers share the arrays of the parent process
+            mp_context = None
+            if sys.platform.startswith("linux"):
+                mp_context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(
+                max_workers=self.n_jobs,
+                mp_context=mp_context,
+                initializer=fpriv.init_worker,
+                initargs=(self.synthcl, None),
+            ) as executor:
+                results = self._collect(executor.map(fpriv.cluster_worker, *args))
+        else:
+            results = self._collect(
+                fpriv.fit_cluster(self.synthcl, *_) for _ in zip(*args)
+            )
+        self._vp(f"{N_clusters} clusters fitted", 1)
+
+        return results
+
+    def _collect(self, results) -> list[dict]:
+        """Gather the results of the fits as they are finished"""
+        out = []
+        for i, result in enumerate(results):
+            out.append(result)
+            self._vp(f"Cluster {i} : lkl={result['lkl']:.4f}", 2)
+        return out
@@ -1,13 +1,28 @@
+import json
+import os
+import shutil
+import tempfile
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
+from scipy.optimize import differential_evolution
 
 from .cluster import Cluster
 from .isochrones import Isochrones
+from .likelihood import Likelihood
+from .modules import fit_priv as fpriv
+from .modules import likelihood_priv as lpriv
 from .modules import mass_binary as mb
+from .modules import profile_priv as pfpriv
+from .modules import shared_priv as shpriv
 from .modules import synth_cluster_priv as scp
 
+# Default maximum number of entries in the cache used by `Synthetic._mass_interp()`
+MASS_STENCILS_MAX = 256
+
 
 class Synthetic:
     """Define a :py:class:`Synthetic` object.
@@ -21,6 +36,14 @@ class Synthetic:
 
     See the :ref:`synth_clusters` section for more details.
 
+    The positions of the sampled masses in the isochrones are cached for the
+    combinations of grid nodes used while generating synthetic clusters. The cache
+    is kept by each process (it is not shared or pickled) and holds up to
+    ``N_mass_stencils`` entries (attribute, defaults to ``256``). Each entry holds
+    one integer (4 bytes) per sampled mass of a node, ~110 kB for the default
+    ``max_mass``, so a full cache takes ~30 MB. Set this attribute to ``0`` to
+    disable the cache, or to a smaller value to reduce the memory used.
+
     :param isochs: :py:class:`Isochrones <asteca.isochrones.Isochrones>` object with
         the loaded files for the theoretical isochrones
     :type isochs: Isochrones
@@ -48,6 +71,25 @@ class Synthetic:
     :param seed: Random seed. If ``None`` a random integer will be generated and used,
         defaults to ``None``
     :type seed: int | None
+    :param N_IMF_pools: Number of IMF samples shared by the (metallicity, age) grid
+        nodes. If ``None`` the IMF is sampled independently for each node of the
+        grid. If an integer is given, only this many samples are drawn and each
+        node uses one of them (without copying it), which greatly reduces the
+        memory and time required to instantiate the object for large grids,
+        defaults to ``None``
+    :type N_IMF_pools: int | None
+    :param dtype: Floating point precision used to store the isochrones, sampled
+        masses and random values, and to generate the synthetic clusters; one of
+        ``float64, float32``. The ``float32`` precision halves the memory used and
+        the data moved while generating synthetic clusters. The random values are
+        drawn in the same way for both precisions, so the synthetic clusters agree
+        to within the ``float32`` precision (~1e-7 relative) and the likelihood
+        values only change when a star falls on the edge of a bin. For the example
+        cluster in the documentation, 86% of 2000 random models have the same
+        ``plr`` value with both precisions, the largest difference is ~4e-4, and
+        the best model is the same. If ``None`` the precision of the ``isochs``
+        object is used, defaults to ``None``
+    :type dtype: str | None
     :param verbose: Verbose level. A value of ``0`` hides all output, defaults to ``1``
     :type verbose: int
 
@@ -63,6 +105,8 @@ class Synthetic:
         max_mass: int = 20_000,
         gamma: float | str = "D&K",
         seed: int | None = None,
+        N_IMF_pools: int | None = None,
+        dtype: str | None = None,
         verbose: int = 1,
     ) -> None:
         self.isochs = isochs
@@ -72,6 +116,8 @@ class Synthetic:
         self.max_mass = max_mass
         self.gamma = gamma
         self.seed = seed
+        self.N_IMF_pools = N_IMF_pools
+        self.dtype = isochs.dtype if dtype is None else dtype
         self.verbose = verbose
 
         # Set seed
@@ -100,6 +146,20 @@ class Synthetic:
                 f"IMF '{self.IMF_name}' not recognized. Should be one of {imfs}"
             )
 
+        # Check number of IMF pools
+        if self.N_IMF_pools is not None and self.N_IMF_pools < 1:
+            raise ValueError(
+                f"N_IMF_pools={self.N_IMF_pools} is not valid. Should be either "
+                + "None or a positive integer"
+            )
+
+        # Check precision
+        dtypes = ("float64", "float32")
+        if self.dtype not in dtypes:
+            raise ValueError(
+                f"dtype '{self.dtype}' not recognized. Should be one of {dtypes}"
+            )
+
         # Check extinction law
         ext_laws = ("CCMO", "GAIADR3")
         if self.ext_law not in ext_laws:
@@ -113,7 +173,13 @@ class Synthetic:
         # Sample the selected IMF
         Nmets, Nages = self.isochs.theor_tracks.shape[:2]
         self.st_dist_mass, self.st_dist_mass_ordered = scp.sample_imf(
-            self.rng, self.IMF_name, self.max_mass, Nmets, Nages
+            self.rng,
+            self.IMF_name,
+            self.max_mass,
+            Nmets,
+            Nages,
+            self.N_IMF_pools,
+            self.dtype,
         )
 
         # Add binary systems
@@ -124,7 +190,7 @@ class Synthetic:
             self.isochs.color2,
             self.isochs.theor_tracks,
             self.isochs.color_filters,
-        )
+        ).astype(self.dtype, copy=False)
 
         # Get extinction coefficients for these filters
         self.ext_coefs = []  # It is important to pass an empty list because the
@@ -154,15 +220,37 @@ class Synthetic:
 
         # Generate random floats used by `synth_clusters.synthcl_generate()`
         self.rand_floats = scp.randVals(self.rng, self.theor_tracks, self.st_dist_mass)
+        self.rand_floats = {
+            k: v.astype(self.dtype, copy=False) for k, v in self.rand_floats.items()
+        }
 
         # Store for internal usage
         self.met_age_dict = self.isochs.met_age_dict
 
+        # Cache of the positions of the sampled masses in each isochrone, used by
+        # `_mass_interp()`
+        self.N_mass_stencils = MASS_STENCILS_MAX
+        self._mass_stencils = {}
+
+        # Cache of likelihood values used by `evaluate()`, disabled by default
+        self.enable_cache(max_size=0)
+
+        # Path to the arrays shared with other processes, see `share()`
+        self._shared = None
+
+        # Per-stage profiling, disabled by default, see `profile_report()`
+        self.profile = False
+        self.profile_reset()
+
         self._vp(f"IMF            : {self.IMF_name}", 1)
         self._vp(f"Max init mass  : {self.max_mass}", 1)
+        if self.N_IMF_pools is not None:
+            self._vp(f"IMF pools      : {self.N_IMF_pools}", 1)
         self._vp(f"Gamma dist     : {self.gamma}", 1)
         self._vp(f"Extinction law : {self.ext_law}", 1)
         self._vp(f"Diff reddening : {self.DR_distribution}", 1)
+        if self.dtype != "float64":
+            self._vp(f"dtype          : {self.dtype}", 1)
         self._vp(f"Random seed    : {self.seed}", 1)
         self._vp("Synthetic clusters object generated")
 
@@ -171,6 +259,257 @@ class Synthetic:
         if self.verbose > level:
             print(mssg)
 
+    def share(self, directory: str | None = None) -> None:
+        """Move the large arrays to memory mapped files that are shared with other
+        processes.
+
+        The isochrones (including the binary systems), the sampled IMF masses and
+        the random values are stored as ``.npy`` files in a temporary folder and
+        replaced by read-only memory mapped views of these files. The isochrones of
+        the :py:class:`Isochrones <asteca.isochrones.Isochrones>` object are also
+        shared (see
+        :py:meth:`Isochrones.share() <asteca.isochrones.Isochrones.share>`). When
+        this object is passed to other processes (e.g.: the worker processes used
+        when ``n_jobs > 1``) the arrays are not copied, and the processes load the
+        same files instead. Hence, the memory used does not grow with the number of
+        processes. The temporary folder is removed when this object is garbage
+        collected.
+
+        :param directory: Folder where the temporary folder is created. A folder in
+            a RAM based file system (e.g.: ``/dev/shm`` in Linux) avoids writing the
+            arrays to disk. If ``None`` the default temporary folder of the system
+            is used, defaults to ``None``
+        :type directory: str | None
+        """
+        self.isochs.share(directory)
+        if self._shared is not None:
+            return
+
+        arrays, layout = self._shared_arrays()
+        arrays, path = shpriv.share_arrays(self, arrays, directory)
+        self._shared = {"path": path, **layout}
+        self._attach_shared(arrays)
+
+    def _shared_arrays(self) -> tuple[dict, dict]:
+        """Arrays stored by the :py:meth:`share` and :py:meth:`save` methods, and
+        the positions of the IMF samples in them"""
+        # The IMF samples can be shared by many nodes, store them only once
+        st_flat, st_pos, st_edges = shpriv.pack_nested(self.st_dist_mass)
+        st_ord_flat, st_ord_pos, st_ord_edges = shpriv.pack_nested(
+            self.st_dist_mass_ordered
+        )
+        arrays = {
+            "theor_tracks": self.theor_tracks,
+            "rand_norm": self.rand_floats["norm"],
+            "rand_unif": self.rand_floats["unif"],
+            "st_dist_mass": st_flat,
+            "st_dist_mass_ordered": st_ord_flat,
+        }
+        layout = {
+            "st_dist_mass": (st_pos, st_edges.tolist()),
+            "st_dist_mass_ordered": (st_ord_pos, st_ord_edges.tolist()),
+        }
+        return arrays, layout
+
+    def _isochs_id(self, isochs: Isochrones) -> dict:
+        """Data that identifies the isochrones used to generate this object"""
+        return {
+            "model": isochs.model,
+            "magnitude": isochs.magnitude,
+            "color": list(isochs.color),
+            "color2": None if isochs.color2 is None else list(isochs.color2),
+            "met": isochs.met_age_dict["met"].tolist(),
+            "loga": isochs.met_age_dict["loga"].tolist(),
+            "shape": list(isochs.theor_tracks.shape),
+        }
+
+    def save(self, path: str) -> None:
+        """Store this object in the ``path`` folder, so that it can be restored with
+        the :py:meth:`load` method without sampling the IMF or adding the binary
+        systems again.
+
+        The isochrones (including the binary systems), the sampled IMF masses and
+        the random values are stored as ``.npy`` files, and the rest of the data
+        (arguments, extinction coefficients and the state of the random generator)
+        in a ``meta.json`` file. The isochrones loaded in the
+        :py:class:`Isochrones <asteca.isochrones.Isochrones>` object are not stored.
+        If the folder exists, it is replaced only if it is empty or holds an object
+        stored by this method.
+
+        :param path: Path to the folder
+        :type path: str
+
+        :raises ValueError: If ``path`` exists and is not an empty folder or a
+            folder with an object stored by this method
+        """
+        if not shpriv.replaceable(path):
+            raise ValueError(
+                f"'{path}' exists and does not hold a stored Synthetic object. "
+                + "Use a new or empty folder"
+            )
+
+        arrays, layout = self._shared_arrays()
+        meta = {
+            "ext_law": self.ext_law,
+            "DR_distribution": self.DR_distribution,
+            "IMF_name": self.IMF_name,
+            "max_mass": self.max_mass,
+            "N_IMF_pools": self.N_IMF_pools,
+            "gamma": self.gamma,
+            "dtype": self.dtype,
+            "seed": self.seed,
+            "isochs": self._isochs_id(self.isochs),
+            "ext_coefs": self.ext_coefs,
+            "rng_state": self.rng.bit_generator.state,
+            "layout": layout,
+        }
+
+        # Write to a temporary folder first, so that an existing folder (which could
+        # be memory mapped by a loaded object) is never partially overwritten
+        parent_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=parent_dir)
+        try:
+            shpriv.save_arrays(tmp_path, arrays)
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.rename(tmp_path, path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        self._vp(f"Synthetic object saved to: {path}", 1)
+
+    @classmethod
+    def load(cls, path: str, isochs: Isochrones, verbose: int = 1) -> "Synthetic":
+        """Restore a :py:class:`Synthetic` object stored with the :py:meth:`save`
+        method.
+
+        The restored object generates exactly the same synthetic clusters as the
+        stored one, and its random generator continues from the same state. The
+        large arrays are memory mapped (read-only) from the stored files, so
+        loading is almost instantaneous and the object can be passed to other
+        processes without copying them (as after calling :py:meth:`share`). The
+        folder must not be modified or removed while the object is in use.
+
+        :param path: Path to the folder
+        :type path: str
+        :param isochs: :py:class:`Isochrones <asteca.isochrones.Isochrones>` object
+            with the same isochrones used to generate the stored object
+        :type isochs: Isochrones
+        :param verbose: Verbose level. A value of ``0`` hides all output, defaults
+            to ``1``
+        :type verbose: int
+
+        :raises ValueError: If the isochrones do not match the ones used to generate
+            the stored object
+
+        :return: Restored object
+        :rtype: Synthetic
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        self = cls.__new__(cls)
+        self.isochs = isochs
+        self.ext_law = meta["ext_law"]
+        self.DR_distribution = meta["DR_distribution"]
+        self.IMF_name = meta["IMF_name"]
+        self.max_mass = meta["max_mass"]
+        self.N_IMF_pools = meta["N_IMF_pools"]
+        self.gamma = meta["gamma"]
+        self.dtype = meta["dtype"]
+        self.seed = meta["seed"]
+        self.verbose = verbose
+
+        if self._isochs_id(isochs) != meta["isochs"]:
+            raise ValueError(
+                "The isochrones do not match the ones used to generate the "
+                + f"Synthetic object stored in '{path}'"
+            )
+
+        self.rng = np.random.default_rng()
+        self.rng.bit_generator.state = meta["rng_state"]
+        self.ext_coefs = meta["ext_coefs"]
+        self.met_age_dict = self.isochs.met_age_dict
+        self.N_mass_stencils = MASS_STENCILS_MAX
+        self._mass_stencils = {}
+        self.enable_cache(max_size=0)
+        self.profile = False
+        self.profile_reset()
+
+        # The stored files work as shared arrays. They are not removed when this
+        # object is garbage collected
+        self._shared = {"path": path, **meta["layout"]}
+        self._attach_shared(
+            shpriv.attach_arrays(
+                path,
+                [
+                    "theor_tracks",
+                    "rand_norm",
+                    "rand_unif",
+                    "st_dist_mass",
+                    "st_dist_mass_ordered",
+                ],
+            )
+        )
+
+        self._vp(f"Synthetic object loaded from: {path}")
+        return self
+
+    def _attach_shared(self, arrays: dict) -> None:
+        """Replace the large arrays by the shared ones"""
+        self.theor_tracks = arrays["theor_tracks"]
+        self.rand_floats = {"norm": arrays["rand_norm"], "unif": arrays["rand_unif"]}
+        self.st_dist_mass = shpriv.unpack_nested(
+            arrays["st_dist_mass"], *self._shared["st_dist_mass"]
+        )
+        self.st_dist_mass_ordered = shpriv.unpack_nested(
+            arrays["st_dist_mass_ordered"], *self._shared["st_dist_mass_ordered"]
+        )
+
+    def __getstate__(self) -> dict:
+        """The shared arrays are not pickled, see :py:meth:`share`. The caches and
+        the buffers are never pickled, they are rebuilt by each process"""
+        state = self.__dict__.copy()
+        state["_mass_stencils"] = {}
+        # The stored models are dropped, the cache keeps its settings
+        if state["_lkl_cache"] is not None:
+            state["_lkl_cache"] = {}
+        if "_workspace" in state:
+            state["_workspace"] = None
+        if self._shared is not None:
+            for k in (
+                "theor_tracks",
+                "rand_floats",
+                "st_dist_mass",
+                "st_dist_mass_ordered",
+            ):
+                state[k] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Load the shared arrays, see :py:meth:`share`"""
+        self.__dict__.update(state)
+        if self._shared is not None:
+            self._attach_shared(
+                shpriv.attach_arrays(
+                    self._shared["path"],
+                    [
+                        "theor_tracks",
+                        "rand_norm",
+                        "rand_unif",
+                        "st_dist_mass",
+                        "st_dist_mass_ordered",
+                    ],
+                )
+            )
+        # Buffers of a calibrated object
+        if "_workspace" in state:
+            self._workspace = scp.workspace(self.theor_tracks, self.N_obs_stars)
+
     def calibrate(self, cluster: Cluster, fix_params: dict = {}):
         """Calibrate a :py:class:`Synthetic` object based on a
         :py:class:`Cluster <asteca.cluster.Cluster>` object and a dictionary of fixed
@@ -181,6 +520,9 @@ class Synthetic:
         :py:class:`Synthetic` object. Additionally, a dictionary of fixed fundamental
         parameters (metallicity, age, distance, extinction, etc.) can be passed.
 
+        This is equivalent to ``set_calibration(calibration(cluster, fix_params))``,
+        see the :py:meth:`calibration` and :py:meth:`set_calibration` methods.
+
         See the :ref:`synth_clusters` section for more details.
 
         :param cluster: :py:class:`Cluster <asteca.cluster.Cluster>` object with the
@@ -197,6 +539,31 @@ class Synthetic:
             -If the metallicity or age parameters are not fixed to a
             single value but there ranges are.
         """
+        self.set_calibration(self.calibration(cluster, fix_params))
+
+    def calibration(self, cluster: Cluster, fix_params: dict = {}) -> dict:
+        """Obtain the calibration data for a
+        :py:class:`Cluster <asteca.cluster.Cluster>` object and a dictionary of fixed
+        fundamental parameters (``fix_params``), without storing it in this object.
+
+        The returned dictionary is a lightweight handle that holds only the data that
+        depends on the observed cluster. The isochrones, the sampled IMF and the
+        random values are not copied, so a single :py:class:`Synthetic` object can
+        keep the calibrations of many clusters and switch between them with the
+        :py:meth:`set_calibration` method.
+
+        :param cluster: :py:class:`Cluster <asteca.cluster.Cluster>` object with the
+            processed data from your observed cluster
+        :type cluster: Cluster
+        :param fix_params: Dictionary with the values for the fixed parameters (if any),
+            defaults to ``{}``
+        :type fix_params: dict
+
+        :raises ValueError: See the :py:meth:`calibrate` method
+
+        :return: Dictionary with the calibration data
+        :rtype: dict
+        """
         # Check that the number of colors match
         if self.isochs.color2_effl is not None and cluster.color2 is None:
             raise ValueError(
@@ -216,35 +583,9 @@ class Synthetic:
                 + "the N_clust_max value."
             )
 
-        # Data used by the `generate()` method
-        self.m_ini_idx = 2  # (0->mag, 1->color, 2->mass_ini)
-        if self.isochs.color2_effl is not None:
-            self.m_ini_idx = 3  # (0->mag, 1->color, 2->color2, 3->mass_ini)
-
-        self.max_mag_syn = max(cluster.mag_v)
-        self.N_obs_stars = len(cluster.mag_v)
-        self.err_dist = scp.error_distribution(
-            cluster.mag_v,
-            cluster.e_mag_v,
-            cluster.e_colors_v,
-            self.rand_floats["norm"][1],
-        )
-
-        # Used by the `get_models()` method and its result by the `stellar_masses()`
-        # and `binary_fraction()` methods
-        self.mag_v = cluster.mag_v
-        self.colors_v = cluster.colors_v
-
-        self.fix_params = fix_params
-
-        self.binar_flag = True
-        if "alpha" in list(fix_params.keys()) and "beta" in list(fix_params.keys()):
-            if fix_params["alpha"] == 0.0 and fix_params["beta"] == 0.0:
-                self.binar_flag = False
-
         # Check that the ranges are respected
         for par in ("met", "loga"):
-            if par not in self.fix_params.keys():
+            if par not in fix_params.keys():
                 N_par = len(self.met_age_dict[par])
                 if N_par == 1:
                     raise ValueError(
@@ -253,13 +594,71 @@ class Synthetic:
                     )
             else:
                 pmin, pmax = min(self.met_age_dict[par]), max(self.met_age_dict[par])
-                if self.fix_params[par] < pmin or self.fix_params[par] > pmax:
+                if fix_params[par] < pmin or fix_params[par] > pmax:
                     raise ValueError(
-                        f"Parameter {par}={self.fix_params[par]} out of range: [{pmin} - {pmax}]"
+                        f"Parameter {par}={fix_params[par]} out of range: [{pmin} - {pmax}]"
                     )
 
+        # Data used by the `generate()` method
+        m_ini_idx = 2  # (0->mag, 1->color, 2->mass_ini)
+        if self.isochs.color2_effl is not None:
+            m_ini_idx = 3  # (0->mag, 1->color, 2->color2, 3->mass_ini)
+
+        binar_flag = True
+        if "alpha" in list(fix_params.keys()) and "beta" in list(fix_params.keys()):
+            if fix_params["alpha"] == 0.0 and fix_params["beta"] == 0.0:
+                binar_flag = False
+
+        calib = {
+            "m_ini_idx": m_ini_idx,
+            "max_mag_syn": max(cluster.mag_v),
+            "N_obs_stars": len(cluster.mag_v),
+            "err_dist": [
+                _.astype(self.dtype, copy=False)
+                for _ in scp.error_distribution(
+                    cluster.mag_v,
+                    cluster.e_mag_v,
+                    cluster.e_colors_v,
+                    self.rand_floats["norm"][1],
+                )
+            ],
+            # Used by the `get_models()` method and its result by the
+            # `stellar_masses()` and `binary_fraction()` methods
+            "mag_v": cluster.mag_v,
+            "colors_v": cluster.colors_v,
+            "fix_params": fix_params,
+            "binar_flag": binar_flag,
+        }
+        return calib
+
+    def set_calibration(self, calib: dict) -> None:
+        """Calibrate this object with the data returned by the :py:meth:`calibration`
+        method.
+
+        :param calib: Dictionary with the calibration data
+        :type calib: dict
+        """
+        self.m_ini_idx = calib["m_ini_idx"]
+        self.max_mag_syn = calib["max_mag_syn"]
+        self.N_obs_stars = calib["N_obs_stars"]
+        self.err_dist = calib["err_dist"]
+        self.mag_v = calib["mag_v"]
+        self.colors_v = calib["colors_v"]
+        self.fix_params = calib["fix_params"]
+        self.binar_flag = calib["binar_flag"]
+
+        # Buffers used by `generate()` to avoid allocating new large arrays
+        self._workspace = scp.workspace(self.theor_tracks, self.N_obs_stars)
+
+        # Models evaluated with a previous calibration are not valid anymore
+        self.enable_cache(*self._lkl_cache_args)
+
     def generate(
-        self, fit_params: dict, plot_flag: bool = False, full_arr_flag: bool = False
+        self,
+        fit_params: dict,
+        plot_flag: bool = False,
+        full_arr_flag: bool = False,
+        use_workspace: bool = False,
     ) -> np.ndarray:
         """Generate a synthetic cluster.
 
@@ -279,6 +678,12 @@ class Synthetic:
             cluster, including the binary data (if any). Used mainly for plotting,
             defaults to ``False``
         :type full_arr_flag: bool
+        :param use_workspace: If ``True`` the synthetic cluster is generated in
+            buffers that are allocated once by the :py:meth:`calibrate` method, so
+            that no new large arrays are allocated. The returned array is a view of
+            these buffers and **it is overwritten** by the next call that uses them.
+            Copy the array if it needs to be kept, defaults to ``False``
+        :type use_workspace: bool
 
         :return: By default it returns a ``np.array`` containing a synthetic cluster
             with the shape ``[mag, c1, (c2)]``, where ``mag`` is the magnitude
@@ -286,12 +691,42 @@ class Synthetic:
             dimension(s). This changes depending on the flags above.
         :rtype: np.ndarray
         """
+        synth_clust = self._generate(fit_params, plot_flag, use_workspace)
+        if plot_flag or full_arr_flag or not synth_clust.any():
+            return synth_clust
+        return synth_clust[: self.m_ini_idx]
+
+    def _generate(
+        self, fit_params: dict, plot_flag: bool = False, use_workspace: bool = False
+    ) -> np.ndarray:
+        """Apply the full pipeline that generates a synthetic cluster, and return
+        the full array including the binary data (if any). Empty synthetic clusters
+        are returned as empty arrays.
+
+        If ``use_workspace`` is ``True`` the large arrays are stored in the buffers
+        of the workspace, which are overwritten by the next call.
+        """
+        ws = {"isoch": None, "isoch_tmp": None, "mass": None}
+        if use_workspace:
+            ws = self._workspace
+
+        # Profiling statistics, see `profile_report()`
+        prof = self._profile_stats if self.profile else None
+        if prof is not None:
+            pfpriv.count(prof, "N_models")
+            t0 = time.perf_counter()
 
         # Return proper values for fixed parameters and parameters required
         # for the (z, log(age)) isochrone averaging.
         met, loga, alpha, beta, av, dr, rv, dm, ml, mh, al, ah = scp.properModel(
             self.met_age_dict, self.fix_params, fit_params
         )
+        # The isochrones are modified in the precision of the object
+        alpha, beta, av, dr, rv, dm = (
+            self.theor_tracks.dtype.type(_) for _ in (alpha, beta, av, dr, rv, dm)
+        )
+        if prof is not None:
+            t0 = pfpriv.lap(prof, "properModel", t0)
 
         # Generate a weighted average isochrone from the (z, log(age)) values in
         # the 'model'.
@@ -305,10 +740,16 @@ class Synthetic:
             mh,
             al,
             ah,
+            ws["isoch"],
+            ws["isoch_tmp"],
         )
+        if prof is not None:
+            t0 = pfpriv.lap(prof, "zaWAverage", t0)
 
         # Move theoretical isochrone using the distance modulus
         isoch_moved = scp.move_isochrone(isochrone, self.m_ini_idx, dm)
+        if prof is not None:
+            t0 = pfpriv.lap(prof, "move_isochrone", t0)
 
         # Apply extinction correction
         isoch_extin = scp.extinction(
@@ -324,19 +765,31 @@ class Synthetic:
             rv,
             isoch_moved,
         )
+        if prof is not None:
+            pfpriv.lap(prof, "extinction", t0)
+            pfpriv.count(
+                prof,
+                "N_stars_cut",
+                int(np.count_nonzero(isoch_extin[0] < self.max_mag_syn)),
+            )
+            t0 = time.perf_counter()
 
         # Remove isochrone stars beyond the maximum magnitude
-        isoch_cut = scp.cut_max_mag(isoch_extin, self.max_mag_syn)
-        if not isoch_cut.any():
-            return np.array([])
         if plot_flag:
+            isoch_cut = scp.cut_max_mag(isoch_extin, self.max_mag_syn)
+            if not isoch_cut.any():
+                return np.array([])
             return isoch_cut
 
-        # Interpolate IMF's sampled masses into the isochrone.
-        isoch_mass = scp.mass_interp(
-            isoch_cut, self.m_ini_idx, self.st_dist_mass[ml][al], self.N_obs_stars
+        # Interpolate IMF's sampled masses into the (cut) isochrone.
+        isoch_mass = self._mass_interp(
+            isoch_extin, met, loga, ml, mh, al, ah, ws["mass"]
         )
+        if prof is not None:
+            t0 = pfpriv.lap(prof, "mass_interp", t0)
         if not isoch_mass.any():
+            if prof is not None:
+                pfpriv.count(prof, "N_empty")
             return np.array([])
 
         # Assignment of binarity.
@@ -348,19 +801,747 @@ class Synthetic:
             self.rand_floats["unif"][1],
             isoch_mass,
         )
+        if prof is not None:
+            t0 = pfpriv.lap(prof, "binarity", t0)
 
         # Assign errors according to errors distribution.
         synth_clust = scp.add_errors(isoch_binar, self.err_dist)
+        if prof is not None:
+            pfpriv.lap(prof, "add_errors", t0)
 
-        if full_arr_flag:
-            return synth_clust
-        return synth_clust[: self.m_ini_idx]
+        return synth_clust
+
+    def generate_hess(self, fit_params: dict, likelihood: Likelihood) -> np.ndarray:
+        """Generate a synthetic cluster binned into the Hess diagram of the observed
+        cluster.
+
+        The synthetic stars are binned directly using the bin edges defined in the
+        :py:class:`Likelihood <asteca.likelihood.Likelihood>` object, and only the
+        counts in the bins where stars were observed are returned. The result is
+        meant to be passed to the
+        :py:meth:`Likelihood.get_hess() <asteca.likelihood.Likelihood.get_hess>`
+        method, which is equivalent to (but faster than)
+        ``likelihood.get(synthcl.generate(fit_params))``.
+
+        :param fit_params: Dictionary with the values for the fundamental parameters
+            that were **not** included in the ``fix_params`` dictionary when the
+            :py:class:`Synthetic` object was calibrated
+            (:py:meth:`calibrate` method).
+        :type fit_params: dict
+        :param likelihood: :py:class:`Likelihood <asteca.likelihood.Likelihood>`
+            object generated with the same observed cluster used to calibrate this
+            object
+        :type likelihood: Likelihood
+
+        :raises ValueError: If the likelihood does not use a binned Hess diagram
+
+        :return: Counts of synthetic stars in the bins of the observed Hess diagram
+            that contain stars. An empty array is returned for empty synthetic
+            clusters
+        :rtype: np.ndarray
+        """
+        if likelihood.lkl_name not in ("plr", "chisq"):
+            raise ValueError(
+                f"Likelihood '{likelihood.lkl_name}' does not use a binned Hess diagram"
+            )
+
+        # The synthetic cluster is binned right away, use the workspace
+        synth_clust = self._generate(fit_params, use_workspace=True)
+        if not synth_clust.any():
+            return np.array([])
+
+        if self.profile:
+            t0 = time.perf_counter()
+        if likelihood.cell_slot is not None:
+            syn_histo_f_z = lpriv.synth_hess_sparse(
+                likelihood.ranges,
+                likelihood.Nbins,
+                likelihood.cell_slot,
+                likelihood.cl_histo_f_z.size,
+                synth_clust[: self.m_ini_idx],
+            )
+        else:
+            syn_histo_f_z = lpriv.synth_hess(
+                likelihood.ranges, likelihood.Nbins, synth_clust[: self.m_ini_idx]
+            )[likelihood.cl_z_idx]
+        if self.profile:
+            pfpriv.lap(self._profile_stats, "synth_hess", t0)
+
+        return syn_histo_f_z
+
+    def generate_batch(
+        self, fit_params: dict[str, np.ndarray], full_arr_flag: bool = False
+    ) -> list[np.ndarray]:
+        """Generate a batch of synthetic clusters.
+
+        The (z, log(age)) averaging, distance and extinction steps are applied to all
+        the models in the batch at once. The remaining steps depend on the number of
+        stars that survive the maximum magnitude cut, and are applied per model. Each
+        returned synthetic cluster is equal to the one returned by :py:meth:`generate`
+        for the same parameters.
+
+        :param fit_params: Dictionary with the values for the fundamental parameters
+            that were **not** included in the ``fix_params`` dictionary when the
+            :py:class:`Synthetic` object was calibrated
+            (:py:meth:`calibrate` method). Each value is an array with one element per
+            model
+        :type fit_params: dict[str, np.ndarray]
+        :param full_arr_flag: If ``True`` returns the full arrays for the synthetic
+            clusters, including the binary data (if any), defaults to ``False``
+        :type full_arr_flag: bool
+
+        :return: List of ``np.array``, one per model, with the same format as the
+            arrays returned by :py:meth:`generate`. Empty synthetic clusters are
+            returned as empty arrays
+        :rtype: list[np.ndarray]
+        """
+        fit_params = {k: np.atleast_1d(v) for k, v in fit_params.items()}
+        N_models = len(next(iter(fit_params.values())))
+
+        # Process the models in chunks to limit the memory used by the four stacked
+        # isochrones gathered per model (~16 Mb per chunk). Larger chunks are
+        # slower as they no longer fit in the cache
+        N_chunk = max(1, int(5e5 / self.theor_tracks[0, 0].size))
+
+        # Profiling statistics, see `profile_report()`
+        prof = self._profile_stats if self.profile else None
+
+        synth_clusts = []
+        for i0 in range(0, N_models, N_chunk):
+            chunk = {k: v[i0 : i0 + N_chunk] for k, v in fit_params.items()}
+            N = len(next(iter(chunk.values())))
+            if prof is not None:
+                pfpriv.count(prof, "N_models", N)
+                t0 = time.perf_counter()
+
+            met, loga, alpha, beta, av, dr, rv, dm, ml, mh, al, ah = (
+                scp.properModel_batch(self.met_age_dict, self.fix_params, chunk)
+            )
+            # The isochrones are modified in the precision of the object
+            alpha, beta, av, dr, rv, dm = (
+                _.astype(self.theor_tracks.dtype, copy=False)
+                for _ in (alpha, beta, av, dr, rv, dm)
+            )
+            if prof is not None:
+                t0 = pfpriv.lap(prof, "properModel", t0, N)
+
+            isochs = scp.zaWAverage_batch(
+                self.theor_tracks,
+                self.met_age_dict,
+                self.m_ini_idx,
+                met,
+                loga,
+                ml,
+                mh,
+                al,
+                ah,
+            )
+            if prof is not None:
+                t0 = pfpriv.lap(prof, "zaWAverage", t0, N)
+            isochs = scp.move_isochrone(isochs, self.m_ini_idx, dm[:, None])
+            if prof is not None:
+                t0 = pfpriv.lap(prof, "move_isochrone", t0, N)
+            isochs = scp.extinction(
+                self.ext_law,
+                self.ext_coefs,
+                self.rand_floats["norm"][0],
+                self.rand_floats["unif"][0],
+                self.DR_distribution,
+                self.m_ini_idx,
+                self.binar_flag,
+                av[:, None],
+                dr[:, None],
+                rv[:, None],
+                isochs,
+            )
+            if prof is not None:
+                pfpriv.lap(prof, "extinction", t0, N)
+                pfpriv.count(
+                    prof,
+                    "N_stars_cut",
+                    int(np.count_nonzero(isochs[:, 0] < self.max_mag_syn)),
+                )
+
+            for j, isoch_extin in enumerate(isochs):
+                if prof is not None:
+                    t0 = time.perf_counter()
+                isoch_mass = self._mass_interp(
+                    isoch_extin, met[j], loga[j], ml[j], mh[j], al[j], ah[j]
+                )
+                if prof is not None:
+                    t0 = pfpriv.lap(prof, "mass_interp", t0)
+                if not isoch_mass.any():
+                    if prof is not None:
+                        pfpriv.count(prof, "N_empty")
+                    synth_clusts.append(np.array([]))
+                    continue
+                isoch_binar = scp.binarity(
+                    alpha[j],
+                    beta[j],
+                    self.binar_flag,
+                    self.m_ini_idx,
+                    self.rand_floats["unif"][1],
+                    isoch_mass,
+                )
+                if prof is not None:
+                    t0 = pfpriv.lap(prof, "binarity", t0)
+                synth_clust = scp.add_errors(isoch_binar, self.err_dist)
+                if prof is not None:
+                    pfpriv.lap(prof, "add_errors", t0)
+                if full_arr_flag:
+                    synth_clusts.append(synth_clust)
+                else:
+                    synth_clusts.append(synth_clust[: self.m_ini_idx])
+
+        return synth_clusts
+
+    def enable_cache(
+        self, max_size: int = 100_000, tol: float = 1e-6, store_hess: bool = False
+    ) -> None:
+        """Enable (or disable) the cache of likelihood values used by the
+        :py:meth:`evaluate` method.
+
+        Optimizers and samplers often propose the same model more than once. With the
+        cache enabled, repeated models are not generated again and their likelihood
+        is read from the cache instead. The cache is emptied when the object is
+        calibrated (:py:meth:`calibrate` method) or when this method is called again.
+
+        :param max_size: Maximum number of models stored. When the cache is full the
+            least recently used model is removed. A value of ``0`` disables the
+            cache, defaults to ``100_000``
+        :type max_size: int
+        :param tol: Tolerance used to identify models: parameter values that round
+            to the same multiple of ``tol`` are considered equal, defaults to ``1e-6``
+        :type tol: float
+        :param store_hess: If ``True`` also store the binned synthetic clusters
+            (see :py:meth:`generate_hess`), which can be retrieved with the
+            :py:meth:`cached_hess` method. This requires much more memory per stored
+            model, defaults to ``False``
+
+        :raises ValueError: If ``max_size`` is negative or ``tol`` is not positive
+        """
+        if max_size < 0:
+            raise ValueError(f"max_size={max_size} is not valid. Should be >= 0")
+        if tol <= 0:
+            raise ValueError(f"tol={tol} is not valid. Should be > 0")
+
+        self._lkl_cache = {} if max_size > 0 else None
+        self._lkl_cache_args = (max_size, tol, store_hess)
+        self.cache_hits, self.cache_misses = 0, 0
+
+    def evaluate(self, fit_params: dict, likelihood: Likelihood) -> float:
+        """Generate a synthetic cluster and evaluate its likelihood.
+
+        Equivalent to ``likelihood.get(synthcl.generate(fit_params))``. If the cache
+        was enabled (:py:meth:`enable_cache` method), models that were already
+        evaluated with this ``likelihood`` object are read from the cache. The
+        number of models read from the cache and evaluated are stored in the
+        ``cache_hits`` and ``cache_misses`` attributes.
+
+        :param fit_params: Dictionary with the values for the fundamental parameters
+            that were **not** included in the ``fix_params`` dictionary when the
+            :py:class:`Synthetic` object was calibrated
+            (:py:meth:`calibrate` method).
+        :type fit_params: dict
+        :param likelihood: :py:class:`Likelihood <asteca.likelihood.Likelihood>`
+            object generated with the same observed cluster used to calibrate this
+            object
+        :type likelihood: Likelihood
+
+        :return: Likelihood value
+        :rtype: float
+        """
+        key = None
+        if self._lkl_cache is not None:
+            key = (likelihood, self._cache_key(fit_params))
+            try:
+                # Re-insert the model to mark it as the most recently used
+                lkl_hess = self._lkl_cache[key] = self._lkl_cache.pop(key)
+                self.cache_hits += 1
+                return lkl_hess[0]
+            except KeyError:
+                self.cache_misses += 1
+
+        syn_histo_f_z = None
+        if likelihood.lkl_name in ("plr", "chisq"):
+            syn_histo_f_z = self.generate_hess(fit_params, likelihood)
+            lkl = likelihood.get_hess(syn_histo_f_z)
+        else:
+            lkl = likelihood.get(self.generate(fit_params))
+
+        if key is not None:
+            max_size, _, store_hess = self._lkl_cache_args
+            # Keep the cache bounded, remove the least recently used entry
+            if len(self._lkl_cache) >= max_size:
+                self._lkl_cache.pop(next(iter(self._lkl_cache)))
+            self._lkl_cache[key] = (lkl, syn_histo_f_z if store_hess else None)
+
+        return lkl
+
+    def cached_hess(
+        self, fit_params: dict, likelihood: Likelihood
+    ) -> np.ndarray | None:
+        """Return the binned synthetic cluster stored in the cache for this model, see
+        :py:meth:`enable_cache`.
+
+        :param fit_params: Dictionary with the values for the fundamental parameters
+            that were **not** included in the ``fix_params`` dictionary when the
+            :py:class:`Synthetic` object was calibrated
+            (:py:meth:`calibrate` method).
+        :type fit_params: dict
+        :param likelihood: :py:class:`Likelihood <asteca.likelihood.Likelihood>`
+            object used to evaluate the model
+        :type likelihood: Likelihood
+
+        :return: Counts of synthetic stars in the bins of the observed Hess diagram
+            that contain stars, or ``None`` if the model is not in the cache or its
+            counts were not stored
+        :rtype: np.ndarray | None
+        """
+        if self._lkl_cache is None:
+            return None
+        lkl_hess = self._lkl_cache.get((likelihood, self._cache_key(fit_params)))
+        if lkl_hess is None:
+            return None
+        return lkl_hess[1]
+
+    def _cache_key(self, fit_params: dict) -> tuple:
+        """Key of a model in the likelihood cache"""
+        return scp.model_key(self.fix_params, fit_params, self._lkl_cache_args[1])
+
+    def profile_reset(self) -> None:
+        """Reset the profiling statistics, see :py:meth:`profile_report`."""
+        self._profile_stats = pfpriv.new_stats()
+
+    def profile_report(self, as_dataframe: bool = False) -> dict | pd.DataFrame:
+        """Report the time spent in each stage of the pipeline that generates the
+        synthetic clusters.
+
+        Profiling is disabled by default, set the ``profile`` attribute to ``True``
+        to enable it (e.g.: ``synthcl.profile = True``). While enabled, the number of
+        calls and the time spent in each stage (``properModel, zaWAverage,
+        move_isochrone, extinction, mass_interp, binarity, add_errors``) are
+        accumulated by the :py:meth:`generate`, :py:meth:`generate_batch` and
+        :py:meth:`generate_hess` (binning stage ``synth_hess``) methods, along with
+        these counters:
+
+        - ``N_models``: number of models generated
+        - ``N_stars_cut``: number of isochrone stars that survive the maximum
+          magnitude cut
+        - ``N_empty``: number of models rejected because their synthetic cluster is
+          empty
+
+        Only the calls made in this process are recorded, not those made in worker
+        processes (``n_jobs > 1``). When disabled the overhead is negligible. The
+        statistics are emptied with the :py:meth:`profile_reset` method.
+
+        :param as_dataframe: If ``True`` return the stages as a ``pd.DataFrame``,
+            defaults to ``False``
+        :type as_dataframe: bool
+
+        :return: Dictionary with the number of calls (``calls``), total time in
+            seconds (``time``) and fraction of the total time (``fraction``) of each
+            stage (``stages``), and the counters (``counters``). Or a
+            ``pd.DataFrame`` with one row per stage and the same columns, plus the
+            mean time per call (``time_per_call``), and the counters in its
+            ``attrs["counters"]`` dictionary
+        :rtype: dict | pd.DataFrame
+        """
+        return pfpriv.report(self._profile_stats, as_dataframe)
+
+    def _mass_interp(
+        self,
+        isoch_extin: np.ndarray,
+        met: float,
+        loga: float,
+        ml: int,
+        mh: int,
+        al: int,
+        ah: int,
+        buffers: tuple[np.ndarray, np.ndarray] | None = None,
+    ) -> np.ndarray:
+        """Remove the isochrone stars beyond the maximum magnitude, and interpolate
+        the IMF's sampled masses into the cut isochrone.
+
+        The positions of the sampled masses in the isochrone's masses are cached
+        for each combination of grid nodes (up to ``N_mass_stencils`` entries, per
+        process), so that repeated calls for the same nodes skip all the search
+        work. Empty isochrones are returned as empty
+        arrays.
+        """
+        # Node that provides the masses to the isochrone, and node that provides
+        # the sampled masses
+        mc, ac = scp.closest_node(self.met_age_dict, met, loga, ml, mh, al, ah)
+        key = (mc, ac, ml, al)
+        st_dist_mass = self.st_dist_mass[ml][al]
+
+        try:
+            stencil = self._mass_stencils[key]
+        except KeyError:
+            stencil = scp.mass_stencil(
+                self.theor_tracks[mc, ac, self.m_ini_idx], st_dist_mass
+            )
+            if self.N_mass_stencils > 0:
+                # Keep the cache bounded, remove the oldest entries
+                while len(self._mass_stencils) >= self.N_mass_stencils:
+                    self._mass_stencils.pop(next(iter(self._mass_stencils)))
+                self._mass_stencils[key] = stencil
+
+        # The isochrone's masses are not sorted, use the direct method
+        if stencil is None:
+            isoch_cut = scp.cut_max_mag(isoch_extin, self.max_mag_syn)
+            if not isoch_cut.any():
+                return np.array([])
+            return scp.mass_interp(
+                isoch_cut, self.m_ini_idx, st_dist_mass, self.N_obs_stars, buffers
+            )
+
+        return scp.mass_interp_stencil(
+            isoch_extin,
+            self.max_mag_syn,
+            self.m_ini_idx,
+            st_dist_mass,
+            stencil,
+            self.N_obs_stars,
+            buffers,
+        )
+
+    def fit(
+        self,
+        likelihood: Likelihood,
+        bounds: dict[str, tuple[float, float]] | None = None,
+        popsize: int = 15,
+        maxiter: int = 100,
+        N_walkers: int | None = None,
+        N_steps: int = 500,
+        N_burn: int = 250,
+        surrogate: bool = False,
+        surrogate_frac: float = 0.2,
+        surrogate_dist: float = 0.05,
+        n_jobs: int = 1,
+    ) -> dict:
+        """Fit the fundamental parameters that were not fixed when the object was
+        calibrated (:py:meth:`calibrate` method).
+
+        The fit is performed in two stages. First a global optimizer (differential
+        evolution, see `scipy.optimize.differential_evolution
+        <https://docs.scipy.org/doc/scipy/reference/generated/scipy.optimize.differential_evolution.html>`__)
+        searches for the model that minimizes the ``likelihood`` (which works as a
+        distance). Then an ensemble MCMC (affine invariant stretch move) is started
+        around this model to estimate the uncertainties of the parameters.
+
+        All the candidate models of a generation (or of a half of the walkers' ensemble)
+        are generated and evaluated in a single batch
+        (:py:meth:`generate_batch` and
+        :py:meth:`Likelihood.get_batch() <asteca.likelihood.Likelihood.get_batch>`
+        methods), split among ``n_jobs`` processes.
+
+        :param likelihood: :py:class:`Likelihood <asteca.likelihood.Likelihood>`
+            object generated with the same observed cluster used to calibrate this
+            object
+        :type likelihood: Likelihood
+        :param bounds: Dictionary with the ``(min, max)`` range for each fitted
+            parameter. The ranges for the metallicity and age default to the ranges
+            of the loaded isochrones, and must be contained within them. All the
+            other fitted parameters require a range, defaults to ``None``
+        :type bounds: dict[str, tuple[float, float]] | None
+        :param popsize: Multiplier for the population size of the differential
+            evolution: the population holds ``popsize * N_params`` models, where
+            ``N_params`` is the number of fitted parameters, defaults to ``15``
+        :type popsize: int
+        :param maxiter: Maximum number of generations of the differential evolution,
+            defaults to ``100``
+        :type maxiter: int
+        :param N_walkers: Number of walkers for the MCMC. If ``None``, four times the
+            number of fitted parameters is used, defaults to ``None``
+        :type N_walkers: int | None
+        :param N_steps: Number of steps of the MCMC. A value of ``0`` skips the MCMC,
+            defaults to ``500``
+        :type N_steps: int
+        :param N_burn: Number of initial MCMC steps discarded as burn-in, defaults to
+            ``250``
+        :type N_burn: int
+        :param surrogate: If ``True`` a surrogate of the likelihood (a local k-NN
+            regressor trained on the evaluated models) is used to reduce the number
+            of synthetic clusters generated. In the differential evolution only the
+            most promising candidates, and those far from any evaluated model, are
+            evaluated. In the MCMC the proposals are first screened with the
+            surrogate (delayed acceptance), which does not change the sampled
+            distribution, defaults to ``False``
+        :type surrogate: bool
+        :param surrogate_frac: Fraction of the candidates of each differential
+            evolution generation that are always evaluated (those with the best
+            predicted values) when ``surrogate=True``, defaults to ``0.2``
+        :type surrogate_frac: float
+        :param surrogate_dist: Distance (in units of the parameter ranges) beyond
+            which the surrogate is not trusted, and the candidates are evaluated,
+            when ``surrogate=True``. Lower ``surrogate_frac`` and larger
+            ``surrogate_dist`` values evaluate fewer models, at the risk of missing
+            the best one. For the example cluster in the documentation (with
+            ``popsize=10, maxiter=60, N_steps=300``) the differential evolution
+            evaluates 2120 models without the surrogate, 1201 with the default
+            values, 773 with ``(0.1, 0.1)`` (similar best model), and 337 with
+            ``(0.05, 0.2)`` (noticeably worse best model). The MCMC is not affected
+            by these values: the delayed acceptance still evaluates every proposal
+            accepted by the surrogate, about half of them (~2800 of ~4800). Hence
+            the total number of evaluations drops by a factor of ~2, not by an
+            order of magnitude, defaults to ``0.05``
+        :type surrogate_dist: float
+        :param n_jobs: Number of processes used to evaluate the models, defaults to
+            ``1``
+        :type n_jobs: int
+
+        :raises ValueError:
+            -If a parameter in ``bounds`` is not a fitted parameter
+            -If the range of a fitted parameter is missing or not valid
+            -If the number of walkers or steps are not valid
+            -If ``surrogate_frac`` or ``surrogate_dist`` are not valid
+
+        :return: Dictionary with the best fit model found (``model``) and its
+            likelihood value (``lkl``), the medians (``model_median``) and standard
+            deviations (``model_std``) of the MCMC samples, the samples themselves
+            (``samples``), the MCMC acceptance fraction (``acceptance``), and the
+            number of synthetic clusters evaluated (``N_evals``). The
+            ``model_median`` and ``model_std`` dictionaries can be passed to the
+            :py:meth:`get_models` method
+        :rtype: dict
+        """
+        fit_names, bounds_arr = fpriv.fit_bounds(
+            self.fix_params, self.met_age_dict, {} if bounds is None else bounds
+        )
+        N_params = len(fit_names)
+        N_walkers = fpriv.n_walkers(N_walkers, N_params)
+        if N_steps < 0 or N_burn < 0 or (N_steps > 0 and N_burn >= N_steps):
+            raise ValueError(
+                f"N_steps={N_steps}, N_burn={N_burn} are not valid. Should be "
+                + "N_steps > N_burn >= 0, or N_steps=0"
+            )
+        if not 0 < surrogate_frac <= 1 or surrogate_dist < 0:
+            raise ValueError(
+                f"surrogate_frac={surrogate_frac}, surrogate_dist={surrogate_dist} "
+                + "are not valid. Should be 0 < surrogate_frac <= 1 and "
+                + "surrogate_dist >= 0"
+            )
+
+        self._vp("\nFitting parameters...", 1)
+        self._vp(f"Fitted params  : {', '.join(fit_names)}", 1)
+        self._vp(f"Population     : {popsize * N_params}", 1)
+        self._vp(f"Max generations: {maxiter}", 1)
+        self._vp(f"N_walkers      : {N_walkers}", 1)
+        self._vp(f"N_steps        : {N_steps} (burn-in: {N_burn})", 1)
+        self._vp(f"N_jobs         : {n_jobs}", 1)
+
+        N_evals = 0
+        with fpriv.lkl_evaluator(self, likelihood, fit_names, n_jobs) as lkl_eval:
+
+            def lkl_f(models: np.ndarray) -> np.ndarray:
+                nonlocal N_evals
+                N_evals += len(models)
+                return lkl_eval(models)
+
+            def log_prob_f(models: np.ndarray) -> np.ndarray:
+                return fpriv.log_prob_models(
+                    models, bounds_arr, lkl_f, likelihood.lkl_name, likelihood.max_lkl
+                )
+
+            # Models evaluated during the differential evolution, used by the surrogate
+            archive = {"X": [], "y": []}
+
+            def de_f(x: np.ndarray) -> np.ndarray:
+                if surrogate:
+                    return fpriv.prescreen(
+                        lkl_f, archive, x.T, bounds_arr, surrogate_frac, surrogate_dist
+                    )
+                return lkl_f(x.T)
+
+            # The whole population of each generation is evaluated at once
+            de_result = differential_evolution(
+                de_f,
+                bounds_arr,
+                popsize=popsize,
+                maxiter=maxiter,
+                rng=self.rng,
+                polish=False,
+                updating="deferred",
+                vectorized=True,
+            )
+            best_model, best_lkl = de_result.x, float(de_result.fun)
+            log_prob_sur = None
+            if surrogate:
+                # Best model among those actually evaluated
+                X, y = np.concatenate(archive["X"]), np.concatenate(archive["y"])
+                best_model, best_lkl = X[np.argmin(y)], float(y.min())
+
+                # The surrogate is frozen for the MCMC
+                sur = fpriv.surrogate(*fpriv.archive_data(archive), bounds_arr)
+
+                def log_prob_sur(models: np.ndarray) -> np.ndarray:
+                    return fpriv.log_prob_models(
+                        models,
+                        bounds_arr,
+                        lambda _: fpriv.surrogate_predict(sur, _)[0],
+                        likelihood.lkl_name,
+                        likelihood.max_lkl,
+                    )
+
+            self._vp(f"DE generations : {de_result.nit}", 1)
+
+            samples = np.empty((0, N_params))
+            acceptance = np.nan
+            if N_steps > 0:
+                # Start the walkers in a small ball around the best model
+                p0 = fpriv.walkers_ball(best_model, bounds_arr, N_walkers, self.rng)
+                chain, lp_chain, acceptance = fpriv.stretch_sampler(
+                    log_prob_f, p0, N_steps, self.rng, log_prob_sur=log_prob_sur
+                )
+                samples = chain[N_burn:].reshape(-1, N_params)
+                self._vp(f"Acceptance     : {acceptance:.2f}", 1)
+
+                # The MCMC could have found a better model
+                i, j = np.unravel_index(np.argmax(lp_chain), lp_chain.shape)
+                lkl = lkl_f(chain[i, j][None, :])[0]
+                if lkl < best_lkl:
+                    best_model, best_lkl = chain[i, j], float(lkl)
+
+        model = dict(zip(fit_names, best_model.tolist()))
+        model_median, model_std = {}, {}
+        if len(samples) > 0:
+            model_median = dict(zip(fit_names, np.median(samples, 0).tolist()))
+            model_std = dict(zip(fit_names, np.std(samples, 0).tolist()))
+        self._vp(
+            "Best model     : "
+            + ", ".join(f"{k}: {round(v, 3)}" for k, v in model.items()),
+            1,
+        )
+        self._vp(f"Likelihood     : {best_lkl:.4f}", 1)
+        self._vp(f"N_evals        : {N_evals}", 1)
+
+        return {
+            "model": model,
+            "lkl": best_lkl,
+            "model_median": model_median,
+            "model_std": model_std,
+            "samples": dict(zip(fit_names, samples.T)),
+            "acceptance": acceptance,
+            "N_evals": N_evals,
+        }
+
+    def grid_profile(
+        self,
+        likelihood: Likelihood,
+        bounds: dict[str, tuple[float, float]] | None = None,
+        N_profile: int = 100,
+        N_refine: int = 5,
+        n_jobs: int = 1,
+    ) -> dict:
+        """Evaluate the likelihood on the (metallicity, age) grid of the isochrones,
+        and refine it around the most promising nodes.
+
+        For each node of the grid within the ranges, the likelihood is profiled over
+        the rest of the fitted parameters (distance, extinction, etc) by evaluating
+        the same ``N_profile`` random sets of values in all the nodes, and keeping
+        the best one. The ``N_refine`` nodes with the best profile likelihood are
+        then refined by evaluating the points halfway to their neighbouring nodes,
+        using the best sets of values found for the node. This discards most of the
+        (metallicity, age) volume at a fraction of the cost of a full fit, and the
+        best model found is a good starting point for the :py:meth:`fit` method or a
+        :py:class:`Sampler <asteca.sampler.Sampler>`.
+
+        :param likelihood: :py:class:`Likelihood <asteca.likelihood.Likelihood>`
+            object generated with the same observed cluster used to calibrate this
+            object
+        :type likelihood: Likelihood
+        :param bounds: Dictionary with the ``(min, max)`` range for each fitted
+            parameter, see :py:meth:`fit`, defaults to ``None``
+        :type bounds: dict[str, tuple[float, float]] | None
+        :param N_profile: Number of sets of values used to profile the likelihood in
+            each node, defaults to ``100``
+        :type N_profile: int
+        :param N_refine: Number of nodes refined, defaults to ``5``
+        :type N_refine: int
+        :param n_jobs: Number of processes used to evaluate the models, defaults to
+            ``1``
+        :type n_jobs: int
+
+        :raises ValueError: If the ranges are not valid, see :py:meth:`fit`
+
+        :return: Dictionary with the metallicity (``met``) and age (``loga``) values
+            of the grid nodes, the profile likelihood of each node (``profile``,
+            shape ``(N_met, N_age)``), and the best model found (``model``) and its
+            likelihood value (``lkl``)
+        :rtype: dict
+        """
+        fit_names, bounds_arr = fpriv.fit_bounds(
+            self.fix_params, self.met_age_dict, {} if bounds is None else bounds
+        )
+        met_vals, loga_vals = fpriv.grid_nodes(
+            self.met_age_dict, self.fix_params, fit_names, bounds_arr
+        )
+        nodes = np.array([(m, a) for m in met_vals for a in loga_vals])
+
+        # Random sets of values for the continuous parameters, shared by all nodes
+        cont_idx = [i for i, k in enumerate(fit_names) if k not in ("met", "loga")]
+        if len(cont_idx) == 0:
+            N_profile = 1
+        cont = self.rng.uniform(
+            bounds_arr[cont_idx, 0], bounds_arr[cont_idx, 1], (N_profile, len(cont_idx))
+        )
+
+        self._vp("\nGrid profile...", 1)
+        self._vp(f"N_nodes        : {len(met_vals)} x {len(loga_vals)}", 1)
+        self._vp(f"N_profile      : {N_profile}", 1)
+        self._vp(f"N_refine       : {N_refine}", 1)
+
+        # Evaluate in chunks to keep the synthetic clusters in memory bounded
+        with fpriv.lkl_evaluator(
+            self, likelihood, fit_names, n_jobs, N_chunk=500
+        ) as lkl_f:
+            # Coarse step: profile likelihood in each node of the grid
+            models = fpriv.node_models(nodes, fit_names, cont)
+            lkls = lkl_f(models).reshape(len(nodes), N_profile)
+            profile = lkls.min(1)
+            best_models, best_lkls = [models[np.argmin(lkls)]], [profile.min()]
+
+            # Fine step: points around the best nodes, using the best values of the
+            # continuous parameters found for each node
+            N_best = max(1, N_profile // 10)
+            for n in np.argsort(profile)[:N_refine]:
+                if not np.isfinite(profile[n]):
+                    break
+                i, j = divmod(int(n), len(loga_vals))
+                fine = fpriv.refine_nodes(met_vals, loga_vals, i, j)
+                if len(fine) == 0:
+                    continue
+                models = fpriv.node_models(
+                    fine, fit_names, cont[np.argsort(lkls[n])[:N_best]]
+                )
+                fine_lkls = lkl_f(models)
+                best_models.append(models[np.argmin(fine_lkls)])
+                best_lkls.append(fine_lkls.min())
+
+        i_best = int(np.argmin(best_lkls))
+        model = dict(zip(fit_names, best_models[i_best].tolist()))
+        self._vp(
+            "Best model     : "
+            + ", ".join(f"{k}: {round(v, 3)}" for k, v in model.items()),
+            1,
+        )
+        self._vp(f"Likelihood     : {best_lkls[i_best]:.4f}", 1)
+
+        return {
+            "met": met_vals,
+            "loga": loga_vals,
+            "profile": profile.reshape(len(met_vals), len(loga_vals)),
+            "model": model,
+            "lkl": float(best_lkls[i_best]),
+        }
 
     def get_models(
         self,
         model: dict[str, float],
         model_std: dict[str, float],
         N_models: int = 200,
+        n_jobs: int = 1,
     ) -> None:
         """Generate random sampled models from the selected solution. Use these models
         to generate full synthetic clusters.
@@ -375,6 +1556,10 @@ class Synthetic:
         :type model_std: dict[str, float]
         :param N_models: Number of sampled models, defaults to ``200``
         :type N_models: int
+        :param n_jobs: Number of processes used to generate the synthetic clusters.
+            The models are always sampled in the main process, so the results for a
+            given ``seed`` do not depend on this value, defaults to ``1``
+        :type n_jobs: int
 
         :raises ValueError: If any of the (met, age) parameters are out of range
         """
@@ -413,15 +1598,34 @@ class Synthetic:
 
         sampled_models = mb.ranModels(model, model_std, N_models, self.rng)
 
+        if n_jobs > 1:
+            # Each worker receives a copy of this object once. The results are
+            # returned in the same order as the sampled models
+            chunksize = max(1, len(sampled_models) // (4 * n_jobs))
+            with ProcessPoolExecutor(
+                max_workers=n_jobs, initializer=mb.init_worker, initargs=(self,)
+            ) as executor:
+                models_data = list(
+                    executor.map(
+                        mb.model_worker,
+                        sampled_models,
+                        [obs_phot] * len(sampled_models),
+                        chunksize=chunksize,
+                    )
+                )
+        else:
+            models_data = [
+                mb.process_model(self, smodel, obs_phot) for smodel in sampled_models
+            ]
+
         sampled_synthcls, close_stars_idxs = [], []
         remove_model_index = []
-        for i, smodel in enumerate(sampled_models):
-            isoch = self.generate(smodel, full_arr_flag=True)
-            if not isoch.any():
+        for i, model_data in enumerate(models_data):
+            if model_data is None:
                 remove_model_index.append(i)
                 continue
+            isoch, idxs = model_data
             sampled_synthcls.append(isoch)
-            idxs = mb.get_close_idxs(self.m_ini_idx, obs_phot, isoch)
             close_stars_idxs.append(idxs)
 
         # Remove models associated to empty isochrones
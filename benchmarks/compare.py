@@ -0,0 +1,83 @@
+"""Compare two results files generated by ``benchmarks/run.py``.
+
+Usage::
+
+    python benchmarks/compare.py BASE.json NEW.json [--stat min] [--threshold 1.1]
+
+Each case found in both files is listed with the ratio of the new to the base
+time. Cases slower than ``threshold`` are marked, and the script exits with a
+non-zero status if there are any, so it can be used to catch regressions.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> tuple[dict, dict]:
+    """Read a results file, index the cases by name and parameters"""
+    with open(path) as f:
+        data = json.load(f)
+    cases = {}
+    for case in data["results"]:
+        key = (case["name"], json.dumps(case["params"], sort_keys=True))
+        cases[key] = case
+    return data["meta"], cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("base", help="results of the reference version")
+    parser.add_argument("new", help="results of the version being tested")
+    parser.add_argument(
+        "--stat",
+        choices=("min", "median"),
+        default="min",
+        help="statistic of the repetitions compared (min)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.1,
+        help="new/base ratio above which a case is a regression (1.1)",
+    )
+    args = parser.parse_args()
+
+    meta_base, base = load(args.base)
+    meta_new, new = load(args.new)
+    for label, meta in (("base", meta_base), ("new ", meta_new)):
+        print(
+            f"{label}: asteca {meta['asteca']} ({meta['commit']}), "
+            + f"python {meta['python']}, numpy {meta['numpy']}, {meta['date']}"
+        )
+    print()
+
+    N_slower = 0
+    for key in base:
+        if key not in new:
+            continue
+        name, params = key
+        t_base = base[key][args.stat] / base[key]["N_calls"]
+        t_new = new[key][args.stat] / new[key]["N_calls"]
+        ratio = t_new / t_base
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  SLOWER"
+            N_slower += 1
+        elif ratio < 1 / args.threshold:
+            flag = "  faster"
+        print(
+            f"{name:<26} {params:<72} {1000 * t_base:10.3f} {1000 * t_new:10.3f} "
+            + f"ms/call  x{ratio:.2f}{flag}"
+        )
+
+    missing = set(base) ^ set(new)
+    if missing:
+        print(f"\n{len(missing)} cases are only present in one of the files")
+    if N_slower:
+        print(f"\n{N_slower} cases are slower than the threshold ({args.threshold})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Generated isochrones and observed fields used by the benchmarks.
+
+The data follows a simple analytical model: it is not physically accurate, but it
+has the shape, size and format of the real data so that all the code paths of
+ASteCA are exercised. No files need to be downloaded.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Filters of the generated isochrones, and their effective wavelengths
+FILTERS = {
+    "Gmag": 6390.7,
+    "G_BPmag": 5182.58,
+    "G_RPmag": 7825.08,
+    "Jmag": 12350.0,
+}
+MAGNITUDE = "Gmag"
+COLOR = ("G_BPmag", "G_RPmag")
+COLOR2 = ("G_BPmag", "Jmag")
+
+# Solar metallicity
+Z_SUN = 0.0152
+
+
+def photometry(
+    mass: np.ndarray, met: float, loga: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Absolute magnitudes of stars with the given initial masses.
+
+    Stars below the turn-off mass follow a main sequence, stars above it move
+    to a red and bright giant branch.
+
+    :param mass: Initial masses.
+    :type mass: np.ndarray
+    :param met: Metallicity (z).
+    :type met: float
+    :param loga: Logarithmic age.
+    :type loga: float
+
+    :return: Magnitudes in the ``Gmag, G_BPmag, G_RPmag, Jmag`` filters.
+    :rtype: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+    """
+    logm = np.log10(mass)
+    m_to = 10 ** ((10.0 - loga) / 2.5)
+    feh = np.log10(met / Z_SUN)
+
+    G = 4.8 - 8.0 * logm + 0.2 * feh
+    BP_RP = 0.8 - 1.6 * logm + 0.3 * feh
+    # Giant branch
+    msk = mass > m_to
+    x = (mass[msk] - m_to) / (0.1 * m_to)
+    G[msk] -= 3.0 * np.tanh(x)
+    BP_RP[msk] += 1.2 * np.tanh(x)
+
+    BP = G + 0.4 * BP_RP + 0.1
+    RP = BP - BP_RP
+    J = RP - 0.9 * BP_RP - 0.2
+
+    return G, BP, RP, J
+
+
+def write_isochrones(
+    path: str, N_met: int, N_age: int, N_points: int = 300
+) -> list[str]:
+    """Write a grid of isochrones in the format of the PARSEC (CMD service) files,
+    one file per metallicity.
+
+    :param path: Folder where the files are written.
+    :type path: str
+    :param N_met: Number of metallicities.
+    :type N_met: int
+    :param N_age: Number of ages.
+    :type N_age: int
+    :param N_points: Number of points (masses) per isochrone, defaults to ``300``
+    :type N_points: int
+
+    :return: Paths to the files.
+    :rtype: list[str]
+    """
+    os.makedirs(path, exist_ok=True)
+    cols = ["Zini", "MH", "logAge", "Mini", "label", *FILTERS]
+    header = "# Isochrones generated for the ASteCA benchmarks\n# " + "  ".join(cols)
+
+    f_paths = []
+    for met in np.linspace(0.005, 0.03, N_met):
+        blocks = []
+        for loga in np.linspace(7.0, 9.8, N_age):
+            m_to = 10 ** ((10.0 - loga) / 2.5)
+            mass = np.geomspace(0.09, min(1.3 * m_to, 100.0), N_points)
+            label = np.where(mass > m_to, 3, 1)
+            label[-3:] = 9
+            block = pd.DataFrame(
+                {
+                    "Zini": met,
+                    "MH": np.log10(met / Z_SUN),
+                    "logAge": loga,
+                    "Mini": mass,
+                    "label": label,
+                }
+            )
+            for filt, mags in zip(FILTERS, photometry(mass, met, loga)):
+                block[filt] = mags
+            blocks.append(block)
+
+        f_path = os.path.join(path, f"isoch_z{met:.5f}.dat")
+        with open(f_path, "w") as f:
+            f.write(header + "\n")
+            pd.concat(blocks).to_csv(
+                f, sep=" ", header=False, index=False, float_format="%.5f"
+            )
+        f_paths.append(f_path)
+
+    return f_paths
+
+
+def observed_field(
+    N_stars: int,
+    two_colors: bool = False,
+    field_frac: float = 0.8,
+    seed: int = 12345,
+) -> pd.DataFrame:
+    """Generate an observed field: a cluster surrounded by field stars.
+
+    The cluster members are drawn from the analytical model of
+    :py:func:`photometry`, with a Salpeter IMF, ``z=0.015``, ``loga=8.5``,
+    ``dm=10`` and ``Av=0.3``.
+
+    :param N_stars: Total number of stars.
+    :type N_stars: int
+    :param two_colors: If ``True`` a second color (``BP-J``) is added, defaults to
+        ``False``
+    :type two_colors: bool
+    :param field_frac: Fraction of field stars, defaults to ``0.8``
+    :type field_frac: float
+    :param seed: Random seed, defaults to ``12345``
+    :type seed: int
+
+    :return: DataFrame with the columns ``ra, dec, pmRA, pmDE, plx, Gmag, BP-RP``
+        (and ``BP-J``) and their uncertainties.
+    :rtype: pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    N_field = int(N_stars * field_frac)
+    N_memb = N_stars - N_field
+
+    # Cluster members. The masses are sampled from a Salpeter IMF
+    mass = 0.5 * (1 - rng.uniform(0, 1, N_memb)) ** (-1 / 1.35)
+    mass = np.clip(mass, None, 3.5)
+    G, BP, RP, J = photometry(mass, 0.015, 8.5)
+    memb = {
+        "ra": rng.normal(120.0, 0.05, N_memb),
+        "dec": rng.normal(-30.0, 0.05, N_memb),
+        "pmRA": rng.normal(-2.0, 0.1, N_memb),
+        "pmDE": rng.normal(3.0, 0.1, N_memb),
+        "plx": rng.normal(1.0, 0.05, N_memb),
+        "Gmag": G + 10.0 + 0.25,
+        "BP-RP": BP - RP + 0.13,
+        "BP-J": BP - J + 0.25,
+    }
+
+    # Field stars
+    field = {
+        "ra": rng.uniform(119.5, 120.5, N_field),
+        "dec": rng.uniform(-30.5, -29.5, N_field),
+        "pmRA": rng.normal(0.0, 3.0, N_field),
+        "pmDE": rng.normal(0.0, 3.0, N_field),
+        "plx": rng.lognormal(-0.5, 0.5, N_field),
+        "Gmag": 19.0 - rng.exponential(2.0, N_field),
+        "BP-RP": rng.uniform(0.0, 3.0, N_field),
+        "BP-J": rng.uniform(0.5, 5.0, N_field),
+    }
+
+    df = pd.DataFrame({k: np.concatenate([memb[k], field[k]]) for k in memb})
+    # Uncertainties grow exponentially with the magnitude
+    e_mag = 0.001 + 0.0001 * np.exp(0.5 * (df["Gmag"] - 10.0).clip(0, None))
+    df["e_Gmag"] = e_mag
+    df["e_BP-RP"] = 2.0 * e_mag
+    df["e_BP-J"] = 2.5 * e_mag
+    for col in ("pmRA", "pmDE", "plx"):
+        df[f"e_{col}"] = 0.02 + 10.0 * e_mag
+    for col in ("Gmag", "BP-RP", "BP-J", "pmRA", "pmDE", "plx"):
+        df[col] += rng.normal(0.0, df[f"e_{col}"])
+    if not two_colors:
+        df = df.drop(columns=["BP-J", "e_BP-J"])
+
+    return df
@@ -0,0 +1,394 @@
+"""Time the main code paths of ASteCA and store the results in a JSON file.
+
+Usage::
+
+    python benchmarks/run.py [--quick] [--repeat R] [--only NAME ...] [-o FILE]
+
+The ASteCA package in the parent folder of this script is the one timed, so the
+results of two versions are obtained by running this script in two checkouts of
+the repository. Compare them with ``benchmarks/compare.py``. Cases that time a
+feature missing from the version of ASteCA being timed are skipped.
+"""
+
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import scipy
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fixtures import (
+    COLOR,
+    COLOR2,
+    FILTERS,
+    MAGNITUDE,
+    observed_field,
+    write_isochrones,
+)
+
+import asteca
+
+# Sizes of each benchmark, for the full and the quick (--quick) runs
+SIZES = {
+    "full": {
+        "grids": [(2, 10), (4, 40), (8, 80)],
+        "N_stars": [500, 2000, 10000],
+        "N_field": [2000, 10000, 50000],
+        "N_field_bayesian": [1000, 2000, 5000],
+        "N_models": 200,
+        "N_runs": 25,
+    },
+    "quick": {
+        "grids": [(2, 10), (4, 20)],
+        "N_stars": [500, 2000],
+        "N_field": [2000, 5000],
+        "N_field_bayesian": [1000, 2000],
+        "N_models": 50,
+        "N_runs": 10,
+    },
+}
+
+# Fixed parameters used to generate the synthetic clusters
+FIX_PARAMS = {"alpha": 0.09, "beta": 0.94, "Rv": 3.1, "DR": 0.0}
+
+# Features not present in older versions of ASteCA, their cases are skipped
+HAS_CACHE_DIR = "cache_dir" in inspect.signature(asteca.isochrones).parameters
+HAS_GENERATE_BATCH = hasattr(asteca.synthetic, "generate_batch")
+HAS_SPARSE_HESS = "sparse_hess" in inspect.signature(asteca.likelihood).parameters
+HAS_GET_BATCH = hasattr(asteca.likelihood, "get_batch")
+
+
+def timeit(func, repeat: int) -> list[float]:
+    """Time a function call ``repeat`` times, after a warm-up call"""
+    func()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def call_each(func, args_list: list) -> None:
+    """Call a function once for each argument in ``args_list``"""
+    for arg in args_list:
+        func(arg)
+
+
+def isochrones(tmp_path: str, N_met: int, N_age: int, two_colors: bool, **kwargs):
+    """Load the generated isochrones, written to ``tmp_path`` if required"""
+    path = os.path.join(tmp_path, f"isochs_{N_met}x{N_age}")
+    if not os.path.isdir(path):
+        write_isochrones(path, N_met, N_age)
+    color2, color2_effl = None, None
+    if two_colors:
+        color2 = COLOR2
+        color2_effl = tuple(FILTERS[_] for _ in COLOR2)
+    return asteca.isochrones(
+        model="parsec",
+        isochs_path=path,
+        magnitude=MAGNITUDE,
+        color=COLOR,
+        color2=color2,
+        magnitude_effl=FILTERS[MAGNITUDE],
+        color_effl=tuple(FILTERS[_] for _ in COLOR),
+        color2_effl=color2_effl,
+        verbose=0,
+        **kwargs,
+    )
+
+
+def cluster(N_stars: int, two_colors: bool, field_frac: float = 0.8):
+    """Generate an observed field and load it into a Cluster object"""
+    obs_df = observed_field(N_stars, two_colors, field_frac)
+    kwargs = {}
+    if two_colors:
+        kwargs = {"color2": "BP-J", "e_color2": "e_BP-J"}
+    return asteca.cluster(
+        obs_df=obs_df,
+        ra="ra",
+        dec="dec",
+        pmra="pmRA",
+        pmde="pmDE",
+        plx="plx",
+        e_pmra="e_pmRA",
+        e_pmde="e_pmDE",
+        e_plx="e_plx",
+        magnitude="Gmag",
+        e_mag="e_Gmag",
+        color="BP-RP",
+        e_color="e_BP-RP",
+        verbose=0,
+        **kwargs,
+    )
+
+
+def models(met_age_dict: dict, N_models: int) -> list[dict]:
+    """Random parameters for the synthetic clusters, within the grid"""
+    rng = np.random.default_rng(1)
+    met, loga = met_age_dict["met"], met_age_dict["loga"]
+    return [
+        {
+            "met": rng.uniform(met.min(), met.max()),
+            "loga": rng.uniform(loga.min(), loga.max()),
+            "dm": rng.uniform(9.0, 11.0),
+            "Av": rng.uniform(0.0, 1.0),
+        }
+        for _ in range(N_models)
+    ]
+
+
+def bench_isochrones(sizes: dict, repeat: int, tmp_path: str):
+    """Load the isochrone files, and the processed isochrones from the cache"""
+    for N_met, N_age in sizes["grids"]:
+        for two_colors in (False, True):
+            params = {"N_met": N_met, "N_age": N_age, "two_colors": two_colors}
+            yield (
+                "isochrones_load",
+                params,
+                1,
+                timeit(partial(isochrones, tmp_path, **params), repeat),
+            )
+
+            if not HAS_CACHE_DIR:
+                continue
+            cache_dir = os.path.join(tmp_path, "cache")
+            yield (
+                "isochrones_load_cached",
+                params,
+                1,
+                timeit(
+                    partial(isochrones, tmp_path, **params, cache_dir=cache_dir), repeat
+                ),
+            )
+
+
+def bench_generate(sizes: dict, repeat: int, tmp_path: str):
+    """Generate synthetic clusters, one at a time and in batches"""
+    N_models = sizes["N_models"]
+    for N_met, N_age in sizes["grids"]:
+        for two_colors in (False, True):
+            isochs = isochrones(tmp_path, N_met, N_age, two_colors)
+            synthcl = asteca.synthetic(isochs, seed=457304, verbose=0)
+            for N_stars in sizes["N_stars"]:
+                my_cluster = cluster(N_stars, two_colors, 0.0)
+                synthcl.calibrate(my_cluster, FIX_PARAMS)
+                fit_params = models(synthcl.met_age_dict, N_models)
+                params = {
+                    "N_met": N_met,
+                    "N_age": N_age,
+                    "two_colors": two_colors,
+                    "N_stars": N_stars,
+                }
+                yield (
+                    "synthetic_generate",
+                    params,
+                    N_models,
+                    timeit(partial(call_each, synthcl.generate, fit_params), repeat),
+                )
+
+                if not HAS_GENERATE_BATCH:
+                    continue
+                fit_arrays = {
+                    k: np.array([_[k] for _ in fit_params]) for k in fit_params[0]
+                }
+                yield (
+                    "synthetic_generate_batch",
+                    params,
+                    N_models,
+                    timeit(partial(synthcl.generate_batch, fit_arrays), repeat),
+                )
+
+
+def bench_tremmel(sizes: dict, repeat: int, tmp_path: str):
+    """Evaluate the Poisson likelihood ratio on synthetic clusters"""
+    N_met, N_age = sizes["grids"][0]
+    N_models = sizes["N_models"]
+    for two_colors in (False, True):
+        isochs = isochrones(tmp_path, N_met, N_age, two_colors)
+        synthcl = asteca.synthetic(isochs, seed=457304, verbose=0)
+        for N_stars in sizes["N_stars"]:
+            my_cluster = cluster(N_stars, two_colors, 0.0)
+            synthcl.calibrate(my_cluster, FIX_PARAMS)
+            synth_clusts = [
+                synthcl.generate(p) for p in models(synthcl.met_age_dict, N_models)
+            ]
+            params = {"two_colors": two_colors, "N_stars": N_stars}
+            for sparse_hess in (False, True) if HAS_SPARSE_HESS else (False,):
+                kwargs = {"sparse_hess": sparse_hess} if HAS_SPARSE_HESS else {}
+                lkl = asteca.likelihood(my_cluster, **kwargs)
+                # The key is always stored so that the cases of all versions match
+                params_s = params | {"sparse_hess": sparse_hess}
+                yield (
+                    "likelihood_tremmel",
+                    params_s,
+                    N_models,
+                    timeit(partial(call_each, lkl.get, synth_clusts), repeat),
+                )
+                if not HAS_GET_BATCH:
+                    continue
+                yield (
+                    "likelihood_tremmel_batch",
+                    params_s,
+                    N_models,
+                    timeit(partial(lkl.get_batch, synth_clusts), repeat),
+                )
+
+
+def field(N_stars: int):
+    """Observed field with its center and number of members estimated"""
+    my_field = cluster(N_stars, False)
+    my_field.get_center()
+    # Cluster has no public method to set or estimate the radius (required by
+    # the Bayesian method), the attribute is assigned directly
+    my_field.radius = 0.1
+    my_field.N_cluster = int(0.2 * N_stars)
+    return my_field
+
+
+def bench_ripley(sizes: dict, repeat: int, tmp_path: str):
+    """Estimate the number of members with the ``ripley`` method"""
+    for N_stars in sizes["N_field"]:
+        my_field = field(N_stars)
+        yield (
+            "ripley_nmembs",
+            {"N_stars": N_stars},
+            1,
+            timeit(partial(my_field.get_nmembers, "ripley"), repeat),
+        )
+
+
+def bench_fastmp(sizes: dict, repeat: int, tmp_path: str):
+    """Assign membership probabilities with the fastMP method"""
+    N_runs = sizes["N_runs"]
+    for N_stars in sizes["N_field"]:
+        memb = asteca.membership(field(N_stars), seed=1, verbose=0)
+        yield (
+            "membership_fastmp",
+            {"N_stars": N_stars, "N_runs": N_runs},
+            1,
+            timeit(partial(memb.fastmp, N_runs=N_runs), repeat),
+        )
+
+
+def bench_bayesian(sizes: dict, repeat: int, tmp_path: str):
+    """Assign membership probabilities with the Bayesian method"""
+    N_runs = sizes["N_runs"]
+    for N_stars in sizes["N_field_bayesian"]:
+        memb = asteca.membership(field(N_stars), seed=1, verbose=0)
+        yield (
+            "membership_bayesian",
+            {"N_stars": N_stars, "N_runs": N_runs},
+            1,
+            timeit(partial(memb.bayesian, N_runs=N_runs), repeat),
+        )
+
+
+BENCHMARKS = {
+    "isochrones": bench_isochrones,
+    "generate": bench_generate,
+    "tremmel": bench_tremmel,
+    "ripley": bench_ripley,
+    "fastmp": bench_fastmp,
+    "bayesian": bench_bayesian,
+}
+
+
+def metadata(args: argparse.Namespace) -> dict:
+    """Versions and system information stored along with the results"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "asteca": asteca.__version__,
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "quick": args.quick,
+        "repeat": args.repeat,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--quick", action="store_true", help="run smaller sizes (a few minutes)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="timed repetitions of each case"
+    )
+    parser.add_argument(
+        "--only", nargs="+", choices=BENCHMARKS, help="benchmarks to run (all)"
+    )
+    parser.add_argument(
+        "-o", "--output", default="benchmarks.json", help="output JSON file"
+    )
+    args = parser.parse_args()
+
+    sizes = SIZES["quick" if args.quick else "full"]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="asteca_bench_") as tmp_path:
+        for name in args.only or BENCHMARKS:
+            # ASteCA objects print and warn, only the timings are shown
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                cases = BENCHMARKS[name](sizes, args.repeat, tmp_path)
+                while True:
+                    try:
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            case = next(cases, None)
+                    except Exception as err:  # noqa: BLE001
+                        # The remaining cases of this benchmark are lost
+                        print(f"{name:<26} failed: {type(err).__name__}: {err}")
+                        break
+                    if case is None:
+                        break
+                    bench, params, N_calls, times = case
+                    results.append(
+                        {
+                            "name": bench,
+                            "params": params,
+                            "N_calls": N_calls,
+                            "times": times,
+                            "min": min(times),
+                            "median": float(np.median(times)),
+                        }
+                    )
+                    print(
+                        f"{bench:<26} {json.dumps(params):<72} "
+                        + f"{1000 * min(times) / N_calls:10.3f} ms/call"
+                    )
+
+    with open(args.output, "w") as f:
+        json.dump({"meta": metadata(args), "results": results}, f, indent=1)
+    print(f"\nResults stored in '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()